@@ -1,11 +1,22 @@
-from flask import Flask, render_template, request, send_file, jsonify
+from flask import Flask, render_template, request, send_file, jsonify, Response, copy_current_request_context
 import os
 import sys
 import json
+import queue
+import re
 import tempfile
+import threading
 import traceback
+import time
+import mimetypes
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
-from notebook_v1 import parse_cookie_string, get_notebooklist, get_bookinfo, get_chapter_info, get_bookmark_list, get_review_list, export_to_excel, export_to_json
+from weread.cache import ResultCache
+from weread import adaptive, feed, profiling, projection, store
+from weread.scheduler import DEFAULT_POLICY
+from weread.engine import NEAR_DEDUP
+from weread.pipeline import extract_and_export
+from weread import WEREAD_URL, USER_AGENT, create_session, get_notebooklist, iter_notebooklist, sort_notebooklist, BookStream, extract_books, export_to_excel, export_to_json, export_to_markdown, stream_zip_directory, iter_csv_export
 
 # 检测是否在Vercel环境中运行
 is_vercel = os.environ.get('VERCEL') == '1'
@@ -43,6 +54,22 @@ if not os.path.exists(OUTPUT_DIR):
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 限制上传大小为16MB
 
+# 书籍列表边下载边解析，第一本书不必等整个列表下载完成（WEREAD_STREAM_NOTEBOOKS=0 关闭）
+STREAM_NOTEBOOKS = os.environ.get('WEREAD_STREAM_NOTEBOOKS', '1') == '1'
+
+# 边获取边导出（见 weread/pipeline.py），WEREAD_PIPELINE=0 时获取完全部书籍后再导出；
+# 开启跨书近似重复标记时需要全部书籍，总是先获取再导出
+PIPELINE = os.environ.get('WEREAD_PIPELINE', '1') == '1' and not NEAR_DEDUP
+
+# 文件下载方式（WEREAD_DOWNLOAD_MODE）：
+# - direct：由Python worker发送文件；服务器提供 wsgi.file_wrapper 时（如gunicorn的sync/gthread worker）会使用sendfile
+# - sendfile：只返回 X-Sendfile 头，由前端服务器（Apache、lighttpd等）发送文件
+# - accel：只返回 X-Accel-Redirect 头，由Nginx发送文件，见README中的配置
+DOWNLOAD_MODE = os.environ.get('WEREAD_DOWNLOAD_MODE', 'direct')
+# Nginx中指向 outputs 目录的 internal location
+ACCEL_PREFIX = os.environ.get('WEREAD_ACCEL_PREFIX', '/protected-outputs/')
+app.config['USE_X_SENDFILE'] = DOWNLOAD_MODE == 'sendfile'
+
 # 在Vercel环境中，简化SocketIO相关功能
 if not is_vercel:
     try:
@@ -56,6 +83,12 @@ else:
     logger.info("Running in Vercel environment, using mock SocketIO implementation")
     socketio = None
 
+# 内存上限（MB）：设置后，超过上限的提取结果写入任务目录中的临时文件，导出时逐本读回
+MEMORY_LIMIT_MB = float(os.environ.get('WEREAD_MEMORY_LIMIT_MB', '0'))
+
+# 提取结果缓存：同一用户书籍列表没有变化时，重复提取直接返回上次的结果
+result_cache = ResultCache()
+
 # 辅助函数：安全的socket emit
 def safe_emit(event, data, room=None):
     if socketio and not is_vercel:
@@ -67,6 +100,41 @@ def safe_emit(event, data, room=None):
             return False
     return False
 
+def form_book_ids(field):
+    """表单中逗号分隔的bookId列表（页面上手动输入，允许中文逗号和空格）"""
+    return [book_id for book_id in re.split(r'[,，\s]+', request.form.get(field, '')) if book_id]
+
+# 辅助函数：导出全部格式，返回下载链接和文件路径
+def export_targets(temp_dir):
+    """导出文件的下载地址和路径（JSON、Excel、Markdown目录）"""
+    timestamp = int(time.time())
+    dir_name = os.path.basename(temp_dir)
+    files = {
+        'excel': f'/download?file=weread_notes_{timestamp}.xlsx&dir={dir_name}',
+        'json': f'/download?file=weread_notes_{timestamp}.json&dir={dir_name}',
+        'markdown': f'/download?file=weread_notes_{timestamp}_markdown.zip&dir={dir_name}'
+    }
+    paths = [
+        os.path.join(temp_dir, f'weread_notes_{timestamp}.json'),
+        os.path.join(temp_dir, f'weread_notes_{timestamp}.xlsx'),
+        os.path.join(temp_dir, f'weread_notes_{timestamp}_markdown'),
+    ]
+    return files, paths
+
+def export_all(all_books_data, temp_dir):
+    files, paths = export_targets(temp_dir)
+    json_file, excel_file, markdown_dir = paths
+    
+    logger.info(f"Exporting data to JSON: {json_file}")
+    export_to_json(all_books_data, json_file)
+    
+    logger.info(f"Exporting data to Excel: {excel_file}")
+    export_to_excel(all_books_data, excel_file)
+    
+    logger.info(f"Exporting data to Markdown: {markdown_dir}")
+    export_to_markdown(all_books_data, markdown_dir)
+    return files, paths
+
 @app.route('/')
 def index():
     logger.info("Serving index page")
@@ -74,6 +142,32 @@ def index():
 
 @app.route('/extract', methods=['POST'])
 def extract():
+    # 管理员通过 X-Profile-Token 请求头对本次任务做性能分析
+    if not profiling.is_requested(request.headers.get('X-Profile-Token', '')):
+        return run_extract()
+    
+    # profile文件和导出文件放在同一个任务目录中，随导出文件一起被清理
+    temp_dir = tempfile.mkdtemp(dir=OUTPUT_DIR)
+    profiler = profiling.JobProfiler(temp_dir, name=f'extract_{int(time.time())}')
+    with profiler:
+        result = run_extract(temp_dir=temp_dir)
+    logger.info(f"Extract profile saved to {profiler.path}:\n{profiling.format_summary(profiler.summary)}")
+    
+    # 在返回的JSON中附上摘要和profile文件的下载地址
+    response, status = result if isinstance(result, tuple) else (result, 200)
+    report = profiler.report()
+    report['file'] = f'/download?dir={os.path.basename(temp_dir)}&file={report["file"]}'
+    payload = response.get_json(silent=True) or {}
+    payload['profile'] = report
+    return jsonify(payload), status
+
+def run_extract(listener=None, temp_dir=None):
+    """提取并导出当前请求的用户的笔记，返回JSON响应
+
+    进度通过WebSocket发送到 sid 对应的页面；listener 不为空时，进度和每本书的笔记
+    也以 feed 事件的形式交给它（/extract/stream 使用）。temp_dir 为调用方已创建的
+    任务目录（性能分析时profile文件也写在其中），为空时新建。
+    """
     logger.info("Extract endpoint called")
     try:
         # 获取cookie
@@ -82,193 +176,213 @@ def extract():
         
         logger.info(f"Received request with sid: {sid[:5]}... (truncated)")
         
+        def progress(data):
+            safe_emit('progress_update', data, room=sid)
+            if listener:
+                listener(feed.progress_event(data))
+        
         if not cookie:
             logger.warning("No cookie provided")
             return jsonify({'status': 'error', 'message': '请输入有效的Cookie'}), 400
             
         # 创建临时目录用于存储导出文件
-        temp_dir = tempfile.mkdtemp(dir=OUTPUT_DIR)
-        logger.info(f"Created temp directory: {temp_dir}")
+        own_temp_dir = temp_dir is None
+        if own_temp_dir:
+            temp_dir = tempfile.mkdtemp(dir=OUTPUT_DIR)
+            logger.info(f"Created temp directory: {temp_dir}")
         
         # 获取用户的User-Agent
         user_agent = request.headers.get('User-Agent', '')
         if not user_agent:
-            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+            user_agent = USER_AGENT
         
         # 创建会话
-        import requests
-        session = requests.Session()
-        session.cookies = parse_cookie_string(cookie)
-        session.headers.update({'User-Agent': user_agent})
+        session = create_session(cookie, user_agent)
         
         # 访问主页获取必要的cookie
         try:
-            weread_url = "https://weread.qq.com/"
-            logger.info(f"Accessing weread URL: {weread_url}")
-            response = session.get(weread_url)
+            logger.info(f"Accessing weread URL: {WEREAD_URL}")
+            response = session.get(WEREAD_URL)
             logger.info(f"Weread response status: {response.status_code}")
-            safe_emit('progress_update', {'status': 'connecting', 'message': '正在连接微信读书...'}, room=sid)
+            progress({'status': 'connecting', 'message': '正在连接微信读书...'})
         except Exception as e:
             logger.error(f"Failed to access weread: {str(e)}")
             return jsonify({'status': 'error', 'message': f'访问微信读书主页失败: {str(e)}'}), 500
         
         # 获取笔记本列表
-        safe_emit('progress_update', {'status': 'fetching_books', 'message': '正在获取书籍列表...'}, room=sid)
+        progress({'status': 'fetching_books', 'message': '正在获取书籍列表...'})
         
-        try:
-            logger.info("Fetching notebook list")
-            books = get_notebooklist(session)
-            if not books:
-                logger.warning("No books found")
-                return jsonify({'status': 'error', 'message': '获取书籍列表失败，请检查Cookie是否有效'}), 400
-            
-            logger.info(f"Found {len(books)} books")
-        except Exception as e:
-            logger.error(f"Error fetching notebook list: {str(e)}")
-            return jsonify({'status': 'error', 'message': f'获取书籍列表失败: {str(e)}'}), 500
+        # read_info=1 时同时导出阅读统计（默认由 WEREAD_READ_INFO 决定），缓存的结果中可能没有，需重新提取
+        read_info = True if request.form.get('read_info') == '1' else None
+        # 用户选中的书（逗号分隔的bookId）额外获取笔记和书评的评论，缓存的结果中没有，同样需重新提取
+        threads = set(form_book_ids('threads'))
+        if request.form.get('refresh') == '1' or read_info or threads:
+            result_cache.evict_user(cookie)
+        # 用户置顶的书（逗号分隔的bookId）最先处理，其余按 WEREAD_SCHEDULE 策略
+        pinned = form_book_ids('pinned')
         
-        # 发送总书籍数量
-        total_books = len(books)
-        safe_emit('progress_update', {
-            'status': 'start_processing',
-            'message': f'开始处理，共有 {total_books} 本书',
-            'total_books': total_books,
-            'current_book': 0,
-            'percent': 0
-        }, room=sid)
-        
-        all_books_data = []
-        
-        for index, book_item in enumerate(books):
+        # 该用户没有缓存、也不需要按完整列表调度时，边接收书籍列表边开始处理；
+        # 否则先获取完整的列表，用于判断缓存是否可用和安排处理顺序
+        stream_books = STREAM_NOTEBOOKS and not pinned and DEFAULT_POLICY == 'sort' and not result_cache.has_user(cookie)
+        if stream_books:
+            logger.info("Streaming notebook list")
+            books = BookStream(iter_notebooklist(session))
+        else:
             try:
-                book = book_item.get('book')
-                bookId = book.get('bookId')
-                title = book.get('title', '未知书名')
-                
-                # 更新进度
-                current_book = index + 1
-                percent = int((current_book / total_books) * 100)
-                logger.info(f"Processing book {current_book}/{total_books}: {title}")
-                
-                safe_emit('progress_update', {
-                    'status': 'processing',
-                    'message': f'正在处理 ({current_book}/{total_books}): {title}',
-                    'current_book': current_book,
-                    'book_title': title,
-                    'total_books': total_books,
-                    'percent': percent
-                }, room=sid)
-                
-                # 获取书籍详细信息
-                isbn, rating, book_info = get_bookinfo(session, bookId)
-                chapter_info = get_chapter_info(session, bookId)
-                
-                # 划线列表清洗
-                bookmark_list = get_bookmark_list(session, bookId)
-                if bookmark_list:
-                    bookmark_list_huaxian = [item for item in bookmark_list if item.get('type') == 1]
-                else:
-                    bookmark_list_huaxian = []
-                    
-                # 书评和笔记
-                summary, reviews = get_review_list(session, bookId)
-    
-                # 合并划线和笔记
-                all_notes = []
-                if bookmark_list_huaxian:
-                    all_notes.extend(bookmark_list_huaxian)
-                    logger.info(f"Book '{title}' has {len(bookmark_list_huaxian)} highlights")
-                    safe_emit('progress_update', {
-                        'status': 'processing_detail',
-                        'message': f'《{title}》 - 获取到 {len(bookmark_list_huaxian)} 条划线'
-                    }, room=sid)
-                if reviews:
-                    all_notes.extend(reviews)
-                    logger.info(f"Book '{title}' has {len(reviews)} notes")
-                    safe_emit('progress_update', {
-                        'status': 'processing_detail',
-                        'message': f'《{title}》 - 获取到 {len(reviews)} 条笔记'
-                    }, room=sid)
-                
-                # 排序
-                if all_notes:
-                    all_notes = sorted(
-                        all_notes,
-                        key=lambda x: (
-                            x.get("chapterUid", 1),
-                            (
-                                0
-                                if (
-                                    x.get("range", "") == ""
-                                    or x.get("range", "").split("-")[0] == ""
-                                )
-                                else int(x.get("range", "0-0").split("-")[0])
-                            ),
-                        ),
-                    )
-                
-                # 添加章节信息
-                for note in all_notes:
-                    chapterUid = note.get("chapterUid", 1)
-                    if chapter_info and chapterUid in chapter_info:
-                        note["chapter_title"] = chapter_info[chapterUid].get("title", "")
-                    else:
-                        note["chapter_title"] = ""
-                
-                # 添加书籍数据
-                book_data = {
-                    "book_info": book,
-                    "isbn": isbn,
-                    "rating": rating,
-                    "notes": all_notes,
-                    "summary": summary
-                }
+                logger.info("Fetching notebook list")
+                books = get_notebooklist(session)
+                if not books:
+                    logger.warning("No books found")
+                    return jsonify({'status': 'error', 'message': '获取书籍列表失败，请检查Cookie是否有效'}), 400
                 
-                all_books_data.append(book_data)
-                
-                # 每处理一本书睡眠1秒，避免请求过快
-                import time
-                time.sleep(1)
+                logger.info(f"Found {len(books)} books")
             except Exception as e:
-                logger.error(f"Error processing book '{title}': {str(e)}")
-                logger.error(traceback.format_exc())
-                # 继续处理下一本书
-                continue
+                logger.error(f"Error fetching notebook list: {str(e)}")
+                return jsonify({'status': 'error', 'message': f'获取书籍列表失败: {str(e)}'}), 500
+            
+            # 书籍列表没有变化时直接使用缓存的结果（refresh=1 强制重新提取）
+            cache_key = result_cache.make_key(cookie, books)
+            cached = result_cache.get(cache_key)
+            if cached:
+                if all(os.path.exists(path) for path in cached['paths']):
+                    logger.info("Returning cached export files")
+                    if own_temp_dir:
+                        os.rmdir(temp_dir)
+                    files = cached['files']
+                else:
+                    # 文件已被清理，用缓存的数据重新导出，不需要重新抓取
+                    logger.info("Cached files removed, re-exporting cached data")
+                    files, paths = export_all(cached['data'], temp_dir)
+                    result_cache.put(cache_key, cached['data'], files, paths)
+                if listener:
+                    for book_data in cached['data']:
+                        listener(feed.book_event(book_data))
+                progress({
+                    'status': 'completed',
+                    'message': '书籍没有变化，已使用最近一次的提取结果',
+                    'percent': 100
+                })
+                return jsonify(dict({
+                    'status': 'success',
+                    'message': '数据导出成功（使用缓存）',
+                    'cached': True,
+                    'files': files
+                }, **search_credentials(cookie)))
+            
+            # 发送总书籍数量（流式接收时总数要等列表接收完才知道）
+            progress({
+                'status': 'start_processing',
+                'message': f'开始处理，共有 {len(books)} 本书',
+                'total_books': len(books),
+                'current_book': 0,
+                'percent': 0
+            })
         
-        # 导出数据
-        safe_emit('progress_update', {
-            'status': 'exporting',
-            'message': '正在导出数据...',
-            'percent': 95
-        }, room=sid)
+        finished = [0]
         
-        timestamp = int(time.time())
-        json_file = os.path.join(temp_dir, f'weread_notes_{timestamp}.json')
-        excel_file = os.path.join(temp_dir, f'weread_notes_{timestamp}.xlsx')
+        # 每完成一本书更新一次进度
+        def on_book(index, book_item, book_data, error):
+            finished[0] += 1
+            title = book_item.get('book', {}).get('title', '未知书名')
+            if error is not None:
+                logger.error(f"Error processing book '{title}': {str(error)}")
+                logger.error(''.join(traceback.format_exception(type(error), error, error.__traceback__)))
+                return
+            
+            current_book = finished[0]
+            # 流式接收时为目前已收到的书籍数
+            total_books = len(books)
+            percent = int((current_book / total_books) * 100)
+            logger.info(f"Processed book {current_book}/{total_books}: {title}")
+            progress({
+                'status': 'processing',
+                'message': f'正在处理 ({current_book}/{total_books}): {title}',
+                'current_book': current_book,
+                'book_title': title,
+                'total_books': total_books,
+                'percent': percent
+            })
+            
+            if listener:
+                listener(feed.book_event(book_data))
+            
+            highlights = sum(1 for note in book_data['notes'] if not note.get('reviewId'))
+            reviews = len(book_data['notes']) - highlights
+            if highlights:
+                logger.info(f"Book '{title}' has {highlights} highlights")
+                progress({
+                    'status': 'processing_detail',
+                    'message': f'《{title}》 - 获取到 {highlights} 条划线'
+                })
+            if reviews:
+                logger.info(f"Book '{title}' has {reviews} notes")
+                progress({
+                    'status': 'processing_detail',
+                    'message': f'《{title}》 - 获取到 {reviews} 条笔记'
+                })
         
-        logger.info(f"Exporting data to JSON: {json_file}")
-        export_to_json(all_books_data, json_file)
+        options = dict(on_book=on_book, pinned=pinned, read_info=read_info, threads=threads,
+                       memory_limit=int(MEMORY_LIMIT_MB * 1024 * 1024) or None)
+        if PIPELINE:
+            # 每本书按顺序一到就写入三种导出文件，获取完成时导出也基本完成
+            files, paths = export_targets(temp_dir)
+            json_file, excel_file, markdown_dir = paths
+            all_books_data = extract_and_export(session, books, [
+                lambda data: export_to_json(data, json_file),
+                lambda data: export_to_excel(data, excel_file),
+                lambda data: export_to_markdown(data, markdown_dir),
+            ], on_fetched=lambda: progress({
+                'status': 'exporting',
+                'message': '正在完成导出...',
+                'percent': 95
+            }), **options)
+        else:
+            all_books_data = extract_books(session, books, **options)
         
-        logger.info(f"Exporting data to Excel: {excel_file}")
-        export_to_excel(all_books_data, excel_file)
+        if stream_books:
+            if not len(books):
+                logger.warning("No books found")
+                return jsonify({'status': 'error', 'message': '获取书籍列表失败，请检查Cookie是否有效'}), 400
+            logger.info(f"Found {len(books)} books")
+            # 与 get_notebooklist 相同的顺序计算缓存键
+            cache_key = result_cache.make_key(cookie, sort_notebooklist(books.items))
+        
+        if not PIPELINE:
+            # 导出数据
+            progress({
+                'status': 'exporting',
+                'message': '正在导出数据...',
+                'percent': 95
+            })
+            files, paths = export_all(all_books_data, temp_dir)
+        result_cache.put(cache_key, all_books_data, files, paths)
+        
+        # 增量更新用户的本地笔记数据库，供 /search 使用；失败不影响导出
+        if store.ENABLED:
+            try:
+                conn = store.connect(store.db_path_for(cookie))
+                try:
+                    stats = store.save_books(conn, all_books_data, books)
+                finally:
+                    conn.close()
+                logger.info(f"Notes database updated: {stats}")
+            except Exception as e:
+                logger.error(f"Failed to update notes database: {str(e)}")
         
         # 完成
-        safe_emit('progress_update', {
+        progress({
             'status': 'completed',
             'message': '处理完成！',
             'percent': 100
-        }, room=sid)
+        })
         
         logger.info("Processing completed successfully")
         
-        return jsonify({
+        return jsonify(dict({
             'status': 'success', 
             'message': '数据导出成功',
-            'files': {
-                'excel': f'/download?file=weread_notes_{timestamp}.xlsx&dir={os.path.basename(temp_dir)}',
-                'json': f'/download?file=weread_notes_{timestamp}.json&dir={os.path.basename(temp_dir)}'
-            }
-        })
+            'files': files
+        }, **search_credentials(cookie)))
         
     except Exception as e:
         error_msg = traceback.format_exc()
@@ -282,6 +396,136 @@ def extract():
             }, room=sid)
         return jsonify({'status': 'error', 'message': f'处理过程中出错: {str(e)}', 'details': error_msg}), 500
 
+@app.route('/extract/stream', methods=['POST'])
+def extract_stream():
+    """与 /extract 相同的提取，但以NDJSON逐行返回进度和每本书的笔记，最后一行为结果（含下载地址）
+
+    提取在后台线程中进行，浏览器断开后仍会完成（结果进入缓存，重新提交时直接使用）。
+    """
+    # 在后台线程开始前读取表单
+    request.form
+    events = queue.Queue()
+    
+    @copy_current_request_context
+    def worker():
+        try:
+            result = run_extract(listener=events.put)
+            response, status = result if isinstance(result, tuple) else (result, 200)
+            events.put(feed.result_event(response.get_json(), status))
+        except Exception as e:
+            logger.error(f"Streamed extraction failed: {str(e)}")
+            events.put(feed.result_event({'status': 'error', 'message': f'处理过程中出错: {str(e)}'}, 500))
+        finally:
+            events.put(None)
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    def generate():
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield feed.dumps(event)
+    
+    return Response(generate(), mimetype=feed.MIMETYPE, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/export/csv', methods=['POST'])
+def export_csv():
+    """流式CSV导出：边获取每本书的笔记边返回，不在服务器上生成文件
+
+    只接受POST，Cookie不会出现在URL、访问日志和浏览器历史中。
+    """
+    logger.info("CSV export endpoint called")
+    cookie = request.form.get('cookie', '')
+    if not cookie:
+        logger.warning("No cookie provided")
+        return jsonify({'status': 'error', 'message': '请输入有效的Cookie'}), 400
+    
+    user_agent = request.headers.get('User-Agent', '')
+    if not user_agent:
+        user_agent = USER_AGENT
+    
+    session = create_session(cookie, user_agent)
+    
+    # 在开始输出之前完成连接和书籍列表获取，出错时仍可返回JSON错误
+    try:
+        session.get(WEREAD_URL)
+        # CSV只用到书名和作者，书籍的其余字段在解析时就丢弃
+        books = get_notebooklist(session, fields=projection.book_fields(['csv']))
+    except Exception as e:
+        logger.error(f"Error fetching notebook list: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'获取书籍列表失败: {str(e)}'}), 500
+    if not books:
+        logger.warning("No books found")
+        return jsonify({'status': 'error', 'message': '获取书籍列表失败，请检查Cookie是否有效'}), 400
+    
+    logger.info(f"Streaming CSV for {len(books)} books")
+    timestamp = int(time.time())
+    return Response(
+        iter_csv_export(session, books),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename=weread_notes_{timestamp}.csv',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def search_credentials(cookie):
+    """提取成功时返回的搜索令牌（/search 凭它证明是该用户本人）"""
+    if not store.ENABLED:
+        return {}
+    return {'search_token': store.search_token(cookie)}
+
+def verify_search_user(cookie, token):
+    """搜索前确认请求者是Cookie对应的用户：令牌有效，或者用Cookie能从微信读书获取书籍列表"""
+    if token:
+        return store.check_search_token(cookie, token)
+    session = create_session(cookie, request.headers.get('User-Agent') or USER_AGENT, adaptive=False)
+    try:
+        return bool(get_notebooklist(session, fields=(), max_retries=1))
+    except Exception as e:
+        logger.error(f"Failed to verify cookie for search: {str(e)}")
+        return False
+
+@app.route('/search', methods=['POST'])
+def search():
+    """在用户已提取过的笔记中全文搜索
+
+    只接受POST；需要提取时返回的 search_token，没有时用Cookie向微信读书验证身份。
+    """
+    cookie = request.form.get('cookie', '')
+    query = request.form.get('q', '').strip()
+    if not cookie:
+        return jsonify({'status': 'error', 'message': '请输入有效的Cookie'}), 400
+    if not query:
+        return jsonify({'status': 'error', 'message': '请输入搜索内容'}), 400
+    if not verify_search_user(cookie, request.form.get('token', '')):
+        logger.warning("Search rejected: cookie could not be verified")
+        return jsonify({'status': 'error', 'message': '身份验证失败，请重新提取笔记或检查Cookie是否有效'}), 403
+    
+    db_path = store.db_path_for(cookie)
+    if not os.path.exists(db_path):
+        return jsonify({'status': 'error', 'message': '还没有提取过笔记，请先点击"开始提取"'}), 404
+    
+    try:
+        limit = min(int(request.form.get('limit', 20)), 100)
+        offset = max(int(request.form.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': '无效的分页参数'}), 400
+    
+    conn = store.connect(db_path)
+    try:
+        started = time.time()
+        results = store.search(conn, query, limit=limit, offset=offset)
+        elapsed_ms = round((time.time() - started) * 1000, 2)
+    finally:
+        conn.close()
+    logger.info(f"Search returned {len(results)} results in {elapsed_ms}ms")
+    return jsonify({'status': 'success', 'query': query, 'results': results, 'elapsed_ms': elapsed_ms})
+
 @app.route('/download')
 def download():
     logger.info("Download endpoint called")
@@ -301,11 +545,29 @@ def download():
     file_path = os.path.join(OUTPUT_DIR, dir_name, filename)
     logger.info(f"Download file path: {file_path}")
     
+    # Markdown导出是一个目录，下载时边压缩边返回zip
+    markdown_dir = file_path[:-len('.zip')] if file_path.endswith('.zip') else None
+    if markdown_dir and not os.path.exists(file_path) and os.path.isdir(markdown_dir):
+        logger.info(f"Streaming zip of directory: {markdown_dir}")
+        return Response(
+            stream_zip_directory(markdown_dir),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    
     if not os.path.exists(file_path):
         logger.warning(f"File not found: {file_path}")
         return jsonify({'status': 'error', 'message': '文件不存在'}), 404
     
-    return send_file(file_path, as_attachment=True)
+    if DOWNLOAD_MODE == 'accel':
+        # 交给Nginx发送，Python worker不读取文件内容
+        response = Response(status=200)
+        response.headers['X-Accel-Redirect'] = f"{ACCEL_PREFIX.rstrip('/')}/{quote(dir_name)}/{quote(filename)}"
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+    
+    return send_file(os.path.abspath(file_path), as_attachment=True)
 
 @app.route('/status', methods=['GET'])
 def status():
@@ -319,10 +581,11 @@ def status():
         'directories': {
             'uploads': os.path.exists(UPLOAD_FOLDER),
             'outputs': os.path.exists(OUTPUT_DIR)
-        }
+        },
+        'adaptive': adaptive.metrics()
     })
 
-if not is_vercel:
+if socketio:
     @socketio.on('connect')
     def handle_connect():
         logger.info("Client connected")
@@ -332,20 +595,9 @@ if not is_vercel:
     def handle_disconnect():
         logger.info("Client disconnected")
 
-# 为Vercel部署添加WSGI应用入口点
-if is_vercel:
-    # 在Vercel上，直接使用Flask的WSGI应用
-    application = app
-else:
-    # 在非Vercel环境下，使用SocketIO的WSGI应用
-    if socketio:
-        # 修正API调用
-        application = socketio
-    else:
-        application = app
-
-# 导出app对象供Vercel使用
-app = application
+# WSGI应用入口点：SocketIO已经把自己的中间件挂在 app.wsgi_app 上，
+# 所以无论是否启用SocketIO，gunicorn和Vercel都直接使用Flask应用
+application = app
 
 if __name__ == '__main__':
     if not is_vercel and socketio:
@@ -0,0 +1 @@
+"""压测工具：模拟微信读书服务，并对 Flask 应用的 /extract、/download、/status 进行并发压测"""
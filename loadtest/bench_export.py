@@ -0,0 +1,117 @@
+"""导出转换基准测试：逐行（note_to_row）与列式批量转换（weread.columns）的对比
+
+生成指定规模的模拟笔记数据，分别测量：
+- transform：只做时间格式化和文本选择
+- dataframe：转换并生成pandas DataFrame（export_to_excel 写文件前的部分）
+- streaming：逐本写出的导出（流式Excel、CSV）使用的 exporters.iter_export_rows，
+  按书逐本传入，连续几本书合并成一批转换，笔记少时逐行；另列出每本书单独批量转换的耗时作对比
+并检查各种方式的结果完全一致。
+
+示例：
+    python -m loadtest.bench_export --books 200 --notes 500 --repeat 3
+    python -m loadtest.bench_export --books 2000 --notes 5   # 很多小书
+"""
+import argparse
+import random
+import time
+
+from weread import columns
+from weread.exporters import EXPORT_COLUMNS, iter_export_rows, note_to_row
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+def make_books(books, notes, seed=0):
+    """生成模拟数据：划线和笔记各半，时间分布在几年内（包括夏令时切换）"""
+    rng = random.Random(seed)
+    data = []
+    start = 1600000000
+    for b in range(books):
+        book_notes = []
+        for n in range(notes):
+            created = start + rng.randrange(0, 86400 * 365 * 4)
+            if n % 2:
+                book_notes.append({'reviewId': f'{b}_{n}', 'abstract': '原文' * rng.randrange(0, 20),
+                                   'content': '想法' * rng.randrange(1, 30), 'createTime': created,
+                                   'chapter_title': f'第{n % 20}章'})
+            else:
+                book_notes.append({'bookmarkId': f'{b}_{n}', 'type': 1, 'markText': '划线内容' * rng.randrange(1, 40),
+                                   'createTime': created, 'chapter_title': f'第{n % 20}章'})
+        data.append({'book_info': {'bookId': str(b), 'title': f'书{b}', 'author': '作者'},
+                     'isbn': '', 'rating': 0, 'notes': book_notes, 'summary': []})
+    return data
+
+def per_row_transform(data):
+    rows = []
+    for book in data:
+        book_info = book['book_info']
+        for note in book['notes']:
+            rows.append(note_to_row(book_info.get('title', ''), book_info.get('author', ''), note))
+    return rows
+
+def per_row_values(data):
+    return [[row[column] for column in EXPORT_COLUMNS] for row in per_row_transform(data)]
+
+def per_book_columns(data):
+    """每本书单独做一次批量转换（合并批次之前的做法）"""
+    rows = []
+    for book in data:
+        rows.extend(columns.iter_export_rows([book]))
+    return rows
+
+def timed(func, repeat):
+    """返回最快一次的耗时和结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='导出转换基准测试（逐行 vs 列式）')
+    parser.add_argument('--books', type=int, default=100, help='书籍数量')
+    parser.add_argument('--notes', type=int, default=1000, help='每本书的笔记数量')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次')
+    args = parser.parse_args(argv)
+
+    if not columns.is_available():
+        parser.error('列式转换需要安装numpy')
+
+    data = make_books(args.books, args.notes)
+    total = args.books * args.notes
+    print(f"{args.books} 本书，共 {total} 条笔记")
+
+    row_time, rows = timed(lambda: per_row_transform(data), args.repeat)
+    column_time, converted = timed(lambda: columns.notes_to_columns(data), args.repeat)
+    converted_rows = [dict(zip(EXPORT_COLUMNS, values))
+                      for values in zip(*(converted[column].tolist() for column in EXPORT_COLUMNS))]
+    if converted_rows != rows:
+        raise SystemExit('列式转换结果与逐行转换不一致')
+
+    results = [('transform', row_time, column_time)]
+    if pd is not None:
+        row_df_time, _ = timed(lambda: pd.DataFrame(per_row_transform(data)), args.repeat)
+        column_df_time, _ = timed(lambda: pd.DataFrame(columns.notes_to_columns(data)), args.repeat)
+        results.append(('dataframe', row_df_time, column_df_time))
+
+    # 逐本传入（生成器），与流式导出相同
+    row_stream_time, expected = timed(lambda: per_row_values(data), args.repeat)
+    stream_time, streamed = timed(lambda: [list(row) for row in iter_export_rows(iter(data))], args.repeat)
+    per_book_time, per_book = timed(lambda: [list(row) for row in per_book_columns(data)], args.repeat)
+    if streamed != expected or per_book != expected:
+        raise SystemExit('逐本转换结果与逐行转换不一致')
+    results.append(('streaming', row_stream_time, stream_time))
+    results.append(('per_book', row_stream_time, per_book_time))
+
+    print(f"{'阶段':<12}{'逐行(s)':>10}{'列式(s)':>10}{'加速':>8}{'列式 行/秒':>14}")
+    for name, row_elapsed, column_elapsed in results:
+        print(f"{name:<12}{row_elapsed:>10.3f}{column_elapsed:>10.3f}"
+              f"{row_elapsed / column_elapsed:>7.1f}x{total / column_elapsed:>14.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""模拟的微信读书API服务，返回与真实接口结构相同的数据
+
+每个虚拟用户的书库大小由Cookie决定：lt_books（书籍数）、lt_notes（每本书的划线数）。
+可以单独运行：python -m loadtest.mock_weread --port 9100 --latency 0.05
+"""
+import argparse
+import json
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_BOOKS = 20
+DEFAULT_NOTES = 30
+
+def _library_size(cookie_header):
+    cookie = SimpleCookie()
+    cookie.load(cookie_header or '')
+    books = int(cookie['lt_books'].value) if 'lt_books' in cookie else DEFAULT_BOOKS
+    notes = int(cookie['lt_notes'].value) if 'lt_notes' in cookie else DEFAULT_NOTES
+    return books, notes
+
+def notebooks(books):
+    return {'books': [
+        {
+            'bookId': str(i),
+            'sort': 1700000000 + i,
+            'noteCount': DEFAULT_NOTES,
+            'reviewCount': 2,
+            'book': {'bookId': str(i), 'title': f'模拟书籍{i}', 'author': f'作者{i % 7}', 'cover': 'https://example.com/cover.jpg'},
+        }
+        for i in range(books)
+    ]}
+
+def bookmark_list(book_id, notes):
+    return {'updated': [
+        {
+            'bookmarkId': f'{book_id}_{j}',
+            'bookId': book_id,
+            'type': 1,
+            'chapterUid': j % 10 + 1,
+            'range': f'{j * 100}-{j * 100 + 40}',
+            'markText': f'模拟划线内容 {book_id}-{j} ' * 3,
+            'createTime': 1700000000 + j,
+        }
+        for j in range(notes)
+    ]}
+
+def review_list(book_id):
+    return {'reviews': [
+        {'review': {'reviewId': f'{book_id}_r1', 'bookId': book_id, 'type': 1, 'chapterUid': 1, 'range': '10-50',
+                    'abstract': '模拟被评论的原文', 'content': '模拟的想法', 'createTime': 1700000500}},
+        {'review': {'reviewId': f'{book_id}_r2', 'bookId': book_id, 'type': 4, 'content': '模拟书评', 'createTime': 1700000600}},
+    ]}
+
+def review_single(review_id):
+    return {'reviewId': review_id, 'comments': [
+        {'comment': {'content': '模拟评论', 'createTime': 1700000700, 'author': {'name': '读者'}}},
+    ]}
+
+def chapter_infos(book_id):
+    return {'data': [{'bookId': book_id, 'updated': [{'chapterUid': i, 'title': f'第{i}章'} for i in range(1, 11)]}]}
+
+def book_info(book_id):
+    return {'bookId': book_id, 'isbn': f'978{int(book_id):010d}', 'newRating': 850, 'intro': '模拟简介' * 20}
+
+def read_info(book_id):
+    return {'bookId': book_id, 'readingTime': 3600, 'finishedDate': 1700001000, 'readingProgress': 100}
+
+class MockWeReadHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        book_id = query.get('bookId', '0')
+        books, notes = _library_size(self.headers.get('Cookie'))
+
+        if url.path == '/':
+            self._respond({})
+        elif url.path == '/user/notebooks':
+            self._respond(notebooks(books))
+        elif url.path == '/book/bookmarklist':
+            self._respond(bookmark_list(book_id, notes))
+        elif url.path == '/review/list':
+            self._respond(review_list(book_id))
+        elif url.path == '/review/single':
+            self._respond(review_single(query.get('reviewId', '')))
+        elif url.path == '/book/info':
+            self._respond(book_info(book_id))
+        elif url.path == '/book/readinfo':
+            self._respond(read_info(book_id))
+        else:
+            self._respond({'errmsg': 'not found'}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if url.path == '/book/chapterInfos':
+            self._respond(chapter_infos(body.get('bookIds', ['0'])[0]))
+        else:
+            self._respond({'errmsg': 'not found'}, status=404)
+
+def start_mock_server(host='127.0.0.1', port=0, latency=0.0):
+    """在后台线程启动模拟服务，返回server对象（server.server_port为实际端口）"""
+    handler = type('Handler', (MockWeReadHandler,), {'latency': latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='模拟的微信读书API服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=0.05, help='每个请求的模拟延迟（秒）')
+    args = parser.parse_args()
+    server = start_mock_server(args.host, args.port, args.latency)
+    print(f"模拟服务已启动: http://{args.host}:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,279 @@
+"""Flask应用并发压测
+
+启动模拟微信读书服务，再按 --matrix 中的每种配置启动 gunicorn，
+用 N 个虚拟用户并发执行 /extract → /download → /status，最后输出各接口的
+p50/p95/p99 延迟、吞吐、错误率，以及 worker 进程的 CPU 和内存（RSS）。
+
+示例：
+    python -m loadtest.run --users 20 --books 30 --notes 50 --matrix eventlet:1,gthread:4,sync:4
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from .mock_weread import start_mock_server
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ENDPOINTS = ('extract', 'download', 'status')
+
+def percentile(values, p):
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))
+    return values[index]
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def parse_matrix(matrix):
+    """'eventlet:1,gthread:4' -> [('eventlet', 1), ('gthread', 4)]"""
+    configs = []
+    for item in matrix.split(','):
+        worker_class, _, workers = item.strip().partition(':')
+        configs.append((worker_class, int(workers or 1)))
+    return configs
+
+class ResourceSampler(threading.Thread):
+    """定时采样 gunicorn 各 worker 进程的 CPU 和 RSS"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu_samples = []
+        self.rss_samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if psutil is None:
+            return
+        try:
+            master = psutil.Process(self.pid)
+        except psutil.Error:
+            return
+        procs = {}
+        while not self._stop_event.is_set():
+            try:
+                children = master.children(recursive=True)
+            except psutil.Error:
+                break
+            cpu = 0.0
+            rss = 0
+            for child in children:
+                try:
+                    proc = procs.setdefault(child.pid, child)
+                    cpu += proc.cpu_percent(None)
+                    rss += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            self.cpu_samples.append(cpu)
+            self.rss_samples.append(rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self):
+        if not self.cpu_samples:
+            return {'cpu_avg': None, 'cpu_max': None, 'rss_max_mb': None}
+        # 第一次采样的 cpu_percent 总是0，不计入平均值
+        cpu = self.cpu_samples[1:] or self.cpu_samples
+        return {
+            'cpu_avg': round(sum(cpu) / len(cpu), 1),
+            'cpu_max': round(max(cpu), 1),
+            'rss_max_mb': round(max(self.rss_samples) / 1024 / 1024, 1),
+        }
+
+def start_app(app_module, worker_class, workers, mock_url, extra_env=None):
+    """启动 gunicorn，返回 (进程, 地址)"""
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        'WEREAD_API_BASE': mock_url,
+        'WEREAD_WEB_URL': mock_url + '/',
+    })
+    env.update(extra_env or {})
+    cmd = [
+        sys.executable, '-m', 'gunicorn',
+        '--worker-class', worker_class,
+        '--workers', str(workers),
+        '--bind', f'127.0.0.1:{port}',
+        '--timeout', '300',
+        '--log-level', 'warning',
+        app_module,
+    ]
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f'http://127.0.0.1:{port}'
+
+    # 等待服务可用
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn 启动失败: {proc.stderr.read().decode('utf-8', 'replace')}")
+        try:
+            requests.get(f'{base_url}/status', timeout=1)
+            return proc, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn 启动超时")
+
+def virtual_user(base_url, user_id, args, results, lock):
+    """一个虚拟用户：循环执行 提取 → 下载全部文件 → 状态检查"""
+    session = requests.Session()
+    cookie = f'wr_vid={user_id}; wr_skey=loadtest; lt_books={args.books}; lt_notes={args.notes}'
+
+    def record(endpoint, started, ok):
+        with lock:
+            results[endpoint].append((time.time() - started, ok))
+
+    for _ in range(args.iterations):
+        started = time.time()
+        files = {}
+        try:
+            data = {'cookie': cookie}
+            if not args.use_cache:
+                data['refresh'] = '1'
+            r = session.post(f'{base_url}/extract', data=data, timeout=args.timeout)
+            ok = r.status_code == 200 and r.json().get('status') == 'success'
+            files = r.json().get('files', {}) if ok else {}
+        except (requests.RequestException, ValueError):
+            ok = False
+        record('extract', started, ok)
+
+        for url in files.values():
+            started = time.time()
+            try:
+                r = session.get(f'{base_url}{url}', timeout=args.timeout)
+                ok = r.status_code == 200
+            except requests.RequestException:
+                ok = False
+            record('download', started, ok)
+
+        started = time.time()
+        try:
+            ok = session.get(f'{base_url}/status', timeout=args.timeout).status_code == 200
+        except requests.RequestException:
+            ok = False
+        record('status', started, ok)
+
+def run_config(worker_class, workers, mock_url, args):
+    """用一种 gunicorn 配置跑一轮压测，返回统计结果"""
+    extra_env = {'WEREAD_DELAY': str(args.delay)}
+    if args.backend:
+        extra_env['WEREAD_BACKEND'] = args.backend
+    proc, base_url = start_app(args.app, worker_class, workers, mock_url, extra_env)
+    sampler = ResourceSampler(proc.pid)
+    sampler.start()
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+    started = time.time()
+    threads = [
+        threading.Thread(target=virtual_user, args=(base_url, user_id, args, results, lock))
+        for user_id in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    sampler.stop()
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+    report = {
+        'worker_class': worker_class,
+        'workers': workers,
+        'elapsed': round(elapsed, 2),
+        'endpoints': {},
+    }
+    for endpoint in ENDPOINTS:
+        samples = results.get(endpoint, [])
+        latencies = [latency for latency, _ in samples]
+        errors = sum(1 for _, ok in samples if not ok)
+        report['endpoints'][endpoint] = {
+            'count': len(samples),
+            'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+            'throughput': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+        }
+    report.update(sampler.summary())
+    return report
+
+def print_report(reports):
+    print()
+    print(f"{'配置':<14}{'接口':<10}{'次数':>6}{'错误率':>8}{'吞吐/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for report in reports:
+        name = f"{report['worker_class']}:{report['workers']}"
+        for endpoint, stats in report['endpoints'].items():
+            print(f"{name:<14}{endpoint:<10}{stats['count']:>6}{stats['error_rate']:>8.1%}{stats['throughput']:>9.2f}"
+                  f"{stats['p50']:>8.3f}{stats['p95']:>8.3f}{stats['p99']:>8.3f}")
+        if report['cpu_avg'] is None:
+            print(f"{name:<14}worker资源: 未安装psutil，无法采样")
+        else:
+            print(f"{name:<14}worker资源: CPU平均 {report['cpu_avg']}%，CPU峰值 {report['cpu_max']}%，"
+                  f"RSS峰值 {report['rss_max_mb']} MB，总耗时 {report['elapsed']}s")
+        print()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='微信读书笔记导出工具并发压测')
+    parser.add_argument('--users', type=int, default=10, help='并发虚拟用户数')
+    parser.add_argument('--iterations', type=int, default=1, help='每个用户重复次数')
+    parser.add_argument('--books', type=int, default=20, help='每个用户的书籍数量')
+    parser.add_argument('--notes', type=int, default=30, help='每本书的划线数量')
+    parser.add_argument('--latency', type=float, default=0.05, help='模拟服务每个请求的延迟（秒）')
+    parser.add_argument('--matrix', default='eventlet:1', help='要对比的 worker类型:数量，逗号分隔')
+    parser.add_argument('--app', default='app:app', help='gunicorn 应用入口')
+    parser.add_argument('--backend', default='', help='WEREAD_BACKEND（默认沿用应用配置）')
+    parser.add_argument('--delay', type=float, default=0, help='WEREAD_DELAY，压测时默认不等待')
+    parser.add_argument('--use-cache', action='store_true', help='不带 refresh=1，允许命中结果缓存')
+    parser.add_argument('--timeout', type=float, default=300, help='单个请求超时（秒）')
+    parser.add_argument('--json', help='把结果另存为JSON文件')
+    args = parser.parse_args(argv)
+
+    mock = start_mock_server(latency=args.latency)
+    mock_url = f'http://127.0.0.1:{mock.server_port}'
+    print(f"模拟微信读书服务: {mock_url}")
+
+    reports = []
+    for worker_class, workers in parse_matrix(args.matrix):
+        print(f"压测 {worker_class}:{workers}，{args.users} 个用户，每人 {args.books} 本书...")
+        try:
+            reports.append(run_config(worker_class, workers, mock_url, args))
+        except RuntimeError as e:
+            print(f"  跳过: {e}")
+
+    mock.shutdown()
+    print_report(reports)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -8,12 +8,21 @@ document.addEventListener('DOMContentLoaded', function() {
     const errorDetailsText = document.getElementById('errorDetailsText');
     const excelDownload = document.getElementById('excelDownload');
     const jsonDownload = document.getElementById('jsonDownload');
+    const markdownDownload = document.getElementById('markdownDownload');
     const sidInput = document.getElementById('sid');
     const progressBar = document.getElementById('progressBar');
     const statusMessage = document.getElementById('statusMessage');
     const bookCounter = document.getElementById('bookCounter');
     const currentBookTitle = document.getElementById('currentBookTitle');
     const progressLog = document.getElementById('progressLog');
+    const notesArea = document.getElementById('notesArea');
+    const notesCount = document.getElementById('notesCount');
+    const notesViewport = document.getElementById('notesViewport');
+    const notesSpacer = document.getElementById('notesSpacer');
+    const notesRows = document.getElementById('notesRows');
+    
+    // 浏览器支持读取流式响应时，边提取边显示每本书的笔记（/extract/stream）
+    const canStream = !!(window.ReadableStream && window.TextDecoder);
     
     // 连接WebSocket
     const socket = io();
@@ -109,11 +118,171 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // 笔记列表：虚拟滚动，只创建可见区域附近的行，几万条笔记时滚动也不会卡顿
+    const ROW_HEIGHT = 32;
+    const OVERSCAN = 10;
+    let noteRows = [];
+    let bookTotal = 0;
+    let noteTotal = 0;
+    let renderPending = false;
+    
+    function resetNotes() {
+        noteRows = [];
+        bookTotal = 0;
+        noteTotal = 0;
+        notesArea.style.display = 'none';
+        notesViewport.scrollTop = 0;
+        renderNotes();
+    }
+    
+    function addBook(book) {
+        noteRows.push({book: true, text: `《${book.title}》`, meta: `${book.author} · ${book.notes.length} 条`});
+        book.notes.forEach(note => {
+            noteRows.push({chapter: note[0], text: note[1], note: note[2], time: note[3]});
+        });
+        bookTotal += 1;
+        noteTotal += book.notes.length;
+        notesArea.style.display = 'block';
+        scheduleRender();
+    }
+    
+    // 同一帧内到达的多本书只渲染一次
+    function scheduleRender() {
+        if (renderPending) {
+            return;
+        }
+        renderPending = true;
+        requestAnimationFrame(function() {
+            renderPending = false;
+            renderNotes();
+        });
+    }
+    
+    function renderNotes() {
+        notesCount.textContent = `${bookTotal} 本书，${noteTotal} 条`;
+        notesSpacer.style.height = `${noteRows.length * ROW_HEIGHT}px`;
+        
+        const first = Math.max(0, Math.floor(notesViewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        const last = Math.min(noteRows.length,
+            Math.ceil((notesViewport.scrollTop + notesViewport.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+        const fragment = document.createDocumentFragment();
+        for (let i = first; i < last; i++) {
+            fragment.appendChild(renderRow(noteRows[i], i));
+        }
+        notesRows.innerHTML = '';
+        notesRows.appendChild(fragment);
+    }
+    
+    function renderRow(row, index) {
+        const div = document.createElement('div');
+        div.className = row.book ? 'note-row note-book' : 'note-row';
+        div.style.top = `${index * ROW_HEIGHT}px`;
+        
+        const text = document.createElement('span');
+        text.className = 'note-text';
+        text.textContent = row.note ? `${row.text} —— ${row.note}` : row.text;
+        const meta = document.createElement('span');
+        meta.className = 'note-meta';
+        meta.textContent = row.book ? row.meta : row.chapter;
+        div.appendChild(text);
+        div.appendChild(meta);
+        // 行高固定，过长的文本在悬停时显示完整内容
+        div.title = row.book ? row.text : [row.chapter, row.text, row.note, row.time].filter(Boolean).join('\n');
+        return div;
+    }
+    
+    notesViewport.addEventListener('scroll', scheduleRender);
+    
+    // 读取NDJSON流：进度更新进度条，每本书加入笔记列表，最后一行为结果
+    function streamExtract(formData) {
+        // 进度包含在流中，不需要再通过WebSocket发送
+        formData.delete('sid');
+        return fetch('/extract/stream', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => {
+            // 服务器不支持流式接口（如Vercel部署）时退回 /extract
+            if (response.status === 404 || !response.body) {
+                return null;
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let result = null;
+            
+            function handleLine(line) {
+                if (!line.trim()) {
+                    return;
+                }
+                const event = JSON.parse(line);
+                if (event.type === 'progress') {
+                    updateProgress(event);
+                } else if (event.type === 'book') {
+                    addBook(event);
+                } else if (event.type === 'result') {
+                    result = event;
+                }
+            }
+            
+            function read() {
+                return reader.read().then(({done, value}) => {
+                    if (done) {
+                        handleLine(buffer + decoder.decode());
+                        return result || {status: 'error', message: '与服务器的连接中断，未收到处理结果'};
+                    }
+                    buffer += decoder.decode(value, {stream: true});
+                    const lines = buffer.split('\n');
+                    buffer = lines.pop();
+                    lines.forEach(handleLine);
+                    return read();
+                });
+            }
+            return read();
+        });
+    }
+    
+    function postExtract(formData) {
+        return fetch('/extract', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => response.json());
+    }
+    
+    function showResult(data) {
+        // 隐藏进度条区域只有在成功时才执行，因为错误会在进度中更新
+        if (data.status === 'success') {
+            // 显示结果区域
+            resultArea.style.display = 'block';
+            
+            // 设置下载链接
+            excelDownload.href = data.files.excel;
+            jsonDownload.href = data.files.json;
+            if (data.files.markdown) {
+                markdownDownload.href = data.files.markdown;
+                markdownDownload.style.display = '';
+            } else {
+                markdownDownload.style.display = 'none';
+            }
+        } else {
+            // 显示错误信息
+            errorArea.style.display = 'block';
+            errorMessage.textContent = data.message || '处理过程中出错';
+            
+            if (data.details) {
+                errorDetailsText.textContent = data.details;
+            } else {
+                document.querySelector('[data-bs-target="#errorDetails"]').style.display = 'none';
+            }
+        }
+    }
+
     extractForm.addEventListener('submit', function(e) {
         e.preventDefault();
         
-        // 检查WebSocket连接
-        if (!socketConnected) {
+        // 检查WebSocket连接（流式接收时进度不经过WebSocket）
+        if (!canStream && !socketConnected) {
             alert('与服务器的连接已断开，请刷新页面后重试。');
             return;
         }
@@ -122,6 +291,7 @@ document.addEventListener('DOMContentLoaded', function() {
         resultArea.style.display = 'none';
         errorArea.style.display = 'none';
         progressLog.innerHTML = ''; // 清空日志
+        resetNotes();
         
         // 显示进度区域
         progressArea.style.display = 'block';
@@ -136,36 +306,11 @@ document.addEventListener('DOMContentLoaded', function() {
         submitBtn.disabled = true;
         submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> 处理中...';
         
-        // 获取表单数据
-        const formData = new FormData(extractForm);
-        
         // 发送请求
-        fetch('/extract', {
-            method: 'POST',
-            body: formData
-        })
-        .then(response => response.json())
-        .then(data => {
-            // 隐藏进度条区域只有在成功时才执行，因为错误会在WebSocket中更新
-            if (data.status === 'success') {
-                // 显示结果区域
-                resultArea.style.display = 'block';
-                
-                // 设置下载链接
-                excelDownload.href = data.files.excel;
-                jsonDownload.href = data.files.json;
-            } else {
-                // 显示错误信息
-                errorArea.style.display = 'block';
-                errorMessage.textContent = data.message || '处理过程中出错';
-                
-                if (data.details) {
-                    errorDetailsText.textContent = data.details;
-                } else {
-                    document.querySelector('[data-bs-target="#errorDetails"]').style.display = 'none';
-                }
-            }
-        })
+        const request = canStream ? streamExtract(new FormData(extractForm)) : Promise.resolve(null);
+        request
+        .then(data => data || postExtract(new FormData(extractForm)))
+        .then(showResult)
         .catch(error => {
             // 显示错误信息
             errorArea.style.display = 'block';
@@ -180,4 +325,4 @@ document.addEventListener('DOMContentLoaded', function() {
             submitBtn.innerHTML = '开始提取';
         });
     });
-}); 
\ No newline at end of file
+});
\ No newline at end of file
@@ -9,7 +9,17 @@ try:
     
     # 检查必要的文件是否存在
     required_files = ['app.py', 'notebook_v1.py', 'templates/index.html', 
-                     'static/css/style.css', 'static/js/script.js']
+                     'static/css/style.css', 'static/js/script.js',
+                     'weread/__init__.py', 'weread/client.py', 'weread/engine.py',
+                     'weread/backends.py', 'weread/exporters.py',
+                     'weread/async_client.py', 'weread/cache.py',
+                     'weread/adaptive.py', 'weread/scheduler.py',
+                     'weread/store.py', 'weread/dedup.py',
+                     'weread/spill.py', 'weread/profiling.py',
+                     'weread/xlsx.py', 'weread/jsonstream.py',
+                     'weread/columns.py', 'weread/batch.py',
+                     'weread/feed.py', 'weread/replay.py',
+                     'weread/projection.py', 'weread/pipeline.py']
     
     missing_files = []
     for file in required_files:
@@ -0,0 +1,57 @@
+"""回放测试的公共设置：固定时区，从录制的fixture回放API，与golden文件比较导出结果
+
+设置 WEREAD_UPDATE_GOLDEN=1 运行时用当前结果重新生成golden文件（确认输出变化是预期的之后）。
+"""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# 导出中的时间按本地时区格式化，固定时区使结果在任何机器上都相同
+os.environ['TZ'] = 'Asia/Shanghai'
+if hasattr(time, 'tzset'):
+    time.tzset()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from weread.client import get_notebooklist
+from weread.engine import extract_books
+from weread.replay import ReplaySession
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE = os.path.join(TESTS_DIR, 'fixtures', 'library.json')
+GOLDEN_DIR = os.path.join(TESTS_DIR, 'golden')
+UPDATE_GOLDEN = os.environ.get('WEREAD_UPDATE_GOLDEN') == '1'
+
+def replay_extract(session, **options):
+    """与 /extract 相同的流程：获取书籍列表，再提取全部书籍"""
+    books = get_notebooklist(session)
+    options.setdefault('read_info', True)
+    options.setdefault('delay', 0)
+    options.setdefault('near_dedup', False)
+    return extract_books(session, books, **options)
+
+def assert_golden(name, actual):
+    """actual 为 str（与文件内容逐字比较）或可JSON序列化的对象"""
+    path = os.path.join(GOLDEN_DIR, name)
+    if UPDATE_GOLDEN:
+        with open(path, 'w', encoding='utf-8') as f:
+            if isinstance(actual, str):
+                f.write(actual)
+            else:
+                json.dump(actual, f, ensure_ascii=False, indent=1)
+                f.write('\n')
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        expected = f.read() if isinstance(actual, str) else json.load(f)
+    assert actual == expected, f'与 {name} 不一致（输出变化是预期的时用 WEREAD_UPDATE_GOLDEN=1 重新生成）'
+
+@pytest.fixture
+def session():
+    replay = ReplaySession(FIXTURE)
+    yield replay
+    # 所有请求都应该在录制中，否则说明请求方式变了（需要重新录制）
+    assert replay.misses == []
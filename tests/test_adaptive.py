@@ -0,0 +1,104 @@
+"""自适应并发控制（AIMD）：成功时缓慢增加，出错或延迟突增时减半"""
+import asyncio
+import threading
+import time
+
+from conftest import replay_extract
+from weread import adaptive
+from weread.adaptive import AdaptiveLimiter
+
+def finish(limiter, count, latency=0.05, ok=True):
+    for _ in range(count):
+        limiter.acquire()
+        limiter.release(latency, ok)
+
+def test_additive_increase_up_to_max():
+    limiter = AdaptiveLimiter(initial=2, max_limit=4)
+    finish(limiter, 2)
+    assert 2.8 < limiter.limit < 3
+    finish(limiter, 50)
+    assert limiter.limit == 4
+
+def test_error_halves_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial=8, max_limit=8, cooldown=60)
+    finish(limiter, 2, ok=False)
+    assert limiter.limit == 4
+    assert limiter.snapshot()['errors'] == 2 and limiter.decreases == 1
+
+def test_latency_spike_decreases():
+    limiter = AdaptiveLimiter(initial=8, max_limit=8, cooldown=0)
+    finish(limiter, 20, latency=0.05)
+    finish(limiter, 1, latency=1.0)
+    assert limiter.limit == 4
+    # 毫秒级的波动不算突增
+    limiter = AdaptiveLimiter(initial=8, max_limit=8, cooldown=0)
+    finish(limiter, 20, latency=0.001)
+    finish(limiter, 1, latency=0.01)
+    assert limiter.limit == 8
+
+def test_in_flight_never_exceeds_limit():
+    limiter = AdaptiveLimiter(initial=2, max_limit=2)
+    peak = [0]
+    lock = threading.Lock()
+
+    def work():
+        for _ in range(5):
+            limiter.acquire()
+            with lock:
+                peak[0] = max(peak[0], limiter.in_flight)
+            time.sleep(0.002)
+            limiter.release(0.002, True)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2 and limiter.in_flight == 0
+
+def test_async_waiter_woken_by_release_from_thread():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    limiter.acquire()
+
+    async def wait_for_slot():
+        task = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        # 没有空位时挂起等待，而不是轮询
+        assert not task.done() and len(limiter._async_waiters) == 1
+        threading.Thread(target=limiter.release, args=(0.01, True)).start()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(wait_for_slot())
+    assert limiter.in_flight == 1 and limiter._async_waiters == []
+
+def test_cancelled_async_waiter_is_removed():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    limiter.acquire()
+
+    async def give_up():
+        try:
+            await asyncio.wait_for(limiter.acquire_async(), 0.01)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(give_up())
+    assert limiter._async_waiters == [] and limiter.in_flight == 1
+    limiter.release(0.01, True)
+    assert limiter.in_flight == 0
+
+def test_limiter_is_shared_per_identity():
+    assert adaptive.get_limiter('vid-a') is adaptive.get_limiter('vid-a')
+    assert adaptive.get_limiter('vid-a') is not adaptive.get_limiter('vid-b')
+    assert 'vid-a' not in ''.join(adaptive.metrics())
+
+def test_limited_session_extracts_same_books(session):
+    # 带控制器的会话：线程数取控制器上限，结果不变
+    session.limiter = AdaptiveLimiter(initial=2, max_limit=4)
+    data = replay_extract(session, backend='threaded')
+    assert len(data) == 12
+    assert session.limiter.in_flight == 0
+
+def test_serial_backend_warns(session, capsys):
+    session.limiter = AdaptiveLimiter(initial=2, max_limit=4)
+    replay_extract(session, backend='serial')
+    assert '需要 threaded 或 async 后端' in capsys.readouterr().out
@@ -0,0 +1,59 @@
+"""httpx异步客户端：结果与同步客户端相同，单本书的请求同时发出"""
+import asyncio
+import time
+
+import pytest
+
+from conftest import FIXTURE
+from weread import async_client, engine
+from weread.client import get_notebooklist
+from weread.replay import ReplaySession
+
+pytestmark = pytest.mark.skipif(not async_client.is_available(), reason='需要httpx')
+
+def run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, async_client.get_event_loop()).result(timeout=30)
+
+def client_for(session):
+    return async_client.create_async_client(session.cookies, transport=session.async_transport)
+
+def test_book_data_matches_sync_client(session):
+    books = get_notebooklist(session)
+
+    async def build_all():
+        async with client_for(session) as client:
+            return [await async_client.build_book_data(client, item['book'], read_info=True) for item in books]
+
+    expected = [engine.build_book_data(session, item['book'], read_info=True) for item in books]
+    assert run(build_all()) == expected
+
+def test_requests_of_one_book_overlap():
+    session = ReplaySession(FIXTURE, latency=0.05)
+    book = get_notebooklist(session)[0]['book']
+
+    async def build():
+        async with client_for(session) as client:
+            started = time.perf_counter()
+            await async_client.build_book_data(client, book, read_info=True)
+            return time.perf_counter() - started
+
+    # 5个请求，依次发出需要0.25秒
+    assert run(build()) < 0.15
+
+def test_extract_keeps_list_order(session):
+    books = get_notebooklist(session)
+
+    async def extract():
+        async with client_for(session) as client:
+            return await async_client.extract_books_async(client, books, concurrency=3)
+
+    data = run(extract())
+    assert [book['book_info']['bookId'] for book in data] == [item['book']['bookId'] for item in books]
+
+def test_sync_wrapper_stops_early(session):
+    books = get_notebooklist(session)
+    iterator = async_client.iter_books_sync(session, books, max_workers=2)
+    index, book_data, error = next(iterator)
+    assert error is None and book_data['book_info'] == books[index]['book']
+    # 提前退出时取消剩余的书，不会阻塞
+    iterator.close()
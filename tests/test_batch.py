@@ -0,0 +1,119 @@
+"""批量导出：账号文件解析、全局速率上限、单个账号的导出和汇总统计"""
+import json
+
+from weread import batch, engine, store
+from weread.replay import ReplaySession
+from conftest import FIXTURE, GOLDEN_DIR
+
+def test_read_accounts(tmp_path):
+    path = tmp_path / 'cookies.txt'
+    path.write_text('\n'.join([
+        '# 注释',
+        '',
+        '张三\twr_vid=1; wr_skey=a',
+        'wr_vid=2; wr_skey=b',
+        'wr_skey=c',
+        '张三\twr_vid=3',
+        'a/b c\twr_vid=4',
+    ]), encoding='utf-8')
+    assert batch.read_accounts(str(path)) == [
+        ('张三', 'wr_vid=1; wr_skey=a'),
+        ('2', 'wr_vid=2; wr_skey=b'),
+        ('account3', 'wr_skey=c'),
+        ('张三_4', 'wr_vid=3'),
+        ('a_b_c', 'wr_vid=4'),
+    ]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+
+def test_rate_limiter_spaces_requests(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(batch.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(batch.time, 'sleep', clock.sleep)
+    limiter = batch.SharedRateLimiter(10)
+    for _ in range(3):
+        limiter.wait()
+    # 第一个请求立即发出，之后每个推后 0.1 秒
+    assert clock.sleeps == [0.1, 0.2]
+    clock.now = 101.0
+    limiter.wait()
+    assert clock.sleeps == [0.1, 0.2]
+
+def test_unlimited_rate_never_waits(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(batch.time, 'sleep', clock.sleep)
+    limiter = batch.SharedRateLimiter(0)
+    for _ in range(5):
+        limiter.wait()
+    assert clock.sleeps == []
+
+class CountingLimiter:
+    def __init__(self):
+        self.waits = 0
+
+    def wait(self):
+        self.waits += 1
+
+def test_limit_session_counts_requests():
+    limiter, counter = CountingLimiter(), [0]
+    session = batch.limit_session(ReplaySession(FIXTURE), limiter, counter)
+    session.get('https://weread.qq.com/')
+    session.get('https://i.weread.qq.com/user/notebooks')
+    assert limiter.waits == 2 and counter == [2]
+
+def test_export_account(tmp_path, monkeypatch):
+    replay = ReplaySession(FIXTURE)
+    monkeypatch.setattr(batch, 'create_session', lambda cookie, user_agent: replay)
+    monkeypatch.setattr(batch, '_rate_limiter', None)
+    monkeypatch.setattr(store, 'ENABLED', False)
+    monkeypatch.setattr(engine, 'DEFAULT_DELAY', 0)
+    result = batch.export_account('a', 'wr_vid=1', str(tmp_path / 'a'), formats=('json',),
+                                  backend='threaded', max_workers=4)
+    assert replay.misses == []
+    assert result['status'] == 'ok' and result['error'] == ''
+
+    with open(f'{GOLDEN_DIR}/library.json', encoding='utf-8') as f:
+        expected = json.load(f)
+    assert (result['books'], result['failed_books']) == (len(expected), 0)
+    for book in expected:
+        book.pop('read_info', None)
+    with open(tmp_path / 'a' / 'weread_notes.json', encoding='utf-8') as f:
+        assert json.load(f) == expected
+    assert result['notes'] == sum(len(book['notes']) for book in expected)
+    # 主页、书籍列表，以及每本书的请求都经过速率上限
+    assert result['requests'] > result['books'] + 2
+    assert not (tmp_path / 'a' / 'weread_notes.xlsx').exists()
+
+def test_failed_account_reports_error(tmp_path, monkeypatch):
+    replay = ReplaySession(FIXTURE)
+    replay.responses.clear()
+    monkeypatch.setattr(batch, 'create_session', lambda cookie, user_agent: replay)
+    monkeypatch.setattr(batch.time, 'sleep', lambda seconds: None)
+    result = batch.export_account('b', 'wr_vid=2', str(tmp_path / 'b'))
+    assert result['status'] == 'error'
+    assert 'Cookie' in result['error']
+    assert result['books'] == 0
+    assert not (tmp_path / 'b').exists()
+
+def test_summarize():
+    results = [
+        {'status': 'ok', 'books': 10, 'failed_books': 0, 'notes': 100, 'requests': 40},
+        {'status': 'ok', 'books': 5, 'failed_books': 5, 'notes': 20, 'requests': 30},
+        {'status': 'error', 'books': 0, 'failed_books': 0, 'notes': 0, 'requests': 2},
+    ]
+    summary = batch.summarize(results, 2.0)
+    assert summary == {
+        'accounts': 3, 'succeeded': 2, 'failed': 1, 'books': 15, 'failed_books': 5, 'notes': 120,
+        'requests': 72, 'elapsed': 2.0, 'books_per_second': 7.5, 'requests_per_second': 36.0,
+        'book_error_rate': 0.25,
+    }
+    assert batch.summarize([], 0)['books_per_second'] == 0
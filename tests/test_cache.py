@@ -0,0 +1,72 @@
+"""提取结果缓存：书籍列表不变时复用，列表变化、过期或超出容量时失效"""
+from weread.cache import ResultCache, notebook_fingerprint
+from weread.client import get_notebooklist
+
+COOKIE = 'wr_vid=1001; wr_skey=abc'
+
+def test_key_changes_with_notebook_list(session):
+    cache = ResultCache(secret='s')
+    books = get_notebooklist(session)
+    key = cache.make_key(COOKIE, books)
+    # 另一次登录（wr_skey不同）是同一个用户
+    assert cache.make_key('wr_vid=1001; wr_skey=other', books) == key
+    updated = [dict(item) for item in books]
+    updated[0]['sort'] = updated[0]['sort'] + 1
+    assert cache.make_key(COOKIE, updated) != key
+    assert cache.make_key(COOKIE, books[1:]) != key
+    assert notebook_fingerprint(books) == notebook_fingerprint([dict(item) for item in books])
+
+def test_user_key_does_not_contain_identity():
+    key = ResultCache(secret='s').user_key(COOKIE)
+    assert '1001' not in key
+    assert ResultCache(secret='other').user_key(COOKIE) != key
+
+def test_put_replaces_entries_of_same_user(session):
+    cache = ResultCache(secret='s')
+    books = get_notebooklist(session)
+    cache.put(cache.make_key(COOKIE, books), ['old'], {})
+    key = cache.make_key(COOKIE, books[1:])
+    cache.put(key, ['new'], {'json': '/download'})
+    assert len(cache) == 1
+    assert cache.get(key)['data'] == ['new']
+    assert cache.has_user(COOKIE) and not cache.has_user('wr_vid=2')
+    assert cache.evict_user(COOKIE) == 1
+    assert cache.get(key) is None
+
+def test_expired_and_least_recently_used_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('weread.cache.time.time', lambda: now[0])
+    cache = ResultCache(ttl=10, max_entries=2, secret='s')
+    for user in range(3):
+        cache.put(f'user{user}:x', [user], {})
+    assert cache.get('user0:x') is None
+    assert cache.get('user1:x')['data'] == [1]
+    now[0] += 11
+    assert cache.purge_expired() == 2
+    assert len(cache) == 0
+
+class Closable(list):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_removed_entries_are_closed(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('weread.cache.time.time', lambda: now[0])
+    cache = ResultCache(ttl=10, max_entries=2, secret='s')
+    data = [Closable([user]) for user in range(4)]
+    cache.put('user0:a', data[0], {})
+    # 同一用户的新条目替换旧条目
+    cache.put('user0:b', data[1], {})
+    assert data[0].closed and not data[1].closed
+    # 放回同一份数据（用缓存的数据重新导出）时不关闭
+    cache.put('user0:b', data[1], {})
+    assert not data[1].closed
+    # 超出容量
+    cache.put('user2:a', data[2], {})
+    cache.put('user3:a', data[3], {})
+    assert data[1].closed
+    assert cache.evict('user2:a') and data[2].closed
+    now[0] += 11
+    assert cache.get('user3:a') is None and data[3].closed
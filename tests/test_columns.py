@@ -0,0 +1,93 @@
+"""列式批量转换与逐行 note_to_row 结果一致；没有numpy时（如Vercel）退回逐行转换，导出相同"""
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from weread import columns, exporters
+from weread.exporters import EXPORT_COLUMNS, export_to_excel, note_to_row
+from conftest import assert_golden, replay_extract
+from test_replay import xlsx_values
+
+requires_numpy = pytest.mark.skipif(not columns.is_available(), reason='需要numpy')
+
+def per_row(data):
+    rows = []
+    for book in data:
+        book_info = book['book_info']
+        for note in book['notes']:
+            row = note_to_row(book_info.get('title', ''), book_info.get('author', ''), note)
+            rows.append([row[column] for column in EXPORT_COLUMNS])
+    return rows
+
+@requires_numpy
+def test_columns_match_per_row(session):
+    data = replay_extract(session)
+    assert [list(row) for row in columns.iter_export_rows(data)] == per_row(data)
+    converted = columns.notes_to_columns(data)
+    assert list(converted) == EXPORT_COLUMNS
+    assert [list(row) for row in zip(*(values.tolist() for values in converted.values()))] == per_row(data)
+
+@requires_numpy
+def test_review_text_selection():
+    book = {'book_info': {'title': '书', 'author': '作者'}, 'notes': [
+        {'markText': '划线', 'createTime': 1700000000},
+        {'reviewId': 'r1', 'abstract': '原文', 'markText': '想法', 'content': '想法', 'createTime': 1700000001},
+        {'reviewId': 'r2', 'abstract': '', 'markText': '想法2', 'content': '想法2', 'createTime': 1700000002},
+    ]}
+    assert [list(row) for row in columns.iter_export_rows([book])] == per_row([book])
+
+@pytest.fixture
+def new_york():
+    # 有夏令时切换的时区
+    previous = os.environ['TZ']
+    os.environ['TZ'] = 'America/New_York'
+    time.tzset()
+    yield
+    os.environ['TZ'] = previous
+    time.tzset()
+
+@requires_numpy
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason='需要 time.tzset')
+def test_timestamps_across_dst(new_york):
+    # 2024-03-10 和 2024-11-03 的切换前后，每10分钟一个时间戳
+    timestamps = [start + step * 600 for start in (1710044000, 1730606000) for step in range(40)]
+    expected = [datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') for ts in timestamps]
+    assert columns.format_timestamps(timestamps).tolist() == expected
+    assert columns.format_timestamps([]).tolist() == []
+
+def test_fallback_without_numpy(session, tmp_path, monkeypatch):
+    data = replay_extract(session)
+    expected = per_row(data)
+    monkeypatch.setattr(columns, 'np', None)
+    assert [list(row) for row in exporters.iter_export_rows(data)] == expected
+    # 没有numpy时Excel逐行写入，单元格与golden相同
+    path = str(tmp_path / 'notes.xlsx')
+    export_to_excel(data, path, layout='flat')
+    assert_golden('library_xlsx.json', xlsx_values(path))
+
+@requires_numpy
+@pytest.mark.parametrize('batch_notes', [1, 7, 10 ** 6])
+def test_batched_rows_match_per_row(session, monkeypatch, batch_notes):
+    # 逐本写出的导出把连续几本书合并成一批转换，结果与逐行相同
+    data = replay_extract(session)
+    monkeypatch.setattr(columns, 'BATCH_NOTES', batch_notes)
+    monkeypatch.setattr(columns, 'MIN_NOTES', 1)
+    assert [list(row) for row in exporters.iter_export_rows(iter(data))] == per_row(data)
+
+@requires_numpy
+def test_small_batches_use_per_row(session, monkeypatch):
+    data = replay_extract(session)
+    notes = sum(len(book['notes']) for book in data)
+    calls = []
+    convert = columns.notes_to_columns
+    monkeypatch.setattr(columns, 'notes_to_columns', lambda books: calls.append(len(books)) or convert(books))
+    monkeypatch.setattr(columns, 'MIN_NOTES', notes + 1)
+    assert [list(row) for row in exporters.iter_export_rows(data)] == per_row(data)
+    assert calls == []
+    # 足够多时整个书库一次转换
+    monkeypatch.setattr(columns, 'MIN_NOTES', notes)
+    monkeypatch.setattr(columns, 'BATCH_NOTES', notes + 1)
+    assert [list(row) for row in exporters.iter_export_rows(data)] == per_row(data)
+    assert calls == [len(data)]
@@ -0,0 +1,49 @@
+"""流式CSV导出：按书架顺序输出，与Excel导出的行相同"""
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from conftest import GOLDEN_DIR
+from weread import engine
+from weread.client import get_notebooklist
+from weread.exporters import iter_csv_export
+
+def csv_rows(chunks):
+    data = b''.join(chunks)
+    assert data.startswith('﻿'.encode('utf-8'))
+    return list(csv.reader(io.StringIO(data.decode('utf-8-sig'))))
+
+def expected_rows():
+    with open(os.path.join(GOLDEN_DIR, 'library_xlsx.json'), encoding='utf-8') as f:
+        sheet = json.load(f)['Sheet1']
+    return [['' if value is None else str(value) for value in row] for row in sheet]
+
+@pytest.mark.parametrize('policy', ['sort', 'small_first', 'recent'])
+def test_rows_follow_shelf_order(session, policy):
+    books = get_notebooklist(session)
+    chunks = list(iter_csv_export(session, books, backend='threaded', delay=0, policy=policy))
+    assert csv_rows(chunks) == expected_rows()
+
+def test_failed_book_is_skipped(session, monkeypatch):
+    books = get_notebooklist(session)
+    failing = books[0]['book']['bookId']
+    build_book_data = engine.build_book_data
+
+    def flaky(session, book, *args, **kwargs):
+        if book['bookId'] == failing:
+            raise RuntimeError('请求失败')
+        return build_book_data(session, book, *args, **kwargs)
+
+    # 第一本书失败时，其余的书照常按顺序输出
+    monkeypatch.setattr(engine, 'build_book_data', flaky)
+    rows = csv_rows(iter_csv_export(session, books, backend='threaded', delay=0))
+    assert rows == [row for row in expected_rows() if row[0] != books[0]['book']['title']]
+
+def test_endpoint_accepts_post_only():
+    app = pytest.importorskip('app')
+    client = app.app.test_client()
+    assert client.get('/export/csv?cookie=wr_vid=1').status_code == 405
+    assert client.post('/export/csv', data={}).status_code == 400
@@ -0,0 +1,50 @@
+"""笔记去重：单本书内的重复和重叠划线，跨书近似重复标记"""
+from conftest import replay_extract
+from weread import dedup
+from weread.dedup import dedupe_notes, mark_near_duplicates
+
+def highlight(bookmark_id, start, end, text, chapter=1):
+    return {'bookmarkId': bookmark_id, 'type': 1, 'chapterUid': chapter, 'range': f'{start}-{end}', 'markText': text}
+
+def test_exact_duplicates_and_quoted_highlights():
+    review = {'reviewId': 'r1', 'chapterUid': 1, 'range': '100-110', 'abstract': '被引用的原文', 'content': '想法'}
+    notes = [
+        highlight('a', 0, 5, '第一条 划线'),
+        highlight('b', 50, 55, '第一条划线'),
+        highlight('c', 100, 110, '被引用的原文'),
+        review,
+        dict(review, reviewId='r2'),
+        highlight('d', 0, 5, '第一条划线', chapter=2),
+    ]
+    assert [note.get('bookmarkId') or note['reviewId'] for note in dedupe_notes(notes)] == ['a', 'r1', 'd']
+
+def test_overlapping_highlights_are_merged_without_mutating_input():
+    notes = [highlight('a', 0, 10, 'abcdefghij'), highlight('b', 2, 6, 'cdef'), highlight('c', 8, 14, 'ijklmn')]
+    result = dedupe_notes(notes)
+    assert [(note['bookmarkId'], note['range'], note['markText']) for note in result] == [('a', '0-14', 'abcdefghijklmn')]
+    assert notes[0]['markText'] == 'abcdefghij'
+    # 位置重叠但文本接不上时保留两条
+    assert len(dedupe_notes([highlight('a', 0, 10, 'abcdefghij'), highlight('b', 8, 14, 'xyz123')])) == 2
+
+def test_fixture_has_no_duplicates(session):
+    data = replay_extract(session, near_dedup=False)
+    for book in data:
+        assert dedupe_notes(book['notes']) == book['notes']
+
+def near_dedup_books():
+    text = '这是一段足够长的划线内容，用来测试跨书的近似重复检测是否有效'
+    return [
+        {'book_info': {'bookId': '1'}, 'notes': [highlight('a', 0, 30, text), highlight('b', 40, 70, text + '！')]},
+        {'book_info': {'bookId': '2'}, 'notes': [highlight('c', 0, 30, text + '。'), highlight('d', 40, 50, '完全不同的另一条较长的划线文字')]},
+    ]
+
+def test_near_duplicates_across_books(monkeypatch):
+    for numpy in (dedup.np, None):
+        monkeypatch.setattr(dedup, 'np', numpy)
+        books = near_dedup_books()
+        pairs = mark_near_duplicates(books)
+        # 同一本书内不算；较晚出现的笔记被标记
+        assert [(book_id, key, other) for book_id, key, other, _ in pairs] == [('2', '2:c', '1:a')]
+        assert books[1]['notes'][0]['near_duplicate_of'] == '1:a'
+        assert 'near_duplicate_of' not in books[1]['notes'][1]
+        assert all('near_duplicate_of' not in note for note in books[0]['notes'])
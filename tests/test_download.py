@@ -0,0 +1,46 @@
+"""/download 的几种发送方式，以及Markdown目录的zip下载"""
+import io
+import zipfile
+
+import pytest
+
+app = pytest.importorskip('app')
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'OUTPUT_DIR', str(tmp_path))
+    job = tmp_path / 'job1'
+    (job / 'notes_markdown').mkdir(parents=True)
+    (job / 'notes.json').write_text('[]', encoding='utf-8')
+    (job / 'notes_markdown' / '书.md').write_text('# 书', encoding='utf-8')
+    return app.app.test_client()
+
+def test_direct(client, monkeypatch):
+    monkeypatch.setattr(app, 'DOWNLOAD_MODE', 'direct')
+    response = client.get('/download?dir=job1&file=notes.json')
+    assert response.status_code == 200 and response.data == b'[]'
+
+def test_accel_redirect(client, monkeypatch):
+    monkeypatch.setattr(app, 'DOWNLOAD_MODE', 'accel')
+    monkeypatch.setattr(app, 'ACCEL_PREFIX', '/protected/')
+    response = client.get('/download?dir=job1&file=notes.json')
+    assert response.headers['X-Accel-Redirect'] == '/protected/job1/notes.json'
+    assert response.headers['Content-Type'] == 'application/json'
+    assert response.data == b''
+
+def test_sendfile(client, monkeypatch):
+    monkeypatch.setattr(app, 'DOWNLOAD_MODE', 'sendfile')
+    monkeypatch.setitem(app.app.config, 'USE_X_SENDFILE', True)
+    response = client.get('/download?dir=job1&file=notes.json')
+    assert response.headers['X-Sendfile'].endswith('notes.json')
+    assert response.data == b''
+
+def test_markdown_directory_is_zipped(client):
+    response = client.get('/download?dir=job1&file=notes_markdown.zip')
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        assert zf.read('书.md').decode('utf-8') == '# 书'
+
+def test_rejects_paths_outside_outputs(client):
+    assert client.get('/download?dir=..&file=notes.json').status_code == 400
+    assert client.get('/download?dir=job1/x&file=notes.json').status_code == 400
+    assert client.get('/download?dir=job1&file=missing.json').status_code == 404
@@ -0,0 +1,42 @@
+"""共享的客户端和提取引擎：解析、默认执行方式，以及Vercel导出的行"""
+import os
+
+import pytest
+
+from conftest import replay_extract
+from weread import adaptive, columns, engine
+from weread.client import create_session, parse_bookmark_list
+
+def test_bookmark_without_range_is_kept():
+    data = {'updated': [{'bookmarkId': 'b1', 'type': 1, 'chapterUid': 2, 'markText': '划线'},
+                        {'bookmarkId': 'b2', 'type': 1, 'chapterUid': 1, 'range': '5-9', 'markText': '划线'}]}
+    assert parse_bookmark_list(data) == data['updated']
+    notes = engine.assemble_notes(parse_bookmark_list(data), [], {})
+    assert [note['bookmarkId'] for note in notes] == ['b2', 'b1']
+
+@pytest.mark.skipif(any(name in os.environ for name in ('WEREAD_BACKEND', 'WEREAD_DELAY', 'WEREAD_ADAPTIVE')),
+                    reason='执行方式由环境变量指定')
+def test_defaults_are_serial_without_adaptive_concurrency():
+    assert engine.DEFAULT_BACKEND == 'serial'
+    assert engine.DEFAULT_DELAY == 1
+    assert not adaptive.ENABLED
+    assert getattr(create_session('wr_vid=1'), 'limiter', None) is None
+
+@pytest.fixture(params=['columns', 'rows'])
+def vercel(request, monkeypatch):
+    if request.param == 'columns' and not columns.is_available():
+        pytest.skip('需要numpy')
+    if request.param == 'rows':
+        monkeypatch.setattr(columns, 'np', None)
+    return pytest.importorskip('vercel')
+
+def test_vercel_rows_classify_reviews(session, vercel):
+    data = replay_extract(session)
+    rows = list(vercel.iter_vercel_rows(data))
+    notes = [note for book in data for note in book['notes']]
+    assert len(rows) == len(notes)
+    types = [row[vercel.VERCEL_HEADERS.index('类型')] for row in rows]
+    assert types.count('笔记') == sum(1 for note in notes if note.get('reviewId')) > 0
+    review = next(row for row in rows if row[4] == '笔记')
+    assert dict(zip(vercel.VERCEL_HEADERS, review))['划线'] == '模拟被评论的原文'
+    assert dict(zip(vercel.VERCEL_HEADERS, review))['笔记'] == '模拟的想法'
@@ -0,0 +1,79 @@
+"""NDJSON推送：每本书的事件与Excel导出的列一致，/extract/stream 逐行返回进度、每本书和最终结果"""
+import json
+
+import pytest
+
+from weread import engine, feed, store
+from weread.cache import ResultCache
+from weread.exporters import note_to_row
+from weread.replay import ReplaySession
+from conftest import FIXTURE, GOLDEN_DIR
+
+app = pytest.importorskip('app')
+
+def test_book_event_rows():
+    book = {'book_info': {'bookId': '7', 'title': '书', 'author': '作者'}, 'notes': [
+        {'markText': '划线', 'chapter_title': '第一章', 'createTime': 1700000000},
+        {'reviewId': 'r1', 'abstract': '原文', 'markText': '想法', 'content': '想法', 'createTime': 1700000001},
+    ]}
+    event = feed.book_event(book)
+    assert {key: event[key] for key in ('type', 'bookId', 'title', 'author')} == {
+        'type': 'book', 'bookId': '7', 'title': '书', 'author': '作者'}
+    expected = [note_to_row('书', '作者', note) for note in book['notes']]
+    assert event['notes'] == [[row[field] for field in feed.NOTE_FIELDS] for row in expected]
+    assert event['notes'][1][1:3] == ['原文', '想法']
+
+def test_dumps_is_one_compact_line():
+    line = feed.dumps(feed.result_event({'status': 'success', 'message': '完成'}, 200))
+    assert line.endswith('\n') and line.count('\n') == 1
+    assert '完成' in line and ': ' not in line
+    assert json.loads(line) == {'status': 'success', 'message': '完成', 'type': 'result', 'http_status': 200}
+    assert feed.progress_event({'percent': 5}) == {'percent': 5, 'type': 'progress'}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'result_cache', ResultCache())
+    monkeypatch.setattr(app, 'create_session', lambda cookie, user_agent: ReplaySession(FIXTURE))
+    monkeypatch.setattr(store, 'ENABLED', False)
+    monkeypatch.setattr(engine, 'DEFAULT_DELAY', 0)
+    return app.app.test_client()
+
+def stream_events(client, **form):
+    response = client.post('/extract/stream', data=form)
+    assert response.mimetype == feed.MIMETYPE
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def golden_book_ids():
+    with open(f'{GOLDEN_DIR}/library.json', encoding='utf-8') as f:
+        return sorted(book['book_info']['bookId'] for book in json.load(f))
+
+def test_stream_books_then_result(client):
+    events = stream_events(client, cookie='wr_vid=1; wr_skey=a')
+    assert events[0]['type'] == 'progress'
+    result = events[-1]
+    assert result['type'] == 'result' and result['http_status'] == 200
+    assert result['status'] == 'success' and set(result['files']) == {'excel', 'json', 'markdown'}
+    books = [event for event in events if event['type'] == 'book']
+    assert sorted(event['bookId'] for event in books) == golden_book_ids()
+    assert all(event['type'] == 'progress' for event in events[1:-1] if event['type'] != 'book')
+
+    # 书籍列表没有变化时使用缓存的结果，同样逐本推送
+    events = stream_events(client, cookie='wr_vid=1; wr_skey=a')
+    assert events[-1]['cached'] is True
+    assert sorted(event['bookId'] for event in events if event['type'] == 'book') == golden_book_ids()
+
+def test_stream_reports_errors(client):
+    events = stream_events(client)
+    assert events[-1] == {'status': 'error', 'message': '请输入有效的Cookie', 'type': 'result', 'http_status': 400}
+
+def test_form_has_extract_options(client):
+    page = client.get('/').get_data(as_text=True)
+    for field in ('read_info', 'refresh', 'pinned', 'threads'):
+        assert f'name="{field}"' in page
+
+def test_form_book_ids():
+    with app.app.test_request_context('/extract', method='POST', data={'pinned': ' 1, 2，3  4,,', 'threads': ''}):
+        assert app.form_book_ids('pinned') == ['1', '2', '3', '4']
+        assert app.form_book_ids('threads') == []
+        assert app.form_book_ids('missing') == []
@@ -0,0 +1,36 @@
+"""压测工具：模拟的微信读书服务和报告统计"""
+import pytest
+import requests
+
+from loadtest.mock_weread import start_mock_server
+from loadtest.run import parse_matrix, percentile
+from weread.client import parse_bookmark_list, parse_notebooklist, parse_review_list
+
+@pytest.fixture
+def mock_url():
+    server = start_mock_server()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+def test_library_size_follows_cookie(mock_url):
+    headers = {'Cookie': 'lt_books=3; lt_notes=5'}
+    books = parse_notebooklist(requests.get(f'{mock_url}/user/notebooks', headers=headers).json())
+    assert [item['bookId'] for item in books] == ['0', '1', '2']
+    bookmarks = requests.get(f'{mock_url}/book/bookmarklist', params={'bookId': '1'}, headers=headers).json()
+    assert len(parse_bookmark_list(bookmarks)) == 5
+
+def test_responses_parse_like_weread(mock_url):
+    summary, reviews = parse_review_list(requests.get(f'{mock_url}/review/list', params={'bookId': '1'}).json())
+    assert [item['review']['type'] for item in summary] == [4]
+    assert [review['markText'] for review in reviews] == ['模拟的想法']
+    chapters = requests.post(f'{mock_url}/book/chapterInfos', json={'bookIds': ['1']}).json()
+    assert len(chapters['data'][0]['updated']) == 10
+    assert requests.get(f'{mock_url}/unknown').status_code == 404
+
+def test_percentile_and_matrix():
+    assert percentile([], 95) == 0.0
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3, 1, 2], 100) == 3
+    assert parse_matrix('eventlet:1, gthread:4,sync') == [('eventlet', 1), ('gthread', 4), ('sync', 1)]
@@ -0,0 +1,45 @@
+"""Markdown导出：每本书一个文件，下载时边压缩边输出zip"""
+import io
+import os
+import zipfile
+
+from conftest import assert_golden, replay_extract
+from weread.exporters import export_to_markdown, render_book_markdown, stream_zip_directory
+
+def read_dir(dirname):
+    result = {}
+    for name in sorted(os.listdir(dirname)):
+        with open(os.path.join(dirname, name), encoding='utf-8') as f:
+            result[name] = f.read()
+    return result
+
+def test_markdown_matches_golden(session, tmp_path):
+    data = replay_extract(session)
+    export_to_markdown(data, str(tmp_path / 'md'))
+    files = read_dir(str(tmp_path / 'md'))
+    assert len(files) == len(data)
+    assert_golden('library_markdown.json', files)
+
+def test_markdown_groups_notes_by_chapter(session):
+    book = replay_extract(session)[0]
+    text = render_book_markdown(book)
+    assert text.startswith('---\ntitle: "模拟书籍0"\n')
+    chapters = [line for line in text.splitlines() if line.startswith('## ')]
+    # 每个章节只出现一次，书评在最后
+    assert len(chapters) == len(set(chapters))
+    assert chapters[-1] == '## 书评'
+    assert '**笔记**：模拟的想法' in text
+    assert '> 模拟被评论的原文' in text
+
+def test_duplicate_titles_get_separate_files(tmp_path):
+    books = [{'book_info': {'bookId': str(i), 'title': '同名/书'}, 'notes': [], 'summary': []} for i in range(3)]
+    export_to_markdown(iter(books), str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['同名_书.md', '同名_书_1.md', '同名_书_2.md']
+
+def test_zip_stream_contains_every_file(session, tmp_path):
+    data = replay_extract(session)
+    export_to_markdown(data, str(tmp_path / 'md'))
+    chunks = list(stream_zip_directory(str(tmp_path / 'md'), chunk_size=256))
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert {name: zf.read(name).decode('utf-8') for name in zf.namelist()} == read_dir(str(tmp_path / 'md'))
@@ -0,0 +1,86 @@
+"""边下载边解析笔记本列表：任意分块方式下的解析结果与一次性解析相同，流式提取的结果与golden一致"""
+import json
+
+import pytest
+
+from weread import async_client, client
+from weread.client import get_notebooklist, iter_notebooklist
+from weread.engine import BookStream, extract_books
+from weread.jsonstream import iter_array_items
+from weread.replay import ReplayResponse
+from conftest import assert_golden
+from test_replay import export_json_text
+
+DOCUMENT = json.dumps({
+    'synckey': 1700000000,
+    'meta': {'books': [{'skip': True}], 'nested': [1, [2, 3]]},
+    'books': [
+        {'bookId': '1', 'book': {'title': '书名"引号"', 'price': 12.5}, 'sort': 1700000001},
+        {'bookId': '2', 'book': {'title': '第二本\\n换行', 'tags': []}, 'sort': 17},
+        {'bookId': '3', 'book': None, 'sort': -1.5e3},
+    ],
+    'totalBookCount': 3,
+}, ensure_ascii=False, indent=1)
+
+def chunked(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, len(DOCUMENT)])
+def test_items_match_full_parse(size):
+    assert list(iter_array_items(chunked(DOCUMENT, size), 'books')) == json.loads(DOCUMENT)['books']
+
+def test_missing_or_empty_array():
+    assert list(iter_array_items(['{"other": [1, 2]}'], 'books')) == []
+    assert list(iter_array_items(['{"books": []}'], 'books')) == []
+    assert list(iter_array_items(['[1, 2]'], 'books')) == []
+    assert list(iter_array_items([''], 'books')) == []
+
+def test_truncated_array_raises():
+    items = iter_array_items(chunked('{"books": [{"bookId": "1"}, {"bookId"', 4), 'books')
+    assert next(items) == {'bookId': '1'}
+    with pytest.raises(ValueError):
+        next(items)
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 512, 1 << 20])
+def test_iter_matches_get_notebooklist(session, chunk_size):
+    # 分块会切开多字节的UTF-8字符；两者都按服务器返回的顺序，投影相同
+    assert list(iter_notebooklist(session, chunk_size=chunk_size)) == get_notebooklist(session)
+
+def test_retries_then_gives_up(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(client.time, 'sleep', sleeps.append)
+
+    class FailingSession:
+        calls = 0
+
+        def get(self, url, **kwargs):
+            self.calls += 1
+            return ReplayResponse(500, {'errcode': -1})
+
+    failing = FailingSession()
+    assert list(iter_notebooklist(failing, max_retries=3)) == []
+    assert failing.calls == 3
+    # 最后一次失败后不再等待
+    assert sleeps == [2, 2]
+
+def test_book_stream_records_items():
+    stream = BookStream(iter([{'bookId': 'a'}, {'bookId': 'b'}]))
+    assert len(stream) == 0 and not stream.complete
+    items = iter(stream)
+    assert next(items) == {'bookId': 'a'}
+    assert len(stream) == 1 and stream[0] == {'bookId': 'a'} and not stream.complete
+    assert list(items) == [{'bookId': 'b'}]
+    assert stream.complete and stream[1] == {'bookId': 'b'}
+
+BACKENDS = [
+    'threaded',
+    pytest.param('async', marks=pytest.mark.skipif(not async_client.is_available(), reason='需要httpx')),
+]
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_streamed_extraction_matches_golden(session, tmp_path, backend):
+    # 书籍按到达顺序并行获取，结果仍按 sort 排列
+    books = BookStream(iter_notebooklist(session, chunk_size=256))
+    data = extract_books(session, books, backend=backend, max_workers=4, read_info=True, near_dedup=False, delay=0)
+    assert books.complete
+    assert_golden('library.json', export_json_text(data, tmp_path))
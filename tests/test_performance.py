@@ -0,0 +1,86 @@
+"""基于回放的吞吐量测试：books/sec 低于 perf_baseline.json 中的基线（减去容差）时失败
+
+- 提取：回放时每个请求模拟固定的网络延迟，测量各执行后端的并发效果（不加书与书之间的等待）
+- 导出：把录制的书库复制多份，测量JSON、Excel、Markdown导出的速度（纯CPU）
+
+结果与机器性能和负载有关，默认不运行（pytest.ini 中的 -m "not perf"），用 `python -m pytest -m perf` 运行。
+换到性能不同的CI机器上时，用 WEREAD_UPDATE_BASELINE=1 重新测量并写入基线；
+WEREAD_PERF_TOLERANCE（默认0.5）为允许低于基线的比例。
+"""
+import copy
+import json
+import os
+import time
+
+import pytest
+
+from conftest import FIXTURE, TESTS_DIR, replay_extract
+from weread import async_client
+from weread.exporters import export_to_excel, export_to_json, export_to_markdown
+from weread.replay import ReplaySession
+
+pytestmark = pytest.mark.perf
+
+BASELINE_FILE = os.path.join(TESTS_DIR, 'perf_baseline.json')
+UPDATE_BASELINE = os.environ.get('WEREAD_UPDATE_BASELINE') == '1'
+TOLERANCE = float(os.environ.get('WEREAD_PERF_TOLERANCE', '0.5'))
+# 每个回放请求的模拟延迟（秒）
+LATENCY = 0.01
+REPEAT = 3
+EXPORT_COPIES = 20
+
+def best_rate(run, books, repeat=REPEAT):
+    """重复运行取最快一次，返回 books/sec"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return books / best
+
+def check_baseline(name, rate):
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    if UPDATE_BASELINE:
+        baseline[name] = round(rate, 1)
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write('\n')
+        return
+    if name not in baseline:
+        pytest.skip(f'{name} 没有基线（用 WEREAD_UPDATE_BASELINE=1 生成）')
+    minimum = baseline[name] * (1 - TOLERANCE)
+    assert rate >= minimum, f'{name}: {rate:.1f} books/sec，低于基线 {baseline[name]} 的 {1 - TOLERANCE:.0%}'
+
+@pytest.mark.parametrize('backend', [
+    'serial',
+    'threaded',
+    pytest.param('async', marks=pytest.mark.skipif(not async_client.is_available(), reason='需要httpx')),
+])
+def test_extract_throughput(backend):
+    session = ReplaySession(FIXTURE, latency=LATENCY)
+    results = []
+    rate = best_rate(lambda: results.append(replay_extract(session, backend=backend, max_workers=4, delay=0)),
+                     books=len(replay_extract(ReplaySession(FIXTURE))))
+    assert session.misses == []
+    check_baseline(f'extract_{backend}', rate)
+
+def test_export_throughput(tmp_path):
+    # 每份书库中的书换成不同的ID，避免Markdown文件名重复
+    library = replay_extract(ReplaySession(FIXTURE))
+    data = []
+    for copy_index in range(EXPORT_COPIES):
+        for book in copy.deepcopy(library):
+            book['book_info']['bookId'] = f"{book['book_info']['bookId']}_{copy_index}"
+            book['book_info']['title'] = f"{book['book_info']['title']}_{copy_index}"
+            data.append(book)
+
+    def run():
+        export_to_json(data, str(tmp_path / 'notes.json'))
+        export_to_excel(data, str(tmp_path / 'notes.xlsx'), layout='flat')
+        export_to_markdown(data, str(tmp_path / 'markdown'))
+
+    check_baseline('export', best_rate(run, len(data)))
@@ -0,0 +1,116 @@
+"""边获取边导出的流水线：结果与先获取再导出相同，导出出错时不会卡住获取"""
+import time
+
+import pytest
+
+from conftest import FIXTURE, assert_golden, replay_extract
+from test_replay import export_json_text, openpyxl, xlsx_values
+from weread import exporters
+from weread.client import get_notebooklist, iter_notebooklist
+from weread.engine import BookStream
+from weread.exporters import export_to_excel, export_to_json
+from weread.pipeline import extract_and_export
+from weread.replay import ReplaySession
+from weread.spill import SPILL_FILENAME
+
+def run_pipeline(session, books, tmp_path, **options):
+    path = tmp_path / 'pipeline.json'
+    results = extract_and_export(session, books, [lambda data: export_to_json(data, str(path))],
+                                 read_info=True, **options)
+    return results, path.read_text(encoding='utf-8')
+
+@pytest.mark.parametrize('backend', ['serial', 'threaded'])
+def test_pipeline_output_matches_golden(session, tmp_path, backend):
+    results, text = run_pipeline(session, get_notebooklist(session), tmp_path, backend=backend, delay=0)
+    assert_golden('library.json', text)
+    # 返回的结果（缓存和本地数据库使用）与导出的内容相同
+    assert export_json_text(results, tmp_path) == text
+
+def test_pipeline_with_streamed_list_and_scheduling(session, tmp_path):
+    books = BookStream(iter_notebooklist(session, chunk_size=512))
+    _, text = run_pipeline(session, books, tmp_path, backend='threaded', delay=0)
+    assert_golden('library.json', text)
+
+    # 按调度策略乱序处理时，导出仍按原来的顺序
+    _, text = run_pipeline(session, get_notebooklist(session), tmp_path, backend='threaded', delay=0, policy='recent')
+    assert_golden('library.json', text)
+
+def test_pipeline_spills_results(session, tmp_path):
+    results, text = run_pipeline(session, get_notebooklist(session), tmp_path, delay=0,
+                                 memory_limit=1024, spill_dir=str(tmp_path))
+    assert results.spilled
+    assert_golden('library.json', text)
+
+def test_exporter_error_is_raised_without_blocking(session, tmp_path):
+    def broken(data):
+        next(iter(data))
+        raise RuntimeError('写入失败')
+
+    with pytest.raises(RuntimeError, match='写入失败'):
+        extract_and_export(session, get_notebooklist(session), [broken], queue_size=1, delay=0)
+
+def test_fetch_and_export_overlap(tmp_path):
+    session = ReplaySession(FIXTURE, latency=0.01)
+    books = get_notebooklist(session)
+
+    def slow_export(data):
+        for _ in data:
+            time.sleep(0.05)
+
+    start = time.perf_counter()
+    extract_and_export(session, books, [slow_export], backend='serial', delay=0)
+    elapsed = time.perf_counter() - start
+    # 获取约 0.5 秒（每本书4个请求），导出约 0.6 秒，先后进行需要1.1秒左右
+    assert elapsed < 0.95
+
+def test_results_stay_in_memory_without_limit(session, tmp_path):
+    # 没有设置内存上限时不序列化，也不在任务目录中写临时文件
+    results, text = run_pipeline(session, get_notebooklist(session), tmp_path, backend='threaded', delay=0,
+                                 spill_dir=str(tmp_path))
+    assert not results.spilled and results.memory_bytes == 0
+    assert not (tmp_path / SPILL_FILENAME).exists()
+    assert export_json_text(results, tmp_path) == text
+
+def test_anonymous_spill_file(session, tmp_path):
+    results, text = run_pipeline(session, get_notebooklist(session), tmp_path, delay=0, memory_limit=1)
+    assert results.spilled_count == len(results)
+    assert export_json_text(results, tmp_path) == text
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['notes.json', 'pipeline.json']
+    results.close()
+
+def test_waiting_books_are_read_back(session, tmp_path):
+    # 书籍列表接收完之前完成的书都要等待，等待时只保存在结果中
+    books = BookStream(iter_notebooklist(session, chunk_size=64))
+    results, text = run_pipeline(session, books, tmp_path, backend='threaded', delay=0,
+                                 memory_limit=2048, spill_dir=str(tmp_path))
+    assert results.memory_bytes <= 2048 and results.spilled
+    assert_golden('library.json', text)
+
+def header_styles(path):
+    workbook = openpyxl.load_workbook(path)
+    return {ws.title: [(cell.value, cell.font.b, cell.border.left.style, cell.border.top.style,
+                        cell.alignment.horizontal, cell.alignment.vertical) for cell in ws[1]]
+            for ws in workbook.worksheets}
+
+def test_pipeline_excel_matches_pandas_export(session, tmp_path):
+    pytest.importorskip('pandas')
+    data = replay_extract(session)
+    pandas_path = str(tmp_path / 'pandas.xlsx')
+    export_to_excel(data, pandas_path, layout='flat')
+
+    path = str(tmp_path / 'pipeline.xlsx')
+    extract_and_export(session, get_notebooklist(session), [lambda data: export_to_excel(data, path, layout='flat')],
+                       read_info=True, delay=0)
+    assert xlsx_values(path) == xlsx_values(pandas_path)
+    assert header_styles(path) == header_styles(pandas_path)
+
+def test_streaming_header_uses_pandas_style(tmp_path, monkeypatch):
+    # pandas 2.x 的表头样式：加粗、细边框、居中
+    monkeypatch.setattr(exporters, '_pandas_header_style', lambda: exporters.PANDAS_HEADER_STYLE)
+    path = str(tmp_path / 'notes.xlsx')
+    book = {'book_info': {'title': '书', 'author': '作者'}, 'notes': [{'markText': '划线', 'createTime': 1700000000}]}
+    export_to_excel(iter([book]), path, layout='flat')
+    styles = header_styles(path)['Sheet1']
+    assert [style[0] for style in styles] == exporters.EXPORT_COLUMNS
+    assert set(style[1:] for style in styles) == {(True, 'thin', 'thin', 'center', 'top')}
+    assert openpyxl.load_workbook(path).active['A2'].font.b is False
@@ -0,0 +1,105 @@
+"""按需性能分析只记录本次任务在工作线程中执行的函数，结束后不再影响任何线程；profile文件写在任务目录中"""
+import sys
+import threading
+
+import pytest
+
+from weread import engine, profiling, store
+from weread.cache import ResultCache
+from weread.replay import ReplaySession
+from conftest import FIXTURE, replay_extract
+
+def profiled_functions(profiler):
+    return {row['function'].split('(')[-1].rstrip(')') for row in profiler.summary}
+
+def test_is_requested(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', '')
+    assert not profiling.is_requested('secret')
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', 'secret')
+    assert profiling.is_requested('secret')
+    assert not profiling.is_requested('other')
+    assert not profiling.is_requested(None)
+
+def test_threaded_extraction_profiles_book_tasks(session, tmp_path):
+    profiler = profiling.JobProfiler(str(tmp_path), engine='cprofile', top=200)
+    with profiler:
+        all_books_data = replay_extract(session, backend='threaded', max_workers=2)
+    assert all_books_data
+    # 每本书的任务只在工作线程中执行
+    assert 'build_book_data' in profiled_functions(profiler)
+    assert (tmp_path / 'profile.prof').exists()
+
+def test_other_threads_not_profiled(tmp_path):
+    def unrelated_work():
+        return sum(range(1000))
+
+    def job_task():
+        return sum(range(10))
+
+    results = {}
+
+    def long_lived_thread(start, done):
+        start.wait()
+        results['unrelated'] = unrelated_work()
+        results['profile_during'] = sys.getprofile()
+        done.set()
+
+    start, done = threading.Event(), threading.Event()
+    other = threading.Thread(target=long_lived_thread, args=(start, done))
+    profiler = profiling.JobProfiler(str(tmp_path), engine='cprofile', top=200)
+    with profiler:
+        # 任务期间启动的、不属于本任务的线程
+        other.start()
+        start.set()
+        done.wait()
+        # 与 engine 一样在提交任务的线程中取得包装
+        task = profiling.task_wrapper()(job_task)
+        worker = threading.Thread(target=lambda: results.setdefault('job', task()))
+        worker.start()
+        worker.join()
+    other.join()
+
+    assert results['profile_during'] is None
+    functions = profiled_functions(profiler)
+    assert 'job_task' in functions
+    assert 'unrelated_work' not in functions
+
+def test_worker_not_profiled_after_exit(tmp_path):
+    profiler = profiling.JobProfiler(str(tmp_path), engine='cprofile')
+    with profiler:
+        wrap = profiling.task_wrapper()
+    assert profiling.task_wrapper()(len) is len
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(wrap(sys.getprofile)()))
+    thread.start()
+    thread.join()
+    # 任务结束后提交的函数直接执行，不再开启profiler
+    assert seen == [None]
+
+def test_extract_profile_in_job_dir(tmp_path, monkeypatch):
+    app = pytest.importorskip('app')
+    monkeypatch.setattr(app, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'result_cache', ResultCache())
+    monkeypatch.setattr(app, 'create_session', lambda cookie, user_agent: ReplaySession(FIXTURE))
+    monkeypatch.setattr(store, 'ENABLED', False)
+    monkeypatch.setattr(engine, 'DEFAULT_DELAY', 0)
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(profiling, 'PROFILER', 'cprofile')
+    client = app.app.test_client()
+
+    def profiled_extract():
+        response = client.post('/extract', data={'cookie': 'wr_vid=1; wr_skey=a'}, headers={'X-Profile-Token': 'secret'})
+        payload = response.get_json()
+        assert payload['status'] == 'success'
+        profile_dir, name = payload['profile']['file'].split('dir=')[1].split('&file=')
+        assert (tmp_path / profile_dir / name).exists()
+        return payload, profile_dir
+
+    # profile文件与本次任务的导出文件在同一个目录中
+    payload, profile_dir = profiled_extract()
+    assert payload['files']['json'].endswith(f'&dir={profile_dir}')
+    # 使用缓存时导出文件不变，profile写在本次请求的任务目录中
+    payload, profile_dir = profiled_extract()
+    assert payload['cached'] and len(list((tmp_path / profile_dir).iterdir())) == 1
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,80 @@
+"""书籍字段投影：解析书籍列表时丢弃导出用不到的字段"""
+import json
+
+from weread import projection, store
+from weread.client import get_notebooklist, iter_notebooklist, parse_notebooklist
+from weread.replay import ReplayResponse, _key
+from conftest import replay_extract
+from test_replay import export_json_text
+
+BOOK = {'bookId': '1', 'title': '书', 'author': '作者', 'cover': 'c.jpg', 'price': 9.9, 'payType': 1,
+        'copyrightChapterUids': [1, 2, 3]}
+
+def notebooks():
+    return {'books': [{'bookId': '1', 'sort': 2, 'noteCount': 3, 'book': dict(BOOK)},
+                      {'bookId': '2', 'sort': 1, 'noteCount': 0, 'book': dict(BOOK, bookId='2')}]}
+
+def test_parse_keeps_only_whitelisted_book_fields():
+    books = parse_notebooklist(notebooks())
+    assert [item['bookId'] for item in books] == ['2', '1']
+    assert books[1] == {'bookId': '1', 'sort': 2, 'noteCount': 3,
+                        'book': {'bookId': '1', 'title': '书', 'author': '作者', 'cover': 'c.jpg'}}
+
+def test_fields_follow_output_formats():
+    assert projection.book_fields(['csv']) == ('bookId', 'title', 'author')
+    assert projection.book_fields(['excel', 'store']) == ('bookId', 'title', 'author')
+    books = parse_notebooklist(notebooks(), fields=projection.book_fields(['csv']))
+    assert books[0]['book'] == {'bookId': '2', 'title': '书', 'author': '作者'}
+
+def test_none_keeps_all_fields():
+    assert parse_notebooklist(notebooks(), fields=None)[1]['book'] == BOOK
+
+def test_streamed_list_is_projected():
+    class Session:
+        def get(self, url, **kwargs):
+            return ReplayResponse(200, notebooks())
+
+    books = list(iter_notebooklist(Session(), chunk_size=16, fields=projection.book_fields(['markdown'])))
+    assert [item['book'] for item in books] == [{'bookId': '1', 'title': '书', 'author': '作者'},
+                                                 {'bookId': '2', 'title': '书', 'author': '作者'}]
+
+# 与微信读书 /user/notebooks 返回的完整结构相同的一项（书籍0，其余请求用fixture中的录制）
+FULL_ITEM = {
+    'bookId': '0',
+    'book': {
+        'bookId': '0', 'title': '模拟书籍0', 'author': '作者0', 'translator': '译者',
+        'cover': 'https://wfqqreader-1252317822.image.myqcloud.com/cover/0/s_0.jpg',
+        'version': 1739427402, 'format': 'epub', 'type': 0, 'price': 39.99, 'originalPrice': 0,
+        'soldout': 0, 'bookStatus': 1, 'payType': 4097, 'centPrice': 3999, 'finished': 1,
+        'maxFreeChapter': 7, 'free': 0, 'mcardDiscount': 0, 'ispub': 1, 'extra_type': 1, 'cpid': 3059270,
+        'publishTime': '2020-06-01 00:00:00',
+        'categories': [{'categoryId': 100000, 'subCategoryId': 100004, 'categoryType': 0, 'title': '文学-经典作品'}],
+        'hasLecture': 0, 'lastChapterIdx': 30, 'paperBook': {'skuId': '12345678'},
+        'copyrightChapterUids': list(range(1, 31)), 'blockSaleSetting': 0, 'isTraining': 0,
+    },
+    'reviewCount': 2, 'reviewLikeCount': 0, 'reviewCommentCount': 0,
+    'noteCount': 30, 'bookmarkCount': 0, 'sort': 1700000500,
+}
+
+def test_full_payload_projection(session, tmp_path):
+    notebooks = session.responses[_key('GET', '/user/notebooks')][1]
+    notebooks['books'][0] = FULL_ITEM
+    data = replay_extract(session)
+    exported = json.loads(export_json_text(data, tmp_path))
+    book = next(book for book in exported if book['book_info']['bookId'] == '0')
+    assert book['book_info'] == {
+        'bookId': '0', 'title': '模拟书籍0', 'author': '作者0', 'translator': '译者',
+        'cover': FULL_ITEM['book']['cover'], 'categories': FULL_ITEM['book']['categories'],
+        'publishTime': '2020-06-01 00:00:00',
+    }
+
+    # 数据库中的 sort 取自笔记本列表的项
+    books = get_notebooklist(session, fields=projection.book_fields(['store']))
+    conn = store.connect(str(tmp_path / 'notes.sqlite'))
+    try:
+        store.save_books(conn, data, books)
+        sorts = dict(conn.execute("SELECT book_id, sort FROM books").fetchall())
+    finally:
+        conn.close()
+    assert sorts['0'] == 1700000500
+    assert sorts == {item['bookId']: item['sort'] for item in books}
@@ -0,0 +1,76 @@
+"""阅读信息：解析接口返回的各种形式，获取失败时不影响笔记，导出到阅读统计表和Markdown头"""
+import json
+
+import pytest
+
+from weread import async_client
+from weread.client import parse_read_info
+from weread.exporters import export_to_markdown, read_info_row
+from weread.replay import _key
+from conftest import GOLDEN_DIR, replay_extract
+from test_replay import export_json_text
+
+READ_INFO_PARAMS = {'readingDetail': '1', 'readingBookIndex': '1', 'finishedDate': '1'}
+
+def test_parse_top_level_fields():
+    info = parse_read_info({'readingTime': 3600, 'readingProgress': 100, 'finishedDate': 1700001000,
+                            'totalReadDay': 3, 'readingBookDate': 1700000500})
+    assert info == {'reading_time': 3600, 'progress': 100, 'read_days': 3, 'start_date': 0,
+                    'last_read_date': 1700000500, 'finished': True, 'finished_date': 1700001000}
+
+def test_parse_reading_detail():
+    info = parse_read_info({'readingProgress': 40, 'markedStatus': 4, 'readDetail': {
+        'totalReadingTime': 1800, 'totalReadDay': 2, 'beginReadingDate': 1600000000, 'lastReadingDate': 1600100000}})
+    assert info['reading_time'] == 1800
+    assert info['read_days'] == 2
+    assert (info['start_date'], info['last_read_date']) == (1600000000, 1600100000)
+    # 标记读完但没有读完日期
+    assert info['finished'] and info['finished_date'] == 0
+
+def test_parse_empty():
+    assert parse_read_info(None) is None
+    assert parse_read_info({}) is None
+    assert parse_read_info({'bookId': '1'})['finished'] is False
+
+def test_row_for_failed_book():
+    book = {'book_info': {'title': '书', 'author': '作者'}, 'read_info': None}
+    row = read_info_row(book)
+    assert row['书名'] == '书' and row['作者'] == '作者'
+    assert all(row[column] == '' for column in row if column not in ('书名', '作者'))
+
+def test_row_formats_minutes_and_dates():
+    book = {'book_info': {'title': '书', 'author': '作者'}, 'read_info': parse_read_info(
+        {'readingTime': 5430, 'readingProgress': 55, 'finishedDate': 1700001000})}
+    row = read_info_row(book)
+    assert row['阅读时长(分钟)'] == 90
+    assert row['读完日期'] == '2023-11-15'
+    assert row['开始阅读'] == ''
+
+BACKENDS = [
+    'serial',
+    'threaded',
+    pytest.param('async', marks=pytest.mark.skipif(not async_client.is_available(), reason='需要httpx')),
+]
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_failed_read_info_keeps_notes(session, tmp_path, backend):
+    session.responses[_key('GET', '/book/readinfo', dict(READ_INFO_PARAMS, bookId='1'))] = (500, {'errcode': -1})
+    data = replay_extract(session, backend=backend, max_workers=4)
+    with open(f'{GOLDEN_DIR}/library.json', encoding='utf-8') as f:
+        expected = json.load(f)
+    for book in expected:
+        if book['book_info']['bookId'] == '1':
+            book['read_info'] = None
+    assert json.loads(export_json_text(data, tmp_path)) == expected
+
+def test_markdown_front_matter(session, tmp_path):
+    data = replay_extract(session)
+    export_to_markdown(data, str(tmp_path))
+    book = next(book for book in data if book['read_info'] and book['read_info']['finished_date'])
+    row = read_info_row(book)
+    text = next(path.read_text(encoding='utf-8') for path in tmp_path.iterdir()
+                if f'bookId: "{book["book_info"]["bookId"]}"' in path.read_text(encoding='utf-8'))
+    front_matter = text.split('---')[1]
+    assert f'progress: {row["阅读进度(%)"]}' in front_matter
+    assert f'reading_minutes: {row["阅读时长(分钟)"]}' in front_matter
+    assert f'finished: "{row["读完日期"]}"' in front_matter
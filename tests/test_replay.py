@@ -0,0 +1,92 @@
+"""回放录制的响应，检查各执行后端和导出路径的结果与golden文件完全一致"""
+import json
+import os
+
+import pytest
+
+from conftest import FIXTURE, GOLDEN_DIR, assert_golden, replay_extract
+from weread import async_client
+from weread.client import iter_notebooklist
+from weread.engine import BookStream, extract_books
+from weread.exporters import export_to_excel, export_to_json
+from weread.replay import ReplaySession, pseudo_text, sanitize
+
+openpyxl = pytest.importorskip('openpyxl')
+
+def export_json_text(data, tmp_path):
+    path = tmp_path / 'notes.json'
+    export_to_json(data, str(path))
+    return path.read_text(encoding='utf-8')
+
+def xlsx_values(path):
+    """工作簿中每个工作表的单元格值（空单元格为None）"""
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in workbook.worksheets}
+    finally:
+        workbook.close()
+
+BACKENDS = [
+    'serial',
+    'threaded',
+    pytest.param('async', marks=pytest.mark.skipif(not async_client.is_available(), reason='需要httpx')),
+]
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_json_export_matches_golden(session, tmp_path, backend):
+    data = replay_extract(session, backend=backend, max_workers=4)
+    assert_golden('library.json', export_json_text(data, tmp_path))
+
+def test_streamed_notebook_list_matches_golden(session, tmp_path):
+    session.get('https://weread.qq.com/')
+    books = BookStream(iter_notebooklist(session, chunk_size=512))
+    data = extract_books(session, books, read_info=True, near_dedup=False, delay=0)
+    assert_golden('library.json', export_json_text(data, tmp_path))
+
+def test_spilled_results_match_golden(session, tmp_path):
+    # 上限很小，几乎每本书都写入磁盘
+    data = replay_extract(session, memory_limit=1024, spill_dir=str(tmp_path))
+    assert_golden('library.json', export_json_text(data, tmp_path))
+
+def test_without_read_info_only_drops_read_info(session, tmp_path):
+    data = replay_extract(session, read_info=False)
+    with open(os.path.join(GOLDEN_DIR, 'library.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    for book in expected:
+        book.pop('read_info', None)
+    assert json.loads(export_json_text(data, tmp_path)) == expected
+
+def test_excel_matches_golden(session, tmp_path):
+    data = replay_extract(session)
+    path = str(tmp_path / 'notes.xlsx')
+    export_to_excel(data, path, layout='flat')
+    assert_golden('library_xlsx.json', xlsx_values(path))
+
+def test_streaming_excel_matches_golden(session, tmp_path):
+    # 不是列表时使用openpyxl逐行写入的路径，结果应与pandas路径相同
+    data = replay_extract(session)
+    path = str(tmp_path / 'notes.xlsx')
+    export_to_excel(iter(data), path, layout='flat')
+    assert_golden('library_xlsx.json', xlsx_values(path))
+
+def test_excel_sheets_matches_golden(session, tmp_path):
+    data = replay_extract(session)
+    path = str(tmp_path / 'notes.xlsx')
+    export_to_excel(data, path, layout='sheets')
+    assert_golden('library_sheets.json', xlsx_values(path))
+
+def test_unrecorded_request_is_reported():
+    replay = ReplaySession(FIXTURE)
+    response = replay.get('https://i.weread.qq.com/book/info', params={'bookId': 'missing'})
+    assert response.status_code == 404
+    assert len(replay.misses) == 1
+
+def test_sanitize_removes_identity_and_redacts_text():
+    data = {'review': {'author': {'userVid': 12345, 'name': '读者', 'avatar': 'https://a/12345.jpg'},
+                       'content': '想法', 'abstract': '原文', 'range': '1-2', 'url': '/u/12345/review'}}
+    cleaned = sanitize(data, redact_text=True, identities=['12345'])
+    assert cleaned['review']['author'] == {'userVid': 0, 'name': '', 'avatar': ''}
+    assert cleaned['review']['url'] == '/u/0/review'
+    assert len(cleaned['review']['content']) == 2 and cleaned['review']['content'] != '想法'
+    assert cleaned['review']['content'] == pseudo_text('想法')
+    assert cleaned['review']['range'] == '1-2'
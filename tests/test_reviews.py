@@ -0,0 +1,79 @@
+"""笔记列表的解析、syncKey 分页，以及只为选中的书获取笔记评论"""
+import pytest
+
+from weread import async_client
+from weread.client import get_review_list, parse_review_list
+from weread.replay import ReplayResponse, _key
+from conftest import replay_extract
+
+def reviews_page(*items, **extra):
+    return dict({'reviews': [{'review': dict(review)} for review in items]}, **extra)
+
+NOTE = {'reviewId': 'r1', 'type': 1, 'chapterUid': 2, 'range': '1-5', 'abstract': '原文', 'content': '想法'}
+SUMMARY = {'reviewId': 'r2', 'type': 4, 'content': '书评'}
+OTHER = {'reviewId': 'r3', 'type': 7, 'content': '其他'}
+
+def test_parse_matches_previous_output():
+    data = reviews_page(NOTE, SUMMARY, OTHER)
+    # 之前多次 filter/map 的结果
+    reviews = [x['review'] for x in data['reviews'] if x['review']['type'] == 1]
+    expected = [{**x, 'markText': x['content']} for x in reviews]
+    summary, notes = parse_review_list(data)
+    assert notes == expected
+    assert list(notes[0]) == list(expected[0])
+    assert summary == [{'review': SUMMARY}]
+    # 笔记是响应中的对象本身，没有复制
+    assert notes[0] is data['reviews'][0]['review']
+
+def test_parse_without_reviews():
+    assert parse_review_list({}) == ([], [])
+    assert parse_review_list({'reviews': None}) == ([], [])
+
+class PagedSession:
+    """按 syncKey 返回分页的笔记列表"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.params = []
+
+    def get(self, url, params=None, **kwargs):
+        self.params.append(dict(params))
+        return ReplayResponse(200, self.pages[params['syncKey']])
+
+def test_pages_until_no_more():
+    session = PagedSession({
+        0: reviews_page(NOTE, synckey=100, hasMore=1),
+        100: reviews_page(dict(NOTE, reviewId='r4'), SUMMARY, synckey=200, hasMore=1),
+        200: reviews_page(dict(NOTE, reviewId='r5'), synckey=200, hasMore=0),
+    })
+    summary, notes = get_review_list(session, 'b1', page_size=1)
+    assert [note['reviewId'] for note in notes] == ['r1', 'r4', 'r5']
+    assert [item['review']['reviewId'] for item in summary] == ['r2']
+    assert [params['syncKey'] for params in session.params] == [0, 100, 200]
+    assert all(params['count'] == 1 for params in session.params)
+
+def test_single_request_by_default():
+    session = PagedSession({0: reviews_page(NOTE, synckey=100, hasMore=1)})
+    get_review_list(session, 'b1', page_size=0)
+    assert session.params == [dict(bookId='b1', listType=11, mine=1, syncKey=0)]
+
+BACKENDS = ['serial', pytest.param('async', marks=pytest.mark.skipif(
+    not async_client.is_available(), reason='需要 httpx'))]
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_threads_only_for_selected_books(session, backend):
+    # fixture 中每本书有一条笔记（{bookId}_r1）和一条书评（{bookId}_r2）
+    for review_id in ('1_r1', '1_r2'):
+        session.responses[_key('GET', '/review/single', {'reviewId': review_id})] = (200, {'comments': [
+            {'comment': {'content': f'评论{review_id}', 'createTime': 1700000700, 'author': {'name': '读者'}}}]})
+    all_books_data = replay_extract(session, backend=backend, delay=0, threads={'1'})
+
+    for book_data in all_books_data:
+        reviews = [note for note in book_data['notes'] if note.get('reviewId')]
+        reviews.extend(item['review'] for item in book_data['summary'])
+        if book_data['book_info']['bookId'] == '1':
+            assert [review['comments'] for review in reviews] == [
+                [{'content': f"评论{review['reviewId']}", 'createTime': 1700000700, 'author': '读者'}]
+                for review in reviews]
+        else:
+            assert all('comments' not in review for review in reviews)
@@ -0,0 +1,46 @@
+"""调度策略：只改变处理顺序，不改变结果顺序"""
+import pytest
+
+from weread import engine, scheduler
+from weread.client import get_notebooklist
+from weread.engine import extract_books
+from weread.scheduler import register_policy, schedule
+
+BOOKS = [
+    {'bookId': 'a', 'sort': 3, 'noteCount': 50, 'reviewCount': 1},
+    {'bookId': 'b', 'sort': 1, 'noteCount': 2},
+    {'bookId': 'c', 'sort': 2, 'noteCount': 10, 'bookmarkCount': 0},
+]
+
+def test_builtin_policies():
+    assert schedule(BOOKS, 'sort') == [0, 1, 2]
+    assert schedule(BOOKS, 'small_first') == [1, 2, 0]
+    assert schedule(BOOKS, 'recent') == [0, 2, 1]
+
+def test_pinned_books_come_first():
+    assert schedule(BOOKS, 'small_first', pinned=['c', 'a']) == [2, 0, 1]
+
+def test_custom_and_unknown_policies(monkeypatch):
+    monkeypatch.setattr(scheduler, 'POLICIES', dict(scheduler.POLICIES))
+    register_policy('by_id_desc', lambda item: [-ord(ch) for ch in item['bookId']])
+    assert schedule(BOOKS, 'by_id_desc') == [2, 1, 0]
+    assert schedule(BOOKS, lambda item: item['sort']) == [1, 2, 0]
+    with pytest.raises(ValueError):
+        schedule(BOOKS, 'shortest')
+
+def test_processing_order_follows_policy(session, monkeypatch):
+    processed = []
+    build_book_data = engine.build_book_data
+
+    def record(session, book, *args, **kwargs):
+        processed.append(book['bookId'])
+        return build_book_data(session, book, *args, **kwargs)
+
+    monkeypatch.setattr(engine, 'build_book_data', record)
+    books = get_notebooklist(session)
+    data = extract_books(session, books, backend='serial', delay=0, policy='recent', pinned=['3'])
+    shelf = [item['bookId'] for item in books]
+    recent = [item['bookId'] for item in sorted(books, key=lambda item: -item['sort'])]
+    assert processed == ['3'] + [book_id for book_id in recent if book_id != '3']
+    # 结果仍按书架顺序
+    assert [book['book_info']['bookId'] for book in data] == shelf
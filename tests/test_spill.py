@@ -0,0 +1,41 @@
+"""内存受限模式：超过上限的书写入磁盘，按下标顺序读回"""
+import os
+
+import pytest
+
+from conftest import assert_golden, replay_extract
+from test_replay import xlsx_values
+from weread.exporters import export_to_excel
+from weread.spill import SPILL_FILENAME, SpillList
+
+def book(book_id, size=100):
+    return {'book_info': {'bookId': book_id}, 'notes': [{'markText': 'x' * size}]}
+
+def test_spills_after_limit_and_iterates_in_index_order(tmp_path):
+    spill = SpillList(str(tmp_path), limit_bytes=400)
+    for index in (3, 0, 2, 1):
+        spill.append(index, book(str(index)))
+    assert spill.spilled and spill.spilled_count == 2
+    assert spill.memory_bytes <= 400
+    assert len(spill) == 4
+    # 可以重复遍历
+    for _ in range(2):
+        assert [item['book_info']['bookId'] for item in spill] == ['0', '1', '2', '3']
+    spill.close()
+    assert not os.path.exists(tmp_path / SPILL_FILENAME)
+    assert len(spill) == 0
+
+def test_stays_in_memory_under_limit(tmp_path):
+    spill = SpillList(str(tmp_path), limit_bytes=10 ** 6)
+    spill.append(0, book('0'))
+    assert not spill.spilled
+    assert list(spill) == [book('0')]
+    spill.close()
+
+def test_spilled_excel_matches_golden(session, tmp_path):
+    pytest.importorskip('openpyxl')
+    data = replay_extract(session, memory_limit=1024, spill_dir=str(tmp_path))
+    assert data.spilled
+    path = str(tmp_path / 'notes.xlsx')
+    export_to_excel(data, path, layout='flat')
+    assert_golden('library_xlsx.json', xlsx_values(path))
@@ -0,0 +1,84 @@
+"""本地笔记数据库：增量保存、全文搜索，以及 /search 的身份验证"""
+import hashlib
+import os
+import stat
+
+import pytest
+
+from conftest import replay_extract
+from weread import store
+
+COOKIE = 'wr_vid=42; wr_skey=abc'
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(store, 'SECRET', '')
+    return str(tmp_path)
+
+def test_incremental_save_and_search(session, data_dir):
+    data = replay_extract(session)
+    conn = store.connect(store.db_path_for(COOKIE))
+    try:
+        notes = sum(len(book['notes']) for book in data)
+        assert store.save_books(conn, data)['inserted'] == notes
+        assert store.save_books(conn, data)['unchanged'] == notes
+
+        book = data[0]
+        book['notes'][0]['markText'] = '修改后的划线内容'
+        removed = book['notes'].pop()
+        stats = store.save_books(conn, [book])
+        assert (stats['updated'], stats['deleted'], stats['inserted']) == (1, 1, 0)
+
+        results = store.search(conn, '修改后的划线')
+        assert [row['mark_text'] for row in results] == ['修改后的划线内容']
+        assert results[0]['book_title'] == book['book_info']['title']
+        # 少于3个字时用LIKE匹配
+        assert store.search(conn, '想法', limit=100)
+        removed_id = store._note_fields(removed)[0]
+        assert not conn.execute("SELECT 1 FROM notes WHERE note_id = ?", (removed_id,)).fetchone()
+    finally:
+        conn.close()
+
+def test_db_name_is_keyed_by_server_secret(data_dir, monkeypatch, tmp_path):
+    path = store.db_path_for(COOKIE)
+    assert os.path.dirname(path) == data_dir
+    # 同一用户的不同登录使用同一个文件，文件名不能由用户ID直接算出
+    assert store.db_path_for('wr_vid=42; wr_skey=other') == path
+    assert hashlib.sha256(b'42').hexdigest()[:16] not in path
+    secret_file = os.path.join(data_dir, '.secret')
+    assert stat.S_IMODE(os.stat(secret_file).st_mode) == 0o600
+
+    monkeypatch.setattr(store, 'SECRET', 'configured')
+    assert store.db_path_for(COOKIE) != path
+
+def test_search_token(data_dir):
+    token = store.search_token(COOKIE)
+    assert store.check_search_token('wr_vid=42; wr_skey=new', token)
+    assert not store.check_search_token('wr_vid=43', token)
+    assert not store.check_search_token(COOKIE, token[:-1] + ('0' if token[-1] != '0' else '1'))
+    assert not store.check_search_token(COOKIE, store.search_token(COOKIE, ttl=-1))
+    assert not store.check_search_token(COOKIE, '')
+
+@pytest.fixture
+def client(data_dir, session, monkeypatch):
+    app = pytest.importorskip('app')
+    conn = store.connect(store.db_path_for(COOKIE))
+    store.save_books(conn, replay_extract(session))
+    conn.close()
+    # 没有令牌时向微信读书验证，这里模拟验证失败（伪造的Cookie）
+    monkeypatch.setattr(app, 'get_notebooklist', lambda *args, **kwargs: None)
+    return app.app.test_client()
+
+def test_search_rejects_forged_cookie(client):
+    response = client.post('/search', data={'cookie': 'wr_vid=42', 'q': '模拟划线'})
+    assert response.status_code == 403
+    response = client.post('/search', data={'cookie': 'wr_vid=42', 'q': '模拟划线', 'token': '9999999999.abc'})
+    assert response.status_code == 403
+    assert client.get('/search?cookie=wr_vid=42&q=abc').status_code == 405
+
+def test_search_with_token(client):
+    token = store.search_token(COOKIE)
+    response = client.post('/search', data={'cookie': COOKIE, 'q': '模拟划线', 'token': token, 'limit': 5})
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 5
@@ -0,0 +1,37 @@
+"""多工作表Excel：默认在当前进程中生成，进程池生成的结果与之相同"""
+import pytest
+
+from weread import xlsx
+from weread.exporters import export_to_excel
+from conftest import assert_golden, replay_extract
+from test_replay import xlsx_values
+
+class NoPool:
+    def __init__(self, *args, **kwargs):
+        raise AssertionError('不应创建进程池')
+
+def test_resolve_processes(monkeypatch):
+    monkeypatch.setattr(xlsx, 'DEFAULT_PROCESSES', 1)
+    assert xlsx.resolve_processes() == 1
+    assert xlsx.resolve_processes(3) == 3
+    monkeypatch.setattr(xlsx.os, 'cpu_count', lambda: 6)
+    assert xlsx.resolve_processes(0) == 6
+    monkeypatch.setattr(xlsx, 'DEFAULT_PROCESSES', 0)
+    assert xlsx.resolve_processes() == 6
+
+def test_in_process_by_default(session, tmp_path, monkeypatch):
+    # Web应用中的调用（不传 processes）不创建进程池
+    monkeypatch.setattr(xlsx, 'DEFAULT_PROCESSES', 1)
+    monkeypatch.setattr(xlsx, 'ProcessPoolExecutor', NoPool)
+    data = replay_extract(session)
+    path = str(tmp_path / 'notes.xlsx')
+    export_to_excel(data, path, layout='sheets')
+    assert_golden('library_sheets.json', xlsx_values(path))
+
+@pytest.mark.parametrize('processes', [2, 0])
+def test_pool_matches_golden(session, tmp_path, processes):
+    # 命令行和批量导出传入 0（CPU核数）
+    data = replay_extract(session)
+    path = str(tmp_path / 'notes.xlsx')
+    export_to_excel(iter(data), path, layout='sheets', processes=processes)
+    assert_golden('library_sheets.json', xlsx_values(path))
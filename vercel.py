@@ -5,8 +5,11 @@ import json
 import tempfile
 import traceback
 import time
-import requests
 from werkzeug.utils import secure_filename
+from weread import WEREAD_URL, USER_AGENT, create_session, get_notebooklist, extract_books, export_to_json
+from weread.exporters import EXCEL_LAYOUT, note_to_row
+from weread.xlsx import export_to_excel_sheets
+from weread import columns
 
 # 设置日志
 import logging
@@ -55,86 +58,45 @@ except ImportError:
     has_excel_support = False
     logger.warning("openpyxl not available, Excel export will be disabled")
 
-# 从notebook_v1.py中提取的必要函数，移除pandas依赖
-def parse_cookie_string(cookie_string):
-    """解析cookie字符串为Cookie对象"""
-    from http.cookies import SimpleCookie
-    cookie = SimpleCookie()
-    cookie.load(cookie_string)
-    cookies_dict = {}
-    
-    for key, morsel in cookie.items():
-        cookies_dict[key] = morsel.value
-    
-    return cookies_dict
-
-def get_notebooklist(session):
-    """获取笔记本列表"""
-    url = "https://i.weread.qq.com/user/notebooks"
-    response = session.get(url)
-    
-    if response.status_code == 200:
-        return response.json().get('notebooks', [])
-    return []
-
-def get_bookinfo(session, bookId):
-    """获取书籍信息"""
-    url = f"https://i.weread.qq.com/book/info?bookId={bookId}"
-    response = session.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        isbn = data.get('isbn', '')
-        rating = data.get('newRating', 0)
-        return isbn, rating, data
-    return "", 0, {}
-
-def get_chapter_info(session, bookId):
-    """获取章节信息"""
-    url = f"https://i.weread.qq.com/book/chapterInfos?bookId={bookId}"
-    response = session.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        chapters = data.get('data', [])
-        chapter_info = {}
-        
-        for chapter in chapters:
-            chapter_info[chapter.get('chapterUid')] = chapter
-        
-        return chapter_info
-    return {}
-
-def get_bookmark_list(session, bookId):
-    """获取划线列表"""
-    url = f"https://i.weread.qq.com/book/bookmarklist?bookId={bookId}"
-    response = session.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        return data.get('updated', [])
-    return []
+# Excel表头：划线和笔记与 app.py 的导出相同，笔记的划线列为它引用的原文
+VERCEL_HEADERS = ['书名', '作者', 'ISBN', '评分', '类型', '章节', '创建时间', '划线', '笔记']
 
-def get_review_list(session, bookId):
-    """获取笔记列表"""
-    url = f"https://i.weread.qq.com/review/list?bookId={bookId}"
-    response = session.get(url)
+def iter_vercel_rows(books_data):
+    """按表头顺序产出每条笔记的一行；安装了numpy时批量转换时间和文本"""
+    if not columns.is_available():
+        for book_data in books_data:
+            book_info = book_data.get('book_info', {})
+            book_title = book_info.get('title', '未知书名')
+            book_author = book_info.get('author', '未知作者')
+            isbn = book_data.get('isbn', '')
+            rating = book_data.get('rating', 0)
+            for note in book_data.get('notes', []):
+                # 划线和笔记的 type 都是1，笔记有 reviewId
+                note_type = '笔记' if note.get('reviewId') else '划线'
+                row = note_to_row(book_title, book_author, note)
+                yield [book_title, book_author, isbn, rating, note_type, row['章节'], row['创建时间'], row['划线'], row['笔记']]
+        return
     
-    if response.status_code == 200:
-        data = response.json()
-        summary = data.get('summary', {})
-        reviews = data.get('reviews', [])
-        return summary, reviews
-    return {}, []
-
-def export_to_json(books_data, output_file):
-    """导出为JSON格式"""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(books_data, f, ensure_ascii=False, indent=4)
-    return True
+    np = columns.np
+    fields = columns.collect_note_fields(books_data)
+    converted = columns.export_columns(fields)
+    note_types = np.where(fields['is_review'], '笔记', '划线')
+    yield from zip(fields['title'].tolist(), fields['author'].tolist(), fields['isbn'].tolist(),
+                   fields['rating'].tolist(), note_types.tolist(), converted['章节'].tolist(),
+                   converted['创建时间'].tolist(), converted['划线'].tolist(), converted['笔记'].tolist())
 
 def export_to_excel(books_data, output_file):
     """导出为Excel格式，仅使用openpyxl，不依赖pandas"""
+    # 多工作表模式不需要openpyxl；Serverless环境不能可靠地创建子进程，在当前进程中生成
+    if EXCEL_LAYOUT == 'sheets':
+        try:
+            export_to_excel_sheets(books_data, output_file, processes=1)
+            logger.info(f"Excel exported successfully: {output_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Error exporting to Excel: {str(e)}")
+            return False
+    
     if not has_excel_support:
         logger.warning("openpyxl not available, cannot export to Excel")
         return False
@@ -146,47 +108,22 @@ def export_to_excel(books_data, output_file):
         ws.title = "微信读书笔记"
         
         # 添加表头
-        headers = ['书名', '作者', 'ISBN', '评分', '类型', '章节', '创建时间', '内容']
+        headers = VERCEL_HEADERS
         for col_num, header in enumerate(headers, 1):
             cell = ws.cell(row=1, column=col_num)
             cell.value = header
         
         # 添加所有笔记数据
-        row_num = 2
-        for book_data in books_data:
-            book_info = book_data.get('book_info', {})
-            book_title = book_info.get('title', '未知书名')
-            book_author = book_info.get('author', '未知作者')
-            isbn = book_data.get('isbn', '')
-            rating = book_data.get('rating', 0)
-            
-            notes = book_data.get('notes', [])
-            if not notes:
-                continue
-                
-            # 处理每条笔记
-            for note in notes:
-                note_type = '划线' if note.get('type') == 1 else '笔记'
-                chapter = note.get('chapter_title', '')
-                created_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(note.get('createTime', 0)))
-                content = note.get('markText', '') or note.get('content', '')
-                
-                # 写入每一列
-                col_num = 1
-                for value in [book_title, book_author, isbn, rating, note_type, chapter, created_time, content]:
-                    cell = ws.cell(row=row_num, column=col_num)
-                    cell.value = value
-                    col_num += 1
-                
-                row_num += 1
+        for row in iter_vercel_rows(books_data):
+            ws.append(row)
         
         # 调整列宽以适应内容
         for col_num, _ in enumerate(headers, 1):
             col_letter = openpyxl.utils.get_column_letter(col_num)
-            if col_num < len(headers):
+            if col_num < len(headers) - 1:
                 ws.column_dimensions[col_letter].width = 20
             else:
-                # 内容列宽度设置得更大一些
+                # 划线和笔记列宽度设置得更大一些
                 ws.column_dimensions[col_letter].width = 50
         
         # 保存工作簿
@@ -241,18 +178,15 @@ def extract():
         # 获取用户的User-Agent
         user_agent = request.headers.get('User-Agent', '')
         if not user_agent:
-            user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+            user_agent = USER_AGENT
         
         # 创建会话
-        session = requests.Session()
-        session.cookies = parse_cookie_string(cookie)
-        session.headers.update({'User-Agent': user_agent})
+        session = create_session(cookie, user_agent)
         
         # 访问主页获取必要的cookie
         try:
-            weread_url = "https://weread.qq.com/"
-            logger.info(f"Accessing weread URL: {weread_url}")
-            response = session.get(weread_url, timeout=5)
+            logger.info(f"Accessing weread URL: {WEREAD_URL}")
+            response = session.get(WEREAD_URL, timeout=5)
             logger.info(f"Weread response status: {response.status_code}")
         except Exception as e:
             logger.error(f"Failed to access weread: {str(e)}")
@@ -271,98 +205,23 @@ def extract():
             logger.error(f"Error fetching notebook list: {str(e)}")
             return jsonify({'status': 'error', 'message': f'获取书籍列表失败: {str(e)}'}), 500
         
-        # 限制处理的书籍数量以避免超时
-        max_books = 15  # 限制每次处理的最大书籍数量
-        if len(books) > max_books and os.environ.get('VERCEL') == '1':
-            logger.warning(f"Too many books ({len(books)}), limiting to {max_books} to avoid timeout")
-            books = books[:max_books]
-            
-        # 发送总书籍数量
-        total_books = len(books)
-        all_books_data = []
+        # 在Vercel环境中，为剩余的请求时间设置处理预算，超时前停止开始新的书籍
+        time_budget = None
+        if os.environ.get('VERCEL') == '1':
+            elapsed = time.time() - request.environ.get('FLASK_REQUEST_START_TIME', time.time())
+            time_budget = max(8 - elapsed, 0.1)
         
-        for index, book_item in enumerate(books):
-            try:
-                # 检查是否运行在Vercel环境，如果是，则检查是否快要超时
-                if os.environ.get('VERCEL') == '1' and time.time() - request.environ.get('FLASK_REQUEST_START_TIME', time.time()) > 8:
-                    logger.warning("Request is about to timeout, stopping processing")
-                    break
-                    
-                book = book_item.get('book')
-                bookId = book.get('bookId')
-                title = book.get('title', '未知书名')
-                
-                # 更新进度
-                current_book = index + 1
-                percent = int((current_book / total_books) * 100)
-                logger.info(f"Processing book {current_book}/{total_books}: {title}")
-                
-                # 获取书籍详细信息
-                isbn, rating, book_info = get_bookinfo(session, bookId)
-                chapter_info = get_chapter_info(session, bookId)
-                
-                # 划线列表清洗
-                bookmark_list = get_bookmark_list(session, bookId)
-                if bookmark_list:
-                    bookmark_list_huaxian = [item for item in bookmark_list if item.get('type') == 1]
-                else:
-                    bookmark_list_huaxian = []
-                    
-                # 书评和笔记
-                summary, reviews = get_review_list(session, bookId)
-    
-                # 合并划线和笔记
-                all_notes = []
-                if bookmark_list_huaxian:
-                    all_notes.extend(bookmark_list_huaxian)
-                    logger.info(f"Book '{title}' has {len(bookmark_list_huaxian)} highlights")
-                if reviews:
-                    all_notes.extend(reviews)
-                    logger.info(f"Book '{title}' has {len(reviews)} notes")
-                
-                # 排序
-                if all_notes:
-                    all_notes = sorted(
-                        all_notes,
-                        key=lambda x: (
-                            x.get("chapterUid", 1),
-                            (
-                                0
-                                if (
-                                    x.get("range", "") == ""
-                                    or x.get("range", "").split("-")[0] == ""
-                                )
-                                else int(x.get("range", "0-0").split("-")[0])
-                            ),
-                        ),
-                    )
-                
-                # 添加章节信息
-                for note in all_notes:
-                    chapterUid = note.get("chapterUid", 1)
-                    if chapter_info and chapterUid in chapter_info:
-                        note["chapter_title"] = chapter_info[chapterUid].get("title", "")
-                    else:
-                        note["chapter_title"] = ""
-                
-                # 添加书籍数据
-                book_data = {
-                    "book_info": book,
-                    "isbn": isbn,
-                    "rating": rating,
-                    "notes": all_notes,
-                    "summary": summary
-                }
-                
-                all_books_data.append(book_data)
-                
-                # 每处理一本书睡眠很短时间，避免请求过快但不会明显延长总处理时间
-                time.sleep(0.2)
-            except Exception as e:
-                logger.error(f"Error processing book '{title}': {str(e)}")
-                logger.error(traceback.format_exc())
-                # 继续处理下一本书
-                continue
+        def on_book(index, book_item, book_data, error):
+            title = book_item.get('book', {}).get('title', '未知书名')
+            if error is not None:
+                logger.error(f"Error processing book '{title}': {str(error)}")
+            else:
+                logger.info(f"Processed book {index + 1}/{len(books)}: {title} ({len(book_data['notes'])} notes)")
+        
+        # 有时间预算时先处理笔记少的书，超时前完成的书尽可能多；结果仍按原顺序排列
+        # 与之前相同，逐本处理、每本书后等待0.2秒
+        all_books_data = extract_books(session, books, on_book=on_book, time_budget=time_budget,
+                                       policy='small_first' if time_budget else None, backend='serial', delay=0.2)
         
         # 导出数据
         timestamp = int(time.time())
@@ -397,7 +256,7 @@ def extract():
         # 添加处理信息
         if len(books) > len(all_books_data):
             if os.environ.get('VERCEL') == '1':
-                response_data['warning'] = f'由于Vercel环境限制，仅处理了{len(all_books_data)}本书中的{len(all_books_data)}本。建议在本地环境运行以获取所有数据。'
+                response_data['warning'] = f'由于Vercel环境限制，仅处理了{len(books)}本书中的{len(all_books_data)}本。建议在本地环境运行以获取所有数据。'
             else:
                 response_data['warning'] = f'仅处理了{len(books)}本书中的{len(all_books_data)}本，有些书籍处理失败。'
         
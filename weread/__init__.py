@@ -0,0 +1,32 @@
+"""微信读书笔记导出核心包
+
+- client：微信读书API请求函数
+- engine：单本书数据组装与批量提取（可选 serial / threaded / async 执行后端）
+- exporters：JSON、Excel、CSV、Markdown导出
+
+Flask应用（app.py）、Vercel入口（vercel.py）和命令行（notebook_v1.py）都通过本包工作。
+"""
+from .client import (
+    WEREAD_URL,
+    USER_AGENT,
+    parse_cookie_string,
+    create_session,
+    get_notebooklist,
+    iter_notebooklist,
+    sort_notebooklist,
+    get_bookinfo,
+    get_chapter_info,
+    get_bookmark_list,
+    get_review_list,
+    get_read_info,
+)
+from .engine import BookStream, assemble_notes, build_book_data, iter_books, extract_books
+from .exporters import (
+    EXPORT_COLUMNS,
+    note_to_row,
+    export_to_json,
+    export_to_excel,
+    export_to_markdown,
+    iter_csv_export,
+    stream_zip_directory,
+)
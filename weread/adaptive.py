@@ -0,0 +1,194 @@
+"""自适应并发控制（AIMD）：根据微信读书接口的响应延迟和错误动态调整同时进行的请求数
+
+- 请求成功且延迟正常：并发上限缓慢增加（每轮约 +1，加性增）
+- 出错、非200响应或延迟突增：并发上限立即减半（乘性减），冷却期内只减一次
+- 每个Cookie身份（wr_vid）一个控制器，上限不超过 MAX_LIMIT，避免账号因请求过快被限制
+
+AdaptiveSession 是 requests.Session 的子类，client.py 中所有请求函数不需修改即受控制；
+异步客户端通过 acquire_async/release 使用同一个控制器。metrics() 返回所有控制器的状态。
+
+控制器只限制同时进行的请求数，串行后端（WEREAD_BACKEND=serial）一次只发一个请求，
+并发无从增加；需配合 threaded 或 async 后端使用。
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+import requests
+
+# 默认参数，可通过环境变量调整；默认关闭，WEREAD_ADAPTIVE=1 时开启
+ENABLED = os.environ.get('WEREAD_ADAPTIVE', '0') == '1'
+INITIAL_LIMIT = float(os.environ.get('WEREAD_ADAPTIVE_INITIAL', '2'))
+MAX_LIMIT = float(os.environ.get('WEREAD_ADAPTIVE_MAX', '8'))
+
+class AdaptiveLimiter:
+    """AIMD并发控制器，线程安全"""
+
+    def __init__(self, initial=INITIAL_LIMIT, min_limit=1, max_limit=MAX_LIMIT,
+                 decrease_factor=0.5, latency_spike=3.0, min_spike_latency=0.2, cooldown=2.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        # 延迟超过基线的多少倍算作突增
+        self.latency_spike = latency_spike
+        # 低于这个延迟（秒）的波动不算突增，避免毫秒级抖动触发降速
+        self.min_spike_latency = min_spike_latency
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.decreases = 0
+        self.latency_ewma = None
+        self.baseline_latency = None
+        self._last_decrease = 0.0
+        self.last_used = time.monotonic()
+        self._condition = threading.Condition()
+        # 等待中的协程：(事件循环, future)，release 时从任意线程唤醒
+        self._async_waiters = []
+
+    def _has_slot(self):
+        return self.in_flight < max(int(self.limit), self.min_limit)
+
+    def acquire(self):
+        """阻塞直到可以发出新的请求"""
+        with self._condition:
+            while not self._has_slot():
+                self._condition.wait()
+            self.in_flight += 1
+
+    def try_acquire(self):
+        with self._condition:
+            if self._has_slot():
+                self.in_flight += 1
+                return True
+            return False
+
+    async def acquire_async(self):
+        """异步版本的acquire，不阻塞事件循环
+
+        没有空位时等待 release 唤醒；控制器可能同时被多个线程和事件循环使用，
+        因此用各自循环中的 future 等待，而不是绑定单个循环的 asyncio.Condition。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._has_slot():
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def _wake_async_waiters(self):
+        """唤醒所有等待中的协程，由它们重新检查是否有空位（需持有锁）"""
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def release(self, latency, ok):
+        """请求结束时调用，根据延迟和结果调整并发上限"""
+        with self._condition:
+            self.in_flight -= 1
+            self.requests += 1
+            self.last_used = time.monotonic()
+
+            spike = (
+                self.baseline_latency is not None
+                and latency > self.min_spike_latency
+                and latency > self.baseline_latency * self.latency_spike
+            )
+            if ok:
+                # 快速EWMA反映当前延迟，慢速EWMA作为正常延迟的基线
+                self.latency_ewma = latency if self.latency_ewma is None else 0.7 * self.latency_ewma + 0.3 * latency
+                if not spike:
+                    self.baseline_latency = latency if self.baseline_latency is None else 0.95 * self.baseline_latency + 0.05 * latency
+            else:
+                self.errors += 1
+
+            if not ok or spike:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.decreases += 1
+                    self._last_decrease = now
+            else:
+                # 加性增：每完成约 limit 个请求，上限加1
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'errors': self.errors,
+                'decreases': self.decreases,
+                'latency_ewma': round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+                'baseline_latency': round(self.baseline_latency, 4) if self.baseline_latency is not None else None,
+            }
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+# 空闲超过这个时间（秒）的控制器会被清理
+IDLE_TIMEOUT = 3600
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def _identity_key(identity):
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]
+
+def get_limiter(identity):
+    """获取某个Cookie身份的控制器（同一用户的并发任务共享）"""
+    key = _identity_key(identity)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            # 顺便清理长时间不用的控制器
+            now = time.monotonic()
+            for idle_key in [k for k, l in _limiters.items() if l.in_flight == 0 and now - l.last_used > IDLE_TIMEOUT]:
+                del _limiters[idle_key]
+            limiter = _limiters[key] = AdaptiveLimiter()
+        return limiter
+
+def metrics():
+    """所有控制器的状态，以身份摘要为键"""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {key: limiter.snapshot() for key, limiter in limiters.items()}
+
+class AdaptiveSession(requests.Session):
+    """每个请求都经过 AdaptiveLimiter 的 requests.Session"""
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, method, url, *args, **kwargs):
+        self.limiter.acquire()
+        started = time.monotonic()
+        ok = False
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            ok = response.ok
+            return response
+        finally:
+            self.limiter.release(time.monotonic() - started, ok)
@@ -0,0 +1,338 @@
+"""基于 httpx 的 asyncio 微信读书客户端
+
+接口函数与 client.py 同名，参数中的 session 换成 httpx.AsyncClient。
+所有任务共用一个后台事件循环，多个用户的提取任务可以同时在同一个循环里进行，
+全局同时进行的请求数由 MAX_IN_FLIGHT 限制。iter_books_sync 是同步包装，
+engine 的 async 后端通过它工作，原有的同步调用方式不需要修改。
+
+httpx 为可选依赖，未安装时 is_available() 返回 False，engine 会退回到线程池实现。
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .client import (
+    WEREAD_NOTEBOOKS_URL,
+    WEREAD_BOOKMARKLIST_URL,
+    WEREAD_CHAPTER_INFO,
+    WEREAD_READ_INFO_URL,
+    WEREAD_REVIEW_LIST_URL,
+    WEREAD_REVIEW_SINGLE_URL,
+    REVIEW_MAX_PAGES,
+    REVIEW_PAGE_SIZE,
+    WEREAD_BOOK_INFO,
+    USER_AGENT,
+    parse_bookmark_list,
+    parse_bookinfo,
+    parse_review_list,
+    parse_review_comments,
+    review_list_params,
+    next_review_sync_key,
+    parse_chapter_info,
+    parse_read_info,
+    parse_notebooklist,
+    chapter_info_body,
+)
+from .engine import assemble_notes, thread_reviews
+from .projection import DEFAULT_FIELDS
+
+# 整个进程同时进行的请求数上限（所有用户共享）
+MAX_IN_FLIGHT = int(os.environ.get('WEREAD_ASYNC_MAX_IN_FLIGHT', '200'))
+# 每个用户连接池的最大连接数
+MAX_CONNECTIONS_PER_CLIENT = int(os.environ.get('WEREAD_ASYNC_MAX_CONNECTIONS', '20'))
+
+_loop = None
+_loop_lock = threading.Lock()
+_request_slots = None
+
+def is_available():
+    """是否安装了 httpx"""
+    return httpx is not None
+
+def get_event_loop():
+    """获取（必要时启动）后台共享事件循环"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name='weread-async-loop', daemon=True)
+            thread.start()
+        return _loop
+
+def _slots():
+    # 信号量必须在事件循环内创建
+    global _request_slots
+    if _request_slots is None:
+        _request_slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+    return _request_slots
+
+async def _request(client, method, url, **kwargs):
+    # 客户端带有自适应并发控制器时（见 adaptive.py），请求同样受其调度
+    limiter = getattr(client, 'limiter', None)
+    if limiter is None:
+        async with _slots():
+            return await client.request(method, url, **kwargs)
+
+    await limiter.acquire_async()
+    started = time.monotonic()
+    ok = False
+    try:
+        async with _slots():
+            response = await client.request(method, url, **kwargs)
+        ok = response.is_success
+        return response
+    finally:
+        limiter.release(time.monotonic() - started, ok)
+
+def create_async_client(cookies=None, user_agent=None, max_connections=None, limiter=None, transport=None):
+    """创建带连接池的 httpx.AsyncClient，cookies 可以是 CookieJar 或字典
+
+    limiter 为 adaptive.AdaptiveLimiter 时，所有请求由它控制并发。
+    transport 用于替换网络层（如 replay.ReplaySession 的回放）。
+    """
+    if httpx is None:
+        raise RuntimeError("httpx 未安装，无法使用异步客户端")
+    max_connections = max_connections or MAX_CONNECTIONS_PER_CLIENT
+    client = httpx.AsyncClient(
+        cookies=cookies,
+        headers={'User-Agent': user_agent or USER_AGENT},
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        follow_redirects=True,
+        timeout=30,
+        transport=transport,
+    )
+    client.limiter = limiter
+    return client
+
+#获取划线列表
+async def get_bookmark_list(client, bookId):
+    r = await _request(client, 'GET', WEREAD_BOOKMARKLIST_URL, params=dict(bookId=bookId))
+    if r.is_success:
+        return parse_bookmark_list(r.json())
+    return None
+
+#获取阅读信息（进度、阅读时间等）
+async def get_read_info(client, bookId):
+    params = dict(bookId=bookId, readingDetail=1, readingBookIndex=1, finishedDate=1)
+    r = await _request(client, 'GET', WEREAD_READ_INFO_URL, params=params)
+    if r.is_success:
+        return r.json()
+    return None
+
+#获取书籍的 ISBN 和评分
+async def get_bookinfo(client, bookId):
+    r = await _request(client, 'GET', WEREAD_BOOK_INFO, params=dict(bookId=bookId))
+    if r.is_success:
+        return parse_bookinfo(r.json())
+    print(f"get {bookId} book info failed")
+    return ("", 0, {})
+
+#获取笔记和点评
+async def get_review_list(client, bookId, page_size=None):
+    page_size = REVIEW_PAGE_SIZE if page_size is None else page_size
+    summary, reviews = [], []
+    sync_key = 0
+    for _ in range(REVIEW_MAX_PAGES):
+        params = review_list_params(bookId, sync_key, page_size)
+        r = await _request(client, 'GET', WEREAD_REVIEW_LIST_URL, params=params)
+        if not r.is_success:
+            break
+        data = r.json()
+        parse_review_list(data, summary, reviews)
+        sync_key = next_review_sync_key(data, sync_key) if page_size else None
+        if sync_key is None:
+            break
+    return summary, reviews
+
+#获取一条笔记的评论
+async def get_review_comments(client, reviewId):
+    r = await _request(client, 'GET', WEREAD_REVIEW_SINGLE_URL, params=dict(reviewId=reviewId))
+    if r.is_success:
+        return parse_review_comments(r.json())
+    return []
+
+#获取章节信息
+async def get_chapter_info(client, bookId):
+    r = await _request(client, 'POST', WEREAD_CHAPTER_INFO, json=chapter_info_body(bookId))
+    if r.is_success:
+        return parse_chapter_info(r.json())
+    return None
+
+#笔记本列表
+async def get_notebooklist(client, max_retries=3, fields=DEFAULT_FIELDS):
+    for _ in range(max_retries):
+        try:
+            r = await _request(client, 'GET', WEREAD_NOTEBOOKS_URL)
+            if r.is_success:
+                books = parse_notebooklist(r.json(), fields)
+                if books:
+                    return books
+            else:
+                print(f"请求笔记本列表失败: {r.text}")
+        except Exception as e:
+            print(f"获取笔记本列表出错: {e}")
+        await asyncio.sleep(2)  # 等待2秒后重试
+    return None
+
+async def fetch_read_info(client, bookId):
+    """获取并整理阅读信息，失败时返回None"""
+    try:
+        return parse_read_info(await get_read_info(client, bookId))
+    except Exception as e:
+        print(f"获取阅读信息出错: {e}")
+        return None
+
+async def fetch_review_threads(client, notes, summary):
+    """为笔记和书评附加 comments 字段，各条的请求同时发出"""
+    reviews = thread_reviews(notes, summary)
+    results = await asyncio.gather(*(get_review_comments(client, review['reviewId']) for review in reviews),
+                                   return_exceptions=True)
+    for review, comments in zip(reviews, results):
+        if isinstance(comments, Exception):
+            print(f"获取笔记评论出错: {comments}")
+            comments = []
+        review['comments'] = comments
+
+async def build_book_data(client, book, read_info=False, threads=False):
+    """单本书的请求同时发出，结果与 engine.build_book_data 相同"""
+    bookId = book.get('bookId')
+    calls = [
+        get_bookinfo(client, bookId),
+        get_chapter_info(client, bookId),
+        get_bookmark_list(client, bookId),
+        get_review_list(client, bookId),
+    ]
+    if read_info:
+        calls.append(fetch_read_info(client, bookId))
+    (isbn, rating, book_info), chapter_info, bookmark_list, (summary, reviews), *extra = await asyncio.gather(*calls)
+    book_data = {
+        "book_info": book,
+        "isbn": isbn,
+        "rating": rating,
+        "notes": assemble_notes(bookmark_list, reviews, chapter_info),
+        "summary": summary
+    }
+    if threads:
+        await fetch_review_threads(client, book_data["notes"], summary)
+    if read_info:
+        book_data["read_info"] = extra[0]
+    return book_data
+
+async def iter_books_async(client, books, concurrency=4, delay=0, time_budget=None, read_info=False, threads=None):
+    """按完成顺序产出 (index, book_data, error)，同时处理最多 concurrency 本书
+
+    books 可以是列表，也可以是异步可迭代对象（边接收书籍列表边开始处理）。
+    threads 为需要获取笔记评论的 bookId 集合。
+    """
+    book_slots = asyncio.Semaphore(concurrency)
+    start = time.time()
+    finished = asyncio.Queue()
+    tasks = []
+
+    async def process(index, book_item):
+        result = None
+        try:
+            async with book_slots:
+                # 时间预算用尽后不再开始新的书籍
+                if time_budget and time.time() - start > time_budget:
+                    return
+                try:
+                    book = book_item.get('book')
+                    book_data = await build_book_data(client, book, read_info,
+                                                      bool(threads) and book.get('bookId') in threads)
+                    if delay:
+                        await asyncio.sleep(delay)
+                    result = index, book_data, None
+                except Exception as e:
+                    result = index, None, e
+        finally:
+            finished.put_nowait(result)
+
+    async def feed():
+        if hasattr(books, '__aiter__'):
+            async for book_item in books:
+                tasks.append(asyncio.ensure_future(process(len(tasks), book_item)))
+        else:
+            for book_item in books:
+                tasks.append(asyncio.ensure_future(process(len(tasks), book_item)))
+        return len(tasks)
+
+    feeder = asyncio.ensure_future(feed())
+    received = 0
+    try:
+        # 书籍列表接收完毕且所有书都有结果后结束
+        while not (feeder.done() and received == feeder.result()):
+            getter = asyncio.ensure_future(finished.get())
+            await asyncio.wait({getter, feeder} if not feeder.done() else {getter},
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                continue
+            received += 1
+            result = getter.result()
+            if result is not None:
+                yield result
+    finally:
+        feeder.cancel()
+        for task in tasks:
+            task.cancel()
+
+async def extract_books_async(client, books, **options):
+    """处理全部书籍，返回与 books 顺序一致的 book_data 列表（跳过失败的书）"""
+    results = {}
+    async for index, book_data, error in iter_books_async(client, books, **options):
+        if error is None:
+            results[index] = book_data
+    return [results[index] for index in sorted(results)]
+
+async def _iterate_in_thread(iterable):
+    iterator = iter(iterable)
+    done = object()
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+def iter_books_sync(session, books, max_workers=4, delay=0, time_budget=None, read_info=False, threads=None):
+    """同步包装：在共享事件循环上运行提取，按完成顺序产出 (index, book_data, error)
+
+    session 为 requests.Session，会沿用它的 Cookie、User-Agent 和自适应并发控制器。
+    """
+    results = queue.Queue()
+    done = object()
+
+    async def job():
+        try:
+            limiter = getattr(session, 'limiter', None)
+            # 边下载边解析的书籍列表是阻塞的迭代器，在线程中读取，不阻塞共享的事件循环
+            source = books if isinstance(books, (list, tuple)) else _iterate_in_thread(books)
+            transport = getattr(session, 'async_transport', None)
+            async with create_async_client(session.cookies, session.headers.get('User-Agent'), limiter=limiter,
+                                           transport=transport) as client:
+                async for item in iter_books_async(client, source, max_workers, delay, time_budget, read_info,
+                                                  threads):
+                    results.put(item)
+        finally:
+            results.put(done)
+
+    future = asyncio.run_coroutine_threadsafe(job(), get_event_loop())
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                break
+            yield item
+    except GeneratorExit:
+        # 调用方提前退出时取消剩余请求
+        future.cancel()
+        raise
+    future.result()
@@ -0,0 +1,97 @@
+"""执行后端：决定多本书的获取任务如何调度（串行、线程池、asyncio）
+
+每个后端都是一个生成器函数 run(func, items, max_workers, should_stop)，
+按完成顺序产出 (index, result, error)。should_stop 返回True后不再提交新任务，
+已经开始的任务会执行完。
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def _call(func, item):
+    try:
+        return func(item), None
+    except Exception as e:
+        return None, e
+
+def run_serial(func, items, max_workers=1, should_stop=None):
+    """逐个执行，最省资源"""
+    for index, item in enumerate(items):
+        if should_stop and should_stop():
+            break
+        result, error = _call(func, item)
+        yield index, result, error
+
+def run_threaded(func, items, max_workers=4, should_stop=None):
+    """线程池并发执行，最多同时 max_workers 个任务"""
+    items = iter(enumerate(items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+
+        # 只保持 max_workers 个任务在执行，超时后可以及时停止提交
+        def submit_next():
+            if should_stop and should_stop():
+                return False
+            try:
+                index, item = next(items)
+            except StopIteration:
+                return False
+            pending[executor.submit(_call, func, item)] = index
+            return True
+
+        while len(pending) < max_workers and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                result, error = future.result()
+                yield index, result, error
+                submit_next()
+
+def run_async(func, items, max_workers=4, should_stop=None):
+    """在asyncio事件循环中调度，阻塞的请求函数放到默认线程池中执行
+
+    安装了 httpx 时 engine 会改用 async_client 的原生异步实现，这里是未安装时的退路。
+    """
+    items = iter(enumerate(items))
+    loop = asyncio.new_event_loop()
+    try:
+        pending = {}
+
+        def submit_next():
+            if should_stop and should_stop():
+                return False
+            try:
+                index, item = next(items)
+            except StopIteration:
+                return False
+            pending[loop.run_in_executor(None, _call, func, item)] = index
+            return True
+
+        while len(pending) < max_workers and submit_next():
+            pass
+
+        while pending:
+            done, _ = loop.run_until_complete(asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))
+            for future in done:
+                index = pending.pop(future)
+                result, error = future.result()
+                yield index, result, error
+                submit_next()
+    finally:
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+BACKENDS = {
+    'serial': run_serial,
+    'threaded': run_threaded,
+    'async': run_async,
+}
+
+def get_backend(name):
+    """按名称获取执行后端"""
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的执行后端: {name}，可选: {', '.join(BACKENDS)}")
@@ -0,0 +1,221 @@
+"""命令行批量导出：一个文件中的多个账号并行导出，每个账号单独的输出目录
+
+- 每个账号在进程池中的一个进程里提取和导出，账号之间互不影响，某个账号失败不影响其他账号
+- 所有进程共享一个全局请求速率上限（每秒请求数），避免同一台机器对微信读书请求过快
+- 结束时输出每个账号和汇总的书籍数、请求数、失败数和吞吐量
+
+账号文件每行一个账号：`名称<TAB>Cookie`，或者只有Cookie（名称取 wr_vid）；空行和 # 开头的行会被忽略。
+
+示例：
+    python -m weread.batch --cookies cookies.txt --processes 4 --rate 10
+    python notebook_v1.py --batch cookies.txt
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import projection, store
+from .client import WEREAD_URL, USER_AGENT, cookie_identity, create_session, get_notebooklist
+from .engine import extract_books
+from .exporters import export_to_excel, export_to_json, export_to_markdown
+
+# 全局请求速率上限（每秒，所有账号合计），0 表示不限制
+DEFAULT_RATE = float(os.environ.get('WEREAD_BATCH_RATE', '10'))
+FORMATS = ('json', 'excel', 'markdown')
+INVALID_NAME_CHARS = re.compile(r'[\\/:*?"<>|\s]')
+
+class SharedRateLimiter:
+    """跨进程共享的请求速率上限：记录下一个请求最早可以发出的时间，每个请求把它推后 1/rate 秒"""
+
+    def __init__(self, rate, next_time=None):
+        self.rate = rate
+        self.next_time = next_time if next_time is not None else multiprocessing.Value('d', 0.0)
+
+    def wait(self):
+        if not self.rate:
+            return
+        with self.next_time.get_lock():
+            now = time.monotonic()
+            start = max(self.next_time.value, now)
+            self.next_time.value = start + 1 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+def limit_session(session, rate_limiter, counter):
+    """让会话的每个请求先经过全局速率上限，并计数"""
+    request = session.request
+
+    def limited_request(method, url, *args, **kwargs):
+        rate_limiter.wait()
+        counter[0] += 1
+        return request(method, url, *args, **kwargs)
+
+    session.request = limited_request
+    return session
+
+def read_accounts(path):
+    """读取账号文件，返回 [(名称, Cookie)]，名称可以用作目录名且不重复"""
+    accounts = []
+    used = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, _, cookie = line.partition('\t')
+            if not cookie:
+                cookie = name
+                identity = cookie_identity(cookie)
+                name = identity if identity != cookie else f'account{len(accounts) + 1}'
+            name = INVALID_NAME_CHARS.sub('_', name.strip()) or f'account{len(accounts) + 1}'
+            if name in used:
+                name = f'{name}_{len(accounts) + 1}'
+            used.add(name)
+            accounts.append((name, cookie.strip()))
+    return accounts
+
+_rate_limiter = None
+
+def _init_worker(rate, next_time):
+    global _rate_limiter
+    _rate_limiter = SharedRateLimiter(rate, next_time)
+
+def export_account(name, cookie, output_dir, formats=FORMATS, backend=None, max_workers=None):
+    """在工作进程中导出一个账号，返回统计信息（出错时 status 为 error，不抛出异常）"""
+    started = time.time()
+    requests_made = [0]
+    failed = [0]
+    result = {'name': name, 'status': 'ok', 'books': 0, 'failed_books': 0, 'notes': 0,
+              'requests': 0, 'elapsed': 0.0, 'output': output_dir, 'error': ''}
+    try:
+        session = limit_session(create_session(cookie, USER_AGENT), _rate_limiter or SharedRateLimiter(0), requests_made)
+        try:
+            session.get(WEREAD_URL)
+        except Exception as e:
+            print(f"[{name}] 访问主页出错: {e}")
+
+        # 只保留本次导出的格式用到的书籍字段
+        books = get_notebooklist(session, fields=projection.book_fields(list(formats) + (['store'] if store.ENABLED else [])))
+        if not books:
+            raise RuntimeError('获取书籍列表失败，请检查Cookie是否有效')
+
+        def on_book(index, book_item, book_data, error):
+            if error is not None:
+                failed[0] += 1
+
+        all_books_data = extract_books(session, books, on_book=on_book, backend=backend, max_workers=max_workers)
+
+        os.makedirs(output_dir, exist_ok=True)
+        if 'json' in formats:
+            export_to_json(all_books_data, os.path.join(output_dir, 'weread_notes.json'))
+        if 'excel' in formats:
+            export_to_excel(all_books_data, os.path.join(output_dir, 'weread_notes.xlsx'), processes=0)
+        if 'markdown' in formats:
+            export_to_markdown(all_books_data, os.path.join(output_dir, 'weread_notes_markdown'))
+        if store.ENABLED:
+            conn = store.connect(store.db_path_for(cookie))
+            try:
+                store.save_books(conn, all_books_data, books)
+            finally:
+                conn.close()
+
+        result['books'] = len(all_books_data)
+        result['notes'] = sum(len(book['notes']) for book in all_books_data)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['failed_books'] = failed[0]
+    result['requests'] = requests_made[0]
+    result['elapsed'] = round(time.time() - started, 3)
+    return result
+
+def summarize(results, elapsed):
+    """汇总所有账号的结果"""
+    ok = [r for r in results if r['status'] == 'ok']
+    books = sum(r['books'] for r in results)
+    requests_made = sum(r['requests'] for r in results)
+    failed_books = sum(r['failed_books'] for r in results)
+    return {
+        'accounts': len(results),
+        'succeeded': len(ok),
+        'failed': len(results) - len(ok),
+        'books': books,
+        'failed_books': failed_books,
+        'notes': sum(r['notes'] for r in results),
+        'requests': requests_made,
+        'elapsed': round(elapsed, 3),
+        'books_per_second': round(books / elapsed, 2) if elapsed else 0,
+        'requests_per_second': round(requests_made / elapsed, 2) if elapsed else 0,
+        'book_error_rate': round(failed_books / (books + failed_books), 4) if books + failed_books else 0,
+    }
+
+def print_report(results, summary):
+    print()
+    print(f"{'账号':<20}{'状态':<8}{'书籍':>6}{'失败':>6}{'笔记':>8}{'请求':>8}{'耗时(s)':>10}")
+    for r in sorted(results, key=lambda r: r['name']):
+        print(f"{r['name'][:19]:<20}{r['status']:<8}{r['books']:>6}{r['failed_books']:>6}"
+              f"{r['notes']:>8}{r['requests']:>8}{r['elapsed']:>10.1f}")
+        if r['error']:
+            print(f"    错误: {r['error']}")
+    print()
+    print(f"账号 {summary['accounts']} 个（成功 {summary['succeeded']}，失败 {summary['failed']}），"
+          f"书籍 {summary['books']} 本（失败 {summary['failed_books']}），笔记 {summary['notes']} 条")
+    print(f"总耗时 {summary['elapsed']:.1f}s，{summary['books_per_second']} 本/秒，"
+          f"{summary['requests_per_second']} 请求/秒，书籍失败率 {summary['book_error_rate']:.2%}")
+
+def run_batch(accounts, output_dir='outputs', processes=None, rate=DEFAULT_RATE, formats=FORMATS,
+              backend=None, max_workers=None):
+    """并行导出多个账号，返回 (每个账号的结果, 汇总)"""
+    processes = processes or min(4, len(accounts)) or 1
+    next_time = multiprocessing.Value('d', 0.0)
+    started = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(rate, next_time)) as executor:
+        futures = {
+            executor.submit(export_account, name, cookie, os.path.join(output_dir, name), formats, backend, max_workers): name
+            for name, cookie in accounts
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            message = f"{result['books']} 本书，{result['elapsed']:.1f}s" if result['status'] == 'ok' else result['error']
+            print(f"[{len(results)}/{len(accounts)}] {result['name']}: {message}")
+    return results, summarize(results, time.time() - started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='微信读书笔记批量导出（多个账号并行）')
+    parser.add_argument('--cookies', required=True, help='账号文件，每行 名称<TAB>Cookie 或只有Cookie')
+    parser.add_argument('--output', default='outputs', help='输出目录，每个账号一个子目录')
+    parser.add_argument('--processes', type=int, default=0, help='并行的账号数（进程数），默认 min(4, 账号数)')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='所有账号合计每秒最多请求数，0 不限制')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='导出格式，逗号分隔：json,excel,markdown')
+    parser.add_argument('--backend', choices=('serial', 'threaded'), default=None,
+                        help='每个账号内的执行后端，默认取 WEREAD_BACKEND（串行）')
+    parser.add_argument('--workers', type=int, default=None, help='每个账号同时处理的书籍数')
+    parser.add_argument('--json', help='把结果另存为JSON文件')
+    args = parser.parse_args(argv)
+
+    formats = [item.strip() for item in args.formats.split(',') if item.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"未知的导出格式: {', '.join(sorted(unknown))}")
+
+    accounts = read_accounts(args.cookies)
+    if not accounts:
+        parser.error('账号文件中没有账号')
+    print(f"共 {len(accounts)} 个账号，全局速率上限 {args.rate or '不限'} 请求/秒")
+
+    results, summary = run_batch(accounts, args.output, args.processes, args.rate, formats, args.backend, args.workers)
+    print_report(results, summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'accounts': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+    return 0 if not summary['failed'] else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+"""提取结果的短期缓存：同一用户在书籍列表未变化时重复提取，直接复用上次的结果
+
+缓存键由两部分组成：
+- 用户身份：Cookie 中 wr_vid 的 HMAC 摘要（不保存原始 Cookie 或 wr_vid）
+- 书籍列表指纹：get_notebooklist 返回的 bookId 和 sort 的 SHA-256 摘要
+
+缓存只保存在进程内存中，条目数量有上限（超出时淘汰最久未使用的），并在过期后删除。
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .client import cookie_identity
+
+# 默认缓存时间（秒）和最大条目数
+DEFAULT_TTL = int(os.environ.get('WEREAD_CACHE_TTL', '600'))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('WEREAD_CACHE_MAX_ENTRIES', '32'))
+
+def notebook_fingerprint(books):
+    """书籍列表指纹：任意一本书新增、删除或更新（sort变化）都会改变指纹"""
+    digest = hashlib.sha256()
+    for book_item in books:
+        digest.update(f"{book_item.get('bookId') or book_item.get('book', {}).get('bookId')}:{book_item.get('sort')};".encode('utf-8'))
+    return digest.hexdigest()
+
+class ResultCache:
+    """带过期时间和容量上限的LRU缓存，线程安全"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, secret=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # 用于对用户身份做HMAC，默认每个进程随机生成
+        self._secret = (secret or os.urandom(32).hex()).encode('utf-8')
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def user_key(self, cookie_string):
+        """用户身份的HMAC摘要"""
+        return hmac.new(self._secret, cookie_identity(cookie_string).encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def make_key(self, cookie_string, books):
+        return f"{self.user_key(cookie_string)}:{notebook_fingerprint(books)}"
+
+    def get(self, key):
+        """返回未过期的缓存条目 {'data', 'files', 'paths', 'created'}，没有时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry['created'] > self.ttl:
+                del self._entries[key]
+                expired = entry
+            else:
+                self._entries.move_to_end(key)
+                return entry
+        _release([expired])
+        return None
+
+    def put(self, key, data, files, paths=()):
+        """保存一次提取的结果（数据、下载链接和导出文件路径）
+
+        同一用户的旧条目（书籍列表已变化）会被替换。
+        """
+        user = key.split(':', 1)[0]
+        with self._lock:
+            removed = [self._entries.pop(k) for k in list(self._entries) if k.split(':', 1)[0] == user]
+            self._entries[key] = {'data': data, 'files': files, 'paths': list(paths), 'created': time.time()}
+            while len(self._entries) > self.max_entries:
+                removed.append(self._entries.popitem(last=False)[1])
+        # 用缓存的数据重新导出后放回时，旧条目的数据就是 data，不能关闭
+        _release([entry for entry in removed if entry['data'] is not data])
+
+    def evict(self, key):
+        """删除指定条目"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        _release([entry])
+        return True
+
+    def has_user(self, cookie_string):
+        """该用户是否有缓存条目（可能已过期）"""
+        user = self.user_key(cookie_string)
+        with self._lock:
+            return any(k.split(':', 1)[0] == user for k in self._entries)
+
+    def evict_user(self, cookie_string):
+        """删除某个用户的全部条目"""
+        user = self.user_key(cookie_string)
+        with self._lock:
+            removed = [self._entries.pop(k) for k in list(self._entries) if k.split(':', 1)[0] == user]
+        _release(removed)
+        return len(removed)
+
+    def purge_expired(self):
+        """删除所有已过期的条目，返回删除数量"""
+        now = time.time()
+        with self._lock:
+            expired = [self._entries.pop(k) for k, entry in list(self._entries.items()) if now - entry['created'] > self.ttl]
+        _release(expired)
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            removed = list(self._entries.values())
+            self._entries.clear()
+        _release(removed)
+
+    def __len__(self):
+        return len(self._entries)
+
+def _release(entries):
+    """关闭被删除条目的数据（spill.SpillList 的临时文件），在锁外进行"""
+    for entry in entries:
+        close = getattr(entry['data'], 'close', None)
+        if close is not None:
+            close()
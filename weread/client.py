@@ -0,0 +1,274 @@
+"""微信读书API客户端：所有部署方式（Flask、Vercel、命令行）共用的接口函数"""
+import codecs
+import os
+from http.cookies import SimpleCookie
+
+import requests
+from requests.utils import cookiejar_from_dict
+import time
+
+from .jsonstream import iter_array_items
+from .projection import DEFAULT_FIELDS, project_notebook_item
+from .adaptive import ENABLED as adaptive_enabled, AdaptiveSession, get_limiter
+
+# API 地址，可通过环境变量指向其他地址（例如压测用的模拟服务，见 loadtest/）
+WEREAD_URL = os.environ.get('WEREAD_WEB_URL', "https://weread.qq.com/")
+WEREAD_API_BASE = os.environ.get('WEREAD_API_BASE', "https://i.weread.qq.com").rstrip('/')
+WEREAD_NOTEBOOKS_URL = f"{WEREAD_API_BASE}/user/notebooks"
+WEREAD_BOOKMARKLIST_URL = f"{WEREAD_API_BASE}/book/bookmarklist"
+WEREAD_CHAPTER_INFO = f"{WEREAD_API_BASE}/book/chapterInfos"
+WEREAD_READ_INFO_URL = f"{WEREAD_API_BASE}/book/readinfo"
+WEREAD_REVIEW_LIST_URL = f"{WEREAD_API_BASE}/review/list"
+WEREAD_REVIEW_SINGLE_URL = f"{WEREAD_API_BASE}/review/single"
+WEREAD_BOOK_INFO = f"{WEREAD_API_BASE}/book/info"
+
+# 笔记列表分页：每页条数，按返回的 synckey 获取下一页；0 为一次获取全部（默认）
+REVIEW_PAGE_SIZE = int(os.environ.get('WEREAD_REVIEW_PAGE_SIZE', '0'))
+REVIEW_MAX_PAGES = 100
+
+# 添加UA模拟正常浏览器访问
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+
+def parse_cookie_string(cookie_string):
+    """解析cookie字符串为CookieJar"""
+    cookie = SimpleCookie()
+    cookie.load(cookie_string)
+    cookies_dict = {}
+    cookiejar = None
+    for key, morsel in cookie.items():
+        cookies_dict[key] = morsel.value
+        cookiejar = cookiejar_from_dict(cookies_dict, cookiejar=None, overwrite=True)
+    return cookiejar
+
+def cookie_identity(cookie_string):
+    """取出Cookie中的用户ID（wr_vid），没有时使用整个Cookie"""
+    cookie = SimpleCookie()
+    cookie.load(cookie_string)
+    if 'wr_vid' in cookie:
+        return cookie['wr_vid'].value
+    return cookie_string
+
+def create_session(cookie, user_agent=None, adaptive=None):
+    """创建带有用户Cookie和User-Agent的会话
+
+    adaptive 为True时（默认取 WEREAD_ADAPTIVE），会话的请求由该用户的自适应并发控制器调度。
+    """
+    if adaptive is None:
+        adaptive = adaptive_enabled
+    if adaptive:
+        session = AdaptiveSession(get_limiter(cookie_identity(cookie)))
+    else:
+        session = requests.Session()
+    session.cookies = parse_cookie_string(cookie)
+    session.headers.update({'User-Agent': user_agent or USER_AGENT})
+    return session
+
+# 以下 parse_* 函数只处理响应数据，同步和异步客户端（async_client.py）共用
+
+def parse_bookmark_list(data):
+    # 排序在 engine.assemble_notes 中与笔记一起进行
+    return data["updated"]
+
+def parse_bookinfo(data):
+    isbn = data.get("isbn", "")
+    newRating = data.get("newRating", 0) / 1000
+    return (isbn, newRating, data)
+
+def parse_read_info(data):
+    """整理阅读信息：阅读时长（秒）、进度（%）、阅读天数，以及开始、最近和读完的时间戳（没有时为0）"""
+    if not data:
+        return None
+    detail = data.get("readDetail") or {}
+    return {
+        "reading_time": data.get("readingTime") or detail.get("totalReadingTime") or 0,
+        "progress": data.get("readingProgress") or 0,
+        "read_days": data.get("totalReadDay") or detail.get("totalReadDay") or 0,
+        "start_date": detail.get("beginReadingDate") or 0,
+        "last_read_date": detail.get("lastReadingDate") or data.get("readingBookDate") or 0,
+        "finished": data.get("markedStatus") == 4 or bool(data.get("finishedDate")),
+        "finished_date": data.get("finishedDate") or 0,
+    }
+
+def parse_review_list(data, summary=None, reviews=None):
+    """一次遍历划分书评（type 4，保留原始项）和笔记（type 1，markText 为笔记内容）
+
+    笔记直接在响应的对象上修改，不复制；分页时传入前几页的 summary、reviews 继续追加。
+    """
+    summary = [] if summary is None else summary
+    reviews = [] if reviews is None else reviews
+    for item in data.get("reviews") or []:
+        review = item.get("review", {})
+        review_type = review.get("type")
+        if review_type == 4:
+            summary.append(item)
+        elif review_type == 1:
+            review["markText"] = review.get("content", "")
+            reviews.append(review)
+    return summary, reviews
+
+def review_list_params(bookId, sync_key=0, page_size=0):
+    params = dict(bookId=bookId, listType=11, mine=1, syncKey=sync_key)
+    if page_size:
+        params["count"] = page_size
+    return params
+
+def next_review_sync_key(data, sync_key):
+    """分页获取时下一页的 syncKey，没有更多时返回None"""
+    next_key = data.get("synckey", data.get("syncKey"))
+    if data.get("hasMore") and next_key and next_key != sync_key:
+        return next_key
+    return None
+
+def parse_review_comments(data):
+    """笔记的评论（讨论串）：每条保留内容、时间和评论者昵称"""
+    comments = []
+    for item in (data or {}).get("comments") or []:
+        comment = item.get("comment", item)
+        comments.append({
+            "content": comment.get("content", ""),
+            "createTime": comment.get("createTime", 0),
+            "author": (comment.get("author") or {}).get("name", ""),
+        })
+    return comments
+
+def parse_chapter_info(data):
+    if (
+        "data" in data
+        and len(data["data"]) == 1
+        and "updated" in data["data"][0]
+    ):
+        update = data["data"][0]["updated"]
+        return {item["chapterUid"]: item for item in update}
+    return None
+
+def parse_notebooklist(data, fields=DEFAULT_FIELDS):
+    """书籍列表按 sort 排序，每本书的 book 对象只保留 fields 中的字段（见 projection.py，None 为全部保留）"""
+    books = data.get("books")
+    if books:
+        books = [project_notebook_item(item, fields) for item in books]
+        books.sort(key=lambda x: x["sort"])
+        return books
+    return None
+
+def sort_notebooklist(books):
+    """按 sort 排序，与 get_notebooklist 返回的顺序一致"""
+    return sorted(books, key=lambda x: x["sort"])
+
+def chapter_info_body(bookId):
+    return {"bookIds": [bookId], "synckeys": [0], "teenmode": 0}
+
+#获取划线列表
+def get_bookmark_list(session, bookId):
+    params = dict(bookId=bookId)
+    r = session.get(WEREAD_BOOKMARKLIST_URL, params=params)
+    if r.ok:
+        return parse_bookmark_list(r.json())
+    return None
+
+#获取阅读信息（进度、阅读时间等）
+def get_read_info(session, bookId):
+    params = dict(bookId=bookId, readingDetail=1, readingBookIndex=1, finishedDate=1)
+    r = session.get(WEREAD_READ_INFO_URL, params=params)
+    if r.ok:
+        return r.json()
+    return None
+
+#获取书籍的 ISBN 和评分
+def get_bookinfo(session, bookId):
+    params = dict(bookId=bookId)
+    r = session.get(WEREAD_BOOK_INFO, params=params)
+    isbn = ""
+    if r.ok:
+        return parse_bookinfo(r.json())
+    else:
+        print(f"get {bookId} book info failed")
+        return ("", 0, {})
+
+#获取笔记和点评
+def get_review_list(session, bookId, page_size=None):
+    """page_size 不为0时（默认取 WEREAD_REVIEW_PAGE_SIZE）分页获取，每页解析后即丢弃响应"""
+    page_size = REVIEW_PAGE_SIZE if page_size is None else page_size
+    summary, reviews = [], []
+    sync_key = 0
+    for _ in range(REVIEW_MAX_PAGES):
+        r = session.get(WEREAD_REVIEW_LIST_URL, params=review_list_params(bookId, sync_key, page_size))
+        if not r.ok:
+            break
+        data = r.json()
+        parse_review_list(data, summary, reviews)
+        sync_key = next_review_sync_key(data, sync_key) if page_size else None
+        if sync_key is None:
+            break
+    return summary, reviews
+
+#获取一条笔记的评论
+def get_review_comments(session, reviewId):
+    r = session.get(WEREAD_REVIEW_SINGLE_URL, params=dict(reviewId=reviewId))
+    if r.ok:
+        return parse_review_comments(r.json())
+    return []
+
+#获取章节信息
+def get_chapter_info(session, bookId):
+    r = session.post(WEREAD_CHAPTER_INFO, json=chapter_info_body(bookId))
+    if r.ok:
+        return parse_chapter_info(r.json())
+    return None
+
+#笔记本列表
+def get_notebooklist(session, fields=DEFAULT_FIELDS, max_retries=3):
+    # 增加重试机制
+    retry_count = 0
+    
+    while retry_count < max_retries:
+        try:
+            r = session.get(WEREAD_NOTEBOOKS_URL)
+            print(f"笔记本列表请求状态码: {r.status_code}")
+            
+            if r.ok:
+                data = r.json()
+                books = parse_notebooklist(data, fields)
+                if books:
+                    return books
+                else:
+                    print(f"获取到的数据中没有books字段: {data}")
+            else:
+                print(f"请求笔记本列表失败: {r.text}")
+            
+            retry_count += 1
+            if retry_count < max_retries:
+                time.sleep(2)  # 等待2秒后重试
+        except Exception as e:
+            print(f"获取笔记本列表出错: {e}")
+            retry_count += 1
+            if retry_count < max_retries:
+                time.sleep(2)  # 等待2秒后重试
+    
+    return None
+
+#边下载边解析笔记本列表
+def iter_notebooklist(session, max_retries=3, chunk_size=64 * 1024, fields=DEFAULT_FIELDS):
+    """逐条产出笔记本列表中的书籍，不等待整个响应下载完成
+
+    书籍按服务器返回的顺序产出（未按 sort 排序），每本书解析后立即按 fields 投影。连接失败或非200响应时和
+    get_notebooklist 一样重试；开始产出后出错则直接抛出异常。
+    """
+    for retry_count in range(max_retries):
+        try:
+            r = session.get(WEREAD_NOTEBOOKS_URL, stream=True)
+            print(f"笔记本列表请求状态码: {r.status_code}")
+            if r.ok:
+                break
+            print(f"请求笔记本列表失败: {r.text}")
+        except Exception as e:
+            print(f"获取笔记本列表出错: {e}")
+        if retry_count < max_retries - 1:
+            time.sleep(2)  # 等待2秒后重试
+    else:
+        return
+
+    with r:
+        decoder = codecs.getincrementaldecoder(r.encoding or 'utf-8')(errors='replace')
+        chunks = (decoder.decode(chunk) for chunk in r.iter_content(chunk_size))
+        for item in iter_array_items(chunks, 'books'):
+            yield project_notebook_item(item, fields)
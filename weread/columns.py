@@ -0,0 +1,118 @@
+"""列式导出转换：把所有笔记的字段收集为数组，再批量转换时间、选择划线和笔记文本
+
+逐行调用 note_to_row 时，每条笔记都要在Python中做一次时间格式化和文本选择，
+十万条以上的导出中这部分占了大部分时间。这里先按字段收集，时间戳用numpy一次性转换为
+本地时间字符串（与 datetime.fromtimestamp 结果一致），文本用 numpy.where 批量选择，
+导出函数直接使用转换好的列。需要numpy（pandas的依赖）；未安装时导出函数退回逐行转换，结果相同。
+
+numpy 不在 requirements.txt 中：Vercel 的函数大小限制为15MB，装不下numpy，Vercel上始终使用逐行转换。
+Docker镜像单独安装numpy，使用批量转换。
+
+每次批量转换有固定开销（建数组、按天计算时区偏移），笔记少时比逐行转换还慢：
+逐本写出的导出（流式Excel、CSV、多工作表）把连续几本书合并成约 BATCH_NOTES 条一批，
+不到 MIN_NOTES 条的批次逐行转换（见 exporters.iter_export_rows）。
+"""
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TIME_FORMAT_LENGTH = len('2024-01-01 00:00:00')
+DAY = 86400
+# 时区偏移变化（夏令时切换等）都发生在整15分钟
+QUARTER = 900
+
+# 逐本写出时每批转换的笔记数，以及批量转换比逐行更快所需的最少笔记数
+# （loadtest/bench_export.py 中约150~200条时两者持平）
+BATCH_NOTES = int(os.environ.get('WEREAD_COLUMNS_BATCH', '2000'))
+MIN_NOTES = int(os.environ.get('WEREAD_COLUMNS_MIN_NOTES', '200'))
+
+def is_available():
+    return np is not None
+
+def _gmtoff(timestamp):
+    return time.localtime(int(timestamp)).tm_gmtoff
+
+def local_offsets(timestamps):
+    """每个时间戳在本地时区的UTC偏移（秒）
+
+    偏移只在切换时刻变化：先按天计算，某天开始和结束时的偏移不同时，再按15分钟细分这一天。
+    调用 time.localtime 的次数与涉及的天数相关，而不是笔记数量。
+    """
+    days, inverse = np.unique(timestamps // DAY, return_inverse=True)
+    day_start = np.array([_gmtoff(day * DAY) for day in days], dtype=np.int64)
+    day_end = np.array([_gmtoff((day + 1) * DAY) for day in days], dtype=np.int64)
+    offsets = day_start[inverse]
+    for day_index in np.nonzero(day_start != day_end)[0]:
+        mask = inverse == day_index
+        quarters, quarter_inverse = np.unique(timestamps[mask] // QUARTER, return_inverse=True)
+        offsets[mask] = np.array([_gmtoff(q * QUARTER) for q in quarters], dtype=np.int64)[quarter_inverse]
+    return offsets
+
+def format_timestamps(timestamps):
+    """批量格式化为本地时间 '%Y-%m-%d %H:%M:%S'，返回字符串数组"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not len(timestamps):
+        return np.array([], dtype=f'U{TIME_FORMAT_LENGTH}')
+    local = (timestamps + local_offsets(timestamps)).astype('datetime64[s]')
+    text = np.datetime_as_string(local, unit='s').astype(f'U{TIME_FORMAT_LENGTH}')
+    # ISO格式中日期和时间之间是 'T'，直接在字符数组上替换为空格
+    text.view(np.uint32).reshape(-1, TIME_FORMAT_LENGTH)[:, 10] = ord(' ')
+    return text
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+def collect_note_fields(data):
+    """按字段收集所有笔记，返回 {字段: numpy数组}
+
+    书籍级字段（书名、作者、ISBN、评分）按每本书的笔记数展开，
+    note 级字段保持 note 中的原始值，由调用方批量转换。
+    """
+    books = data if isinstance(data, list) else list(data)
+    notes = [note for book in books for note in book['notes']]
+    counts = [len(book['notes']) for book in books]
+
+    def per_book(values):
+        return np.repeat(_object_array(values), counts)
+
+    return {
+        'title': per_book([book['book_info'].get('title', '') for book in books]),
+        'author': per_book([book['book_info'].get('author', '') for book in books]),
+        'isbn': per_book([book.get('isbn', '') for book in books]),
+        'rating': per_book([book.get('rating', 0) for book in books]),
+        'chapter': _object_array([note.get('chapter_title', '') for note in notes]),
+        'type': _object_array([note.get('type') for note in notes]),
+        'is_review': np.array([bool(note.get('reviewId')) for note in notes], dtype=bool),
+        'mark_text': _object_array([note.get('markText', '') for note in notes]),
+        'abstract': _object_array([note.get('abstract', '') for note in notes]),
+        'content': _object_array([note.get('content', '') for note in notes]),
+        'create_time': np.fromiter((note.get('createTime', 0) for note in notes), dtype=np.int64, count=len(notes)),
+    }
+
+def export_columns(fields):
+    """由 collect_note_fields 的结果生成 exporters.EXPORT_COLUMNS 的各列（顺序相同），与 note_to_row 逐行结果一致"""
+    # 笔记的划线取引用的原文（abstract），没有时取 markText
+    review_text = np.where(fields['abstract'].astype(bool), fields['abstract'], fields['mark_text'])
+    return {
+        '书名': fields['title'],
+        '作者': fields['author'],
+        '章节': fields['chapter'],
+        '划线': np.where(fields['is_review'], review_text, fields['mark_text']),
+        '笔记': np.where(fields['is_review'], fields['content'], ''),
+        '创建时间': format_timestamps(fields['create_time']),
+    }
+
+def notes_to_columns(data):
+    """所有书的笔记转换为 {列名: 数组}"""
+    return export_columns(collect_note_fields(data))
+
+def iter_export_rows(data):
+    """一次批量转换 data 中所有书的笔记，产出每行的值（元组，顺序同 export_columns），用于逐行写入的导出"""
+    converted = notes_to_columns(data)
+    yield from zip(*(values.tolist() for values in converted.values()))
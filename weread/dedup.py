@@ -0,0 +1,171 @@
+"""笔记去重
+
+单本书内（dedupe_notes，整理笔记时调用）：
+1. 完全重复：同一章节中文本相同的划线/想法，按内容哈希只保留第一条
+2. 想法引用的原文（abstract）与某条划线文本相同时，去掉这条划线，想法已经包含原文
+3. 同一章节中位置重叠的划线：按 (chapterUid, range) 顺序扫描合并，
+   被包含的划线去掉；部分重叠且文本首尾相接的划线拼接成一条
+
+跨书（mark_near_duplicates，可选）：用 MinHash + LSH 找出内容近似的笔记，
+在较晚出现的笔记上标记 near_duplicate_of，不删除。
+
+所有步骤都是线性时间（笔记已按章节和位置排好序），适用于十万条以上的笔记库。
+"""
+import hashlib
+import re
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_whitespace = re.compile(r'\s+')
+
+def normalize_text(text):
+    """去掉空白差异后用于比较"""
+    return _whitespace.sub('', text or '')
+
+def _parse_range(note):
+    start, _, end = (note.get('range') or '').partition('-')
+    if not start:
+        return None
+    start = int(start)
+    return start, int(end) if end else start
+
+def _text_digest(*parts):
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=16).digest()
+
+def _merge_overlapping_text(left, right):
+    """右侧文本开头与左侧文本结尾重叠时拼接，找不到重叠返回None"""
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return None
+
+def dedupe_notes(notes):
+    """单本书的笔记去重，notes 需已按 (chapterUid, range起点) 排序，返回新列表"""
+    # 想法引用的原文，用于去掉重复的划线
+    review_abstracts = {
+        (note.get('chapterUid', 1), normalize_text(note.get('abstract')))
+        for note in notes
+        if note.get('reviewId') and note.get('abstract')
+    }
+
+    result = []
+    seen = set()
+    # 最后一条保留下来的划线、它在 result 中的位置及其范围
+    last_highlight = None
+    last_position = None
+    last_range = None
+
+    for note in notes:
+        chapter = note.get('chapterUid', 1)
+        if note.get('reviewId'):
+            digest = _text_digest('review', str(chapter), normalize_text(note.get('abstract')), normalize_text(note.get('content') or note.get('markText')))
+            if digest in seen:
+                continue
+            seen.add(digest)
+            result.append(note)
+            continue
+
+        text = normalize_text(note.get('markText'))
+        digest = _text_digest('highlight', str(chapter), text)
+        if digest in seen or (chapter, text) in review_abstracts:
+            continue
+
+        note_range = _parse_range(note)
+        if (
+            last_highlight is not None
+            and note_range is not None
+            and last_highlight.get('chapterUid', 1) == chapter
+            and note_range[0] <= last_range[1]
+        ):
+            if note_range[1] <= last_range[1]:
+                # 被上一条划线完全包含
+                continue
+            merged = _merge_overlapping_text(last_highlight.get('markText', ''), note.get('markText', ''))
+            if merged is not None:
+                # 部分重叠：扩展上一条划线（复制后修改，不改动原始数据）
+                merged_note = {**last_highlight, 'markText': merged, 'range': f'{last_range[0]}-{note_range[1]}'}
+                result[last_position] = merged_note
+                seen.add(digest)
+                last_highlight, last_range = merged_note, (last_range[0], note_range[1])
+                continue
+
+        seen.add(digest)
+        result.append(note)
+        if note_range is not None:
+            last_highlight, last_position, last_range = note, len(result) - 1, note_range
+    return result
+
+def _shingle_hashes(text, size):
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+def _permutations(num_perm, seed=1):
+    import random
+    rng = random.Random(seed)
+    return ([rng.randrange(1, _MERSENNE_PRIME) for _ in range(num_perm)],
+            [rng.randrange(0, _MERSENNE_PRIME) for _ in range(num_perm)])
+
+def _minhash(hashes, a, b):
+    # (a*h + b) mod p；h 为32位、a 为29位，乘积不会超出 uint64
+    if np is not None:
+        values = np.fromiter(hashes, dtype=np.uint64)
+        products = (a[:, None] * values[None, :] + b[:, None]) % np.uint64(_MERSENNE_PRIME)
+        return tuple(products.min(axis=1).tolist())
+    return tuple(min((ai * h + bi) % _MERSENNE_PRIME for h in hashes) for ai, bi in zip(a, b))
+
+# 每个LSH桶最多保留的笔记数，避免大量相同内容时退化为平方复杂度
+MAX_BUCKET_SIZE = 32
+
+def mark_near_duplicates(books_data, threshold=0.8, num_perm=64, bands=16, shingle_size=5, min_length=10):
+    """跨书标记近似重复的笔记，返回 [(book_id, note_key, duplicate_of, 相似度), ...]
+
+    相似度为 MinHash 估计的 Jaccard 系数；较晚出现的笔记会被加上
+    near_duplicate_of = '<bookId>:<bookmarkId/reviewId>'。
+    """
+    a, b = _permutations(num_perm)
+    a = [value & ((1 << 29) - 1) or 1 for value in a]
+    if np is not None:
+        a, b = np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64)
+    rows = num_perm // bands
+
+    buckets = {}
+    signatures = []
+    pairs = []
+    for book in books_data:
+        book_id = str(book['book_info'].get('bookId'))
+        for note in book['notes']:
+            text = normalize_text(note.get('abstract') or note.get('markText'))
+            if len(text) < min_length:
+                continue
+            note_key = f"{book_id}:{note.get('reviewId') or note.get('bookmarkId')}"
+            signature = _minhash(_shingle_hashes(text, shingle_size), a, b)
+            index = len(signatures)
+            signatures.append(signature)
+
+            candidates = set()
+            for band in range(bands):
+                key = (band, signature[band * rows:(band + 1) * rows])
+                bucket = buckets.setdefault(key, [])
+                candidates.update(bucket)
+                if len(bucket) < MAX_BUCKET_SIZE:
+                    bucket.append((index, note_key))
+
+            best = None
+            for other_index, other_key in candidates:
+                if other_key.split(':', 1)[0] == book_id:
+                    continue
+                other = signatures[other_index]
+                similarity = sum(1 for x, y in zip(signature, other) if x == y) / num_perm
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (other_key, similarity)
+            if best:
+                note['near_duplicate_of'] = best[0]
+                pairs.append((book_id, note_key, best[0], best[1]))
+    return pairs
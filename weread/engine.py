@@ -0,0 +1,221 @@
+"""笔记提取引擎：单本书的数据组装，以及按执行后端批量处理书籍列表"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import profiling
+from .backends import get_backend
+from .dedup import dedupe_notes, mark_near_duplicates
+from .scheduler import schedule
+from .spill import SpillList
+from .client import (get_bookinfo, get_chapter_info, get_bookmark_list, get_review_list, get_review_comments,
+                     get_read_info, parse_read_info)
+
+# 默认执行方式：与之前相同，逐本串行处理、每本书后等待1秒，避免账号被限流；
+# 并发需通过环境变量（或 WEREAD_ADAPTIVE）显式开启
+DEFAULT_BACKEND = os.environ.get('WEREAD_BACKEND', 'serial')
+DEFAULT_WORKERS = int(os.environ.get('WEREAD_WORKERS', '4'))
+# 每个任务完成一本书后的等待时间（秒），避免请求过快
+DEFAULT_DELAY = float(os.environ.get('WEREAD_DELAY', '1'))
+# 单本书内的笔记去重、跨书近似重复标记（见 dedup.py），默认关闭
+DEDUP = os.environ.get('WEREAD_DEDUP', '0') == '1'
+NEAR_DEDUP = os.environ.get('WEREAD_NEAR_DEDUP', '0') == '1'
+# 同时获取阅读信息（阅读时长、进度、读完日期），默认关闭
+READ_INFO = os.environ.get('WEREAD_READ_INFO', '0') == '1'
+
+def _note_sort_key(x):
+    """按章节、划线起始位置排序"""
+    range_start = x.get("range", "").split("-")[0]
+    return (x.get("chapterUid", 1), int(range_start) if range_start else 0)
+
+def assemble_notes(bookmark_list, reviews, chapter_info, dedup=None):
+    """合并划线和笔记，排序并附加章节标题；dedup 为True时去掉重复和重叠的划线"""
+    all_notes = [item for item in bookmark_list or [] if item.get('type') == 1]
+    all_notes.extend(reviews or [])
+    all_notes.sort(key=_note_sort_key)
+    if DEDUP if dedup is None else dedup:
+        all_notes = dedupe_notes(all_notes)
+
+    for note in all_notes:
+        chapterUid = note.get("chapterUid", 1)
+        if chapter_info and chapterUid in chapter_info:
+            note["chapter_title"] = chapter_info[chapterUid].get("title", "")
+        else:
+            note["chapter_title"] = ""
+    return all_notes
+
+def fetch_read_info(session, bookId):
+    """获取并整理阅读信息，失败时返回None，不影响笔记的导出"""
+    try:
+        return parse_read_info(get_read_info(session, bookId))
+    except Exception as e:
+        print(f"获取阅读信息出错: {e}")
+        return None
+
+def thread_reviews(notes, summary):
+    """需要获取评论的笔记和书评（有 reviewId 的 review 对象）"""
+    reviews = [note for note in notes if note.get('reviewId')]
+    reviews.extend(item['review'] for item in summary if item.get('review', {}).get('reviewId'))
+    return reviews
+
+def fetch_review_threads(session, notes, summary):
+    """为笔记和书评附加 comments 字段（评论列表），获取失败的为空列表"""
+    for review in thread_reviews(notes, summary):
+        try:
+            review['comments'] = get_review_comments(session, review['reviewId'])
+        except Exception as e:
+            print(f"获取笔记评论出错: {e}")
+            review['comments'] = []
+
+#处理单本书：获取详情、章节、划线和笔记，并合并排序
+def build_book_data(session, book, read_info=False, executor=None, threads=False):
+    """read_info 为True时附加 read_info 字段；传入 executor 时阅读信息与其余请求同时获取
+
+    threads 为True时再获取每条笔记和书评的评论（每条一个请求，只对选中的书开启）。
+    """
+    bookId = book.get('bookId')
+    read_info_future = executor.submit(fetch_read_info, session, bookId) if read_info and executor else None
+
+    isbn, rating, book_info = get_bookinfo(session, bookId)
+    chapter_info = get_chapter_info(session, bookId)
+    bookmark_list = get_bookmark_list(session, bookId)
+    summary, reviews = get_review_list(session, bookId)
+
+    book_data = {
+        "book_info": book,
+        "isbn": isbn,
+        "rating": rating,
+        "notes": assemble_notes(bookmark_list, reviews, chapter_info),
+        "summary": summary
+    }
+    if threads:
+        fetch_review_threads(session, book_data["notes"], summary)
+    if read_info:
+        book_data["read_info"] = read_info_future.result() if read_info_future else fetch_read_info(session, bookId)
+    return book_data
+
+class BookStream:
+    """边接收边处理的书籍列表（如 client.iter_notebooklist）
+
+    迭代时逐条产出并记录，已经收到的书可以按下标访问，只能迭代一次。
+    complete 在列表全部接收后为True。
+    """
+
+    def __init__(self, iterable):
+        self._iterable = iterable
+        self.items = []
+        self.complete = False
+
+    def __iter__(self):
+        for book_item in self._iterable:
+            self.items.append(book_item)
+            yield book_item
+        self.complete = True
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __len__(self):
+        return len(self.items)
+
+def iter_books(session, books, backend=None, max_workers=None, delay=None, time_budget=None,
+               policy=None, pinned=None, read_info=None, threads=None):
+    """按完成顺序逐本产出 (index, book_data, error)，index 为在 books 中的位置
+
+    books 为 get_notebooklist 返回的列表，或边接收边产出书籍的 BookStream；
+    time_budget（秒）用尽后不再开始新的书籍。
+    policy/pinned 决定处理的先后顺序，见 scheduler.py；BookStream 按到达顺序处理，
+    调度需要完整的列表，不适用。read_info 为True时同时获取每本书的阅读信息。
+    threads 为 bookId 的集合，这些书额外获取笔记和书评的评论。
+    """
+    backend = backend or DEFAULT_BACKEND
+    run = get_backend(backend)
+    read_info = READ_INFO if read_info is None else read_info
+
+    # 会话带有自适应并发控制器时，由控制器决定请求节奏：
+    # 线程数取控制器的上限，不再需要固定的等待间隔
+    limiter = getattr(session, 'limiter', None)
+    if limiter is not None:
+        if backend == 'serial':
+            print("自适应并发控制需要 threaded 或 async 后端，串行后端下始终一次只发一个请求")
+        max_workers = max_workers or int(limiter.max_limit)
+        delay = 0 if delay is None else delay
+    max_workers = max_workers or DEFAULT_WORKERS
+    delay = DEFAULT_DELAY if delay is None else delay
+
+    # 按调度策略排列，产出时换回原来的下标
+    if isinstance(books, BookStream):
+        restore = lambda position: position
+        ordered_books = books
+    else:
+        order = schedule(books, policy, pinned)
+        restore = order.__getitem__
+        ordered_books = [books[index] for index in order]
+
+    # 安装了 httpx 时，async 后端使用原生异步客户端，单本书的请求也会并发发出
+    if backend == 'async':
+        from . import async_client
+        if async_client.is_available():
+            for position, book_data, error in async_client.iter_books_sync(session, ordered_books, max_workers, delay, time_budget,
+                                                                            read_info=read_info, threads=threads):
+                yield restore(position), book_data, error
+            return
+
+    start = time.time()
+    should_stop = (lambda: time.time() - start > time_budget) if time_budget else None
+
+    # 阅读信息的请求放在单独的线程池中，与每本书的其余请求重叠，总耗时几乎不增加
+    executor = ThreadPoolExecutor(max_workers=max_workers) if read_info else None
+
+    def task(book_item):
+        book = book_item.get('book')
+        book_data = build_book_data(session, book, read_info, executor, bool(threads) and book.get('bookId') in threads)
+        if delay:
+            time.sleep(delay)
+        return book_data
+
+    try:
+        # 正在对本次任务做性能分析时（见 profiling.py），只在工作线程中分析每本书的任务
+        task = profiling.task_wrapper()(task)
+        for position, book_data, error in run(task, ordered_books, max_workers=max_workers, should_stop=should_stop):
+            yield restore(position), book_data, error
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+def extract_books(session, books, on_book=None, near_dedup=None, memory_limit=None, spill_dir=None, **options):
+    """处理全部书籍，返回与 books 顺序一致的 book_data 列表
+
+    books 为 BookStream 时结果按 sort 排列，与 get_notebooklist 的顺序一致。
+    on_book(index, book_item, book_data, error) 在每本书完成（或失败）时调用，
+    可用于进度通知；失败的书会被跳过。near_dedup 为True时标记跨书近似重复的笔记。
+
+    设置 memory_limit（字节）时返回 spill.SpillList：超过上限的书写入 spill_dir 中的临时文件
+    （spill_dir 为 None 时为匿名临时文件），导出函数逐本读回，此模式下不做跨书近似重复标记。
+    其余参数同 iter_books。
+    """
+    # 流式接收的书籍到达顺序不一定是 sort 顺序，完成时就能确定每本书的排序键
+    if isinstance(books, BookStream):
+        position = lambda index: (books[index].get('sort') or 0, index)
+    else:
+        position = lambda index: index
+
+    if memory_limit:
+        results = SpillList(spill_dir, memory_limit)
+        for index, book_data, error in iter_books(session, books, **options):
+            if on_book:
+                on_book(index, books[index], book_data, error)
+            if error is None:
+                results.append(position(index), book_data)
+        return results
+
+    results = {}
+    for index, book_data, error in iter_books(session, books, **options):
+        if on_book:
+            on_book(index, books[index], book_data, error)
+        if error is None:
+            results[position(index)] = book_data
+    all_books_data = [results[key] for key in sorted(results)]
+    if NEAR_DEDUP if near_dedup is None else near_dedup:
+        mark_near_duplicates(all_books_data)
+    return all_books_data
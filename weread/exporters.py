@@ -0,0 +1,397 @@
+"""导出函数：JSON、Excel、CSV和Markdown"""
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from . import columns
+from .engine import iter_books
+
+# 默认输出目录
+OUTPUT_DIR = "outputs"
+
+# Excel布局：flat 单个工作表 / sheets 汇总表加每本书一个工作表
+EXCEL_LAYOUT = os.environ.get('WEREAD_EXCEL_LAYOUT', 'flat')
+
+# 添加导出到JSON的函数
+def export_to_json(data, filename=None):
+    """导出数据到JSON文件"""
+    if filename is None:
+        filename = os.path.join(OUTPUT_DIR, 'weread_notes.json')
+    
+    # 逐本写入，结果与 json.dump(list(data), indent=2) 相同，但不需要一次性序列化全部数据
+    with open(filename, 'w', encoding='utf-8') as f:
+        first = True
+        for book in data:
+            f.write('[\n  ' if first else ',\n  ')
+            f.write(json.dumps(book, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+            first = False
+        f.write('[]' if first else '\n]')
+    print(f"数据已成功导出到 {filename}")
+
+# Excel/CSV导出的列
+EXPORT_COLUMNS = ['书名', '作者', '章节', '划线', '笔记', '创建时间']
+
+def note_to_row(book_name, book_author, note):
+    """把一条划线或笔记转换为导出表格中的一行"""
+    if note.get('reviewId'):
+        huaxian_text = note.get('abstract', '') or note.get('markText', '')
+        biji_text = note.get('content', '')
+    else:
+        huaxian_text = note.get('markText', '')
+        biji_text = ''
+
+    created_time = datetime.fromtimestamp(note.get('createTime', 0)).strftime('%Y-%m-%d %H:%M:%S')
+
+    return {
+        '书名': book_name,
+        '作者': book_author,
+        '章节': note.get('chapter_title', ''),
+        '划线': huaxian_text,
+        '笔记': biji_text,
+        '创建时间': created_time
+    }
+
+# 阅读统计表（获取了阅读信息时导出，见 engine.READ_INFO）
+READ_INFO_SHEET = '阅读统计'
+READ_INFO_COLUMNS = ['书名', '作者', '阅读进度(%)', '阅读时长(分钟)', '阅读天数', '开始阅读', '最近阅读', '读完日期']
+
+def _format_date(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d') if timestamp else ''
+
+def read_info_row(book):
+    """把一本书的阅读信息转换为阅读统计表中的一行，获取失败的书只有书名和作者"""
+    book_info = book['book_info']
+    info = book.get('read_info') or {}
+    return {
+        '书名': book_info.get('title', ''),
+        '作者': book_info.get('author', ''),
+        '阅读进度(%)': info.get('progress', ''),
+        '阅读时长(分钟)': round(info['reading_time'] / 60) if info else '',
+        '阅读天数': info.get('read_days', ''),
+        '开始阅读': _format_date(info.get('start_date')),
+        '最近阅读': _format_date(info.get('last_read_date')),
+        '读完日期': _format_date(info.get('finished_date')),
+    }
+
+# 添加导出到Excel的函数
+def export_to_excel(data, filename=None, layout=None, processes=None):
+    """导出数据到Excel文件
+
+    layout 为 flat（默认）时所有笔记在一个工作表中：data 为列表时用pandas生成；
+    为其他可迭代对象（如 spill.SpillList）或未安装pandas时，用openpyxl的只写模式逐行写入，
+    内存占用与数据量无关。layout 为 sheets 时生成汇总表加每本书一个工作表，见 xlsx.py，
+    processes 为生成工作表的进程数（None 为 WEREAD_EXCEL_PROCESSES，0 为CPU核数）。
+    书籍数据中有阅读信息时另外生成阅读统计工作表。
+    """
+    if filename is None:
+        filename = os.path.join(OUTPUT_DIR, 'weread_notes.xlsx')
+    
+    if (layout or EXCEL_LAYOUT) == 'sheets':
+        from .xlsx import export_to_excel_sheets
+        export_to_excel_sheets(data, filename, processes=processes)
+        print(f"数据已成功导出到 {filename}")
+        return
+    
+    # pandas只在导出Excel时才需要
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    
+    if pd is None or not columns.is_available() or not isinstance(data, list):
+        _export_to_excel_streaming(data, filename)
+        print(f"数据已成功导出到 {filename}")
+        return
+        
+    # 批量转换时间和文本，直接用转换好的列生成DataFrame
+    notes_data = columns.notes_to_columns(data)
+    
+    # 如果没有笔记数据，添加一个空行
+    if not len(notes_data['创建时间']):
+        notes_data = dict.fromkeys(EXPORT_COLUMNS, [''])
+    
+    df = pd.DataFrame(notes_data)
+    read_rows = [read_info_row(book) for book in data if 'read_info' in book]
+    if read_rows:
+        with pd.ExcelWriter(filename) as writer:
+            df.to_excel(writer, index=False)
+            pd.DataFrame(read_rows, columns=READ_INFO_COLUMNS).to_excel(writer, sheet_name=READ_INFO_SHEET, index=False)
+    else:
+        df.to_excel(filename, index=False)
+    print(f"数据已成功导出到 {filename}")
+
+# pandas 2.x 写入的表头样式（加粗、细边框、水平居中、顶端对齐），未安装pandas时逐行写入也使用它
+PANDAS_HEADER_STYLE = {
+    'font': {'bold': True},
+    'borders': {'top': 'thin', 'right': 'thin', 'bottom': 'thin', 'left': 'thin'},
+    'alignment': {'horizontal': 'center', 'vertical': 'top'},
+}
+
+def _pandas_header_style():
+    """当前安装的pandas写入表头时使用的样式（pandas 3.0 起不设置样式，返回None）"""
+    try:
+        import pandas as pd
+        from pandas.io.formats.excel import ExcelFormatter
+    except ImportError:
+        return PANDAS_HEADER_STYLE
+    return getattr(ExcelFormatter(pd.DataFrame()), 'header_style', None)
+
+def _header_row(ws, names, style):
+    """只写模式下的表头行，样式与pandas导出的相同"""
+    if not style:
+        return list(names)
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+    font = Font(**style.get('font', {}))
+    border = Border(**{side: Side(style=value) for side, value in style.get('borders', {}).items()})
+    alignment = Alignment(**style.get('alignment', {}))
+    row = []
+    for name in names:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font, cell.border, cell.alignment = font, border, alignment
+        row.append(cell)
+    return row
+
+def _export_to_excel_streaming(data, filename):
+    """用openpyxl只写模式逐行写入与 export_to_excel 相同的列和表头样式"""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    header_style = _pandas_header_style()
+    # 工作表名与pandas导出的相同
+    ws = wb.create_sheet('Sheet1')
+    ws.append(_header_row(ws, EXPORT_COLUMNS, header_style))
+    empty = True
+    read_rows = []
+
+    def books():
+        for book in data:
+            if 'read_info' in book:
+                read_rows.append(read_info_row(book))
+            yield book
+
+    for row in iter_export_rows(books()):
+        ws.append(row)
+        empty = False
+    if empty:
+        ws.append([''] * len(EXPORT_COLUMNS))
+    if read_rows:
+        stats = wb.create_sheet(READ_INFO_SHEET)
+        stats.append(_header_row(stats, READ_INFO_COLUMNS, header_style))
+        for row in read_rows:
+            stats.append([row[column] for column in READ_INFO_COLUMNS])
+    wb.save(filename)
+    
+def iter_export_rows(data):
+    """逐行产出 EXPORT_COLUMNS 顺序的值
+
+    安装了numpy时把连续几本书合并成约 columns.BATCH_NOTES 条笔记一批批量转换，
+    不到 columns.MIN_NOTES 条的批次（笔记很少的书库、CSV中单独的一本小书）逐行转换更快。
+    """
+    batch, notes = [], 0
+    for book in data:
+        batch.append(book)
+        notes += len(book['notes'])
+        if notes >= columns.BATCH_NOTES:
+            yield from _convert_rows(batch, notes)
+            batch, notes = [], 0
+    yield from _convert_rows(batch, notes)
+
+def _convert_rows(books, notes):
+    if columns.is_available() and notes >= columns.MIN_NOTES:
+        yield from columns.iter_export_rows(books)
+        return
+    for book in books:
+        book_info = book['book_info']
+        for note in book['notes']:
+            row = note_to_row(book_info.get('title', ''), book_info.get('author', ''), note)
+            yield [row[column] for column in EXPORT_COLUMNS]
+
+# 边获取边生成CSV，不落盘
+def iter_csv_export(session, books, **options):
+    """逐本获取书籍笔记并产出CSV数据块（UTF-8，带BOM以便Excel识别）
+
+    options 传给 engine.iter_books。书籍按在 books 中的顺序（书架顺序，与Excel和JSON相同）输出：
+    提前完成的书先渲染成CSV暂存，轮到它时再产出。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+    # 已完成、还没轮到的书的CSV数据；失败或跳过的书为空
+    pending = {}
+    released = 0
+    for index, book_data, error in iter_books(session, books, **options):
+        if error is not None:
+            print(f"处理 {books[index].get('book', {}).get('title')} 出错: {error}")
+            pending[index] = b''
+        else:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(iter_export_rows([book_data]))
+            pending[index] = buffer.getvalue().encode('utf-8')
+        while released in pending:
+            chunk = pending.pop(released)
+            released += 1
+            if chunk:
+                yield chunk
+
+    # 超出时间预算等原因没有处理的书被跳过
+    for index in sorted(pending):
+        if pending[index]:
+            yield pending[index]
+
+# Markdown文件名中不允许出现的字符
+INVALID_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\r\n\t]')
+
+def _markdown_filename(book_info):
+    """根据书名生成安全的Markdown文件名"""
+    title = INVALID_FILENAME_CHARS.sub('_', book_info.get('title', '') or '').strip(' .')
+    return title[:100] or str(book_info.get('bookId', 'untitled'))
+
+def _comment_lines(comments):
+    """笔记或书评的评论（获取了评论时），渲染为列表"""
+    lines = [f"- {comment.get('author') or '匿名'}：{comment.get('content', '')}" for comment in comments or []]
+    if lines:
+        lines.append('')
+    return lines
+
+def render_book_markdown(book):
+    """把一本书的数据渲染成Markdown文本（兼容Obsidian的YAML头）"""
+    book_info = book['book_info']
+    title = book_info.get('title', '')
+    lines = [
+        '---',
+        f'title: {json.dumps(title, ensure_ascii=False)}',
+        f'author: {json.dumps(book_info.get("author", ""), ensure_ascii=False)}',
+        f'bookId: {json.dumps(str(book_info.get("bookId", "")))}',
+        f'isbn: {json.dumps(book.get("isbn", "") or "")}',
+        f'rating: {book.get("rating", 0)}',
+    ]
+    if book.get('read_info'):
+        read_info = read_info_row(book)
+        lines.extend([
+            f'progress: {read_info["阅读进度(%)"]}',
+            f'reading_minutes: {read_info["阅读时长(分钟)"]}',
+            f'finished: {json.dumps(read_info["读完日期"])}',
+        ])
+    lines.extend([
+        '---',
+        '',
+        f'# {title}',
+        '',
+    ])
+
+    # 按章节分组，笔记已按章节和位置排好序，只需在章节变化时输出标题
+    current_chapter = None
+    for note in book['notes']:
+        chapter_title = note.get('chapter_title', '') or '未分章节'
+        if chapter_title != current_chapter:
+            current_chapter = chapter_title
+            lines.extend([f'## {chapter_title}', ''])
+
+        if note.get('reviewId'):
+            huaxian_text = note.get('abstract', '') or note.get('markText', '')
+            biji_text = note.get('content', '')
+        else:
+            huaxian_text = note.get('markText', '')
+            biji_text = ''
+
+        if huaxian_text:
+            lines.extend('> ' + line for line in huaxian_text.splitlines())
+            lines.append('')
+        if biji_text:
+            lines.extend([f'**笔记**：{biji_text}', ''])
+        lines.extend(_comment_lines(note.get('comments')))
+
+    # 书评（type为4的点评）放在文末
+    summary_texts = [item.get('review', {}).get('content', '') for item in book.get('summary') or []]
+    summary_texts = [text for text in summary_texts if text]
+    if summary_texts:
+        lines.extend(['## 书评', ''])
+        for item in book.get('summary') or []:
+            review = item.get('review', {})
+            if review.get('content'):
+                lines.extend([review['content'], ''])
+                lines.extend(_comment_lines(review.get('comments')))
+
+    return '\n'.join(lines)
+
+def _write_book_markdown(dirname, filename, book):
+    path = os.path.join(dirname, f'{filename}.md')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_book_markdown(book))
+    return path
+
+# 添加导出到Markdown的函数
+def export_to_markdown(data, dirname=None, max_workers=4):
+    """导出数据为Markdown目录，每本书一个文件，多本书并行渲染"""
+    if dirname is None:
+        dirname = os.path.join(OUTPUT_DIR, 'weread_notes_markdown')
+    os.makedirs(dirname, exist_ok=True)
+
+    used = set()
+    # 同时提交的任务数有上限，data 只遍历一次，可以是流式的可迭代对象（如流水线的队列）
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for book in data:
+            # 提交前分配好文件名，同名书籍追加bookId，避免并行写入时互相覆盖
+            filename = _markdown_filename(book['book_info'])
+            if filename in used:
+                filename = f"{filename}_{book['book_info'].get('bookId', len(used))}"
+            used.add(filename)
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(executor.submit(_write_book_markdown, dirname, filename, book))
+        for future in pending:
+            future.result()
+    print(f"数据已成功导出到 {dirname}")
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """只写、不可seek的缓冲区，zipfile写入的数据会被分块取走"""
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_zip_directory(dirname, chunk_size=64 * 1024):
+    """把目录边压缩边输出为zip数据块，不在内存或磁盘中暂存整个压缩包"""
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in sorted(os.listdir(dirname)):
+            path = os.path.join(dirname, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as src, zf.open(name, 'w') as dest:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dest.write(block)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # 写入中央目录
+    data = buffer.drain()
+    if data:
+        yield data
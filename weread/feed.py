@@ -0,0 +1,39 @@
+"""提取结果的逐行推送（NDJSON）：每完成一本书就把它的笔记发给浏览器，不必等全部处理完
+
+每行一个JSON对象，type 字段区分：
+- progress：进度（字段与 WebSocket 的 progress_update 相同）
+- book：一本书的笔记，notes 中每条为 [章节, 划线, 笔记, 创建时间]
+- result：最后一行，与 /extract 返回的JSON相同（含下载地址），另加 http_status
+"""
+import json
+
+from .exporters import note_to_row
+
+MIMETYPE = 'application/x-ndjson'
+NOTE_FIELDS = ['章节', '划线', '笔记', '创建时间']
+
+def dumps(event):
+    return json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+def progress_event(data):
+    return dict(data, type='progress')
+
+def book_event(book_data):
+    """一本书的笔记，列与Excel导出相同（书名、作者放在书的字段中）"""
+    book_info = book_data['book_info']
+    title = book_info.get('title', '')
+    author = book_info.get('author', '')
+    notes = []
+    for note in book_data['notes']:
+        row = note_to_row(title, author, note)
+        notes.append([row[field] for field in NOTE_FIELDS])
+    return {
+        'type': 'book',
+        'bookId': book_info.get('bookId', ''),
+        'title': title,
+        'author': author,
+        'notes': notes,
+    }
+
+def result_event(payload, status):
+    return dict(payload, type='result', http_status=status)
@@ -0,0 +1,100 @@
+"""增量JSON解析：从分块到达的文本中逐个产出顶层对象里某个数组的元素
+
+用于笔记本列表：不必等整个响应下载完再解析，每解析出一本书就可以开始获取它的详情。
+其他顶层字段会被解析后丢弃；数组元素用 json.JSONDecoder.raw_decode 解析，
+数据不完整时读取下一块再重试，已处理的文本会被丢弃，内存只与单个元素的大小有关。
+"""
+import json
+
+WHITESPACE = ' \t\n\r'
+
+class _Reader:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """读取下一块，没有更多数据时返回False"""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                # 丢弃已经处理过的部分
+                if self.pos:
+                    self.buffer = self.buffer[self.pos:]
+                    self.pos = 0
+                self.buffer += chunk
+                return True
+        self.eof = True
+        return False
+
+    def peek(self):
+        """跳过空白，返回下一个字符，数据结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON格式错误：位置 {self.pos} 处应为 {char!r}")
+        self.pos += 1
+
+    def decode(self):
+        """解析下一个完整的值"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # 数字恰好在缓冲区末尾时可能还没有完整到达（对象、字符串等有结束符，不需要等待）
+            if end == len(self.buffer) and type(value) in (int, float) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+def iter_array_items(chunks, key):
+    """chunks 为文本块的可迭代对象，产出顶层对象中 key 对应数组的每个元素
+
+    顶层不是对象或没有该字段时不产出任何元素；JSON格式错误时抛出异常。
+    """
+    reader = _Reader(chunks)
+    if reader.peek() != '{':
+        return
+    reader.pos += 1
+
+    while True:
+        char = reader.peek()
+        if char == '}' or not char:
+            return
+        if char == ',':
+            reader.pos += 1
+            continue
+
+        name = reader.decode()
+        reader.expect(':')
+        if name != key or reader.peek() != '[':
+            reader.decode()
+            continue
+
+        reader.pos += 1
+        while True:
+            char = reader.peek()
+            if char == ']':
+                reader.pos += 1
+                break
+            if char == ',':
+                reader.pos += 1
+                continue
+            if not char:
+                raise ValueError("JSON格式错误：数组没有结束")
+            yield reader.decode()
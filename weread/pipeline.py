@@ -0,0 +1,134 @@
+"""获取与导出流水线：边获取边导出，总耗时接近 max(获取, 导出) 而不是两者之和
+
+- 获取：iter_books 的执行后端并行获取每本书，单本书的笔记合并排序、附加章节在获取任务中完成
+- 排序缓冲：书按完成顺序到达，按与 extract_books 相同的最终顺序依次放出；
+  BookStream 要等书籍列表接收完才能确定顺序，在那之前完成的书先留在缓冲中。
+  到达的书直接写入结果（spill.SpillList），缓冲中只记录下标，轮到时再从结果中取出，
+  等待的书不会另外占用内存
+- 结果：设置了内存上限时超过上限的书只保存在磁盘上，导出完即可从内存中释放，返回的结果按需读回；
+  没有设置时全部留在内存中（与 extract_books 相同），不做额外的序列化
+- 导出：每个导出函数在单独的线程中运行，从有界队列中按顺序读取书籍并立即写出；
+  队列满时不再取新的获取结果，执行后端也就不再提交新书（背压），等待导出的书籍数有上限
+
+跨书近似重复标记需要全部书籍，开启时（WEREAD_NEAR_DEDUP）应使用 extract_books 后再导出。
+"""
+import os
+import queue
+import threading
+
+from . import profiling
+from .engine import BookStream, iter_books
+from .spill import SpillList
+
+# 每个导出线程的队列长度（本）
+QUEUE_SIZE = int(os.environ.get('WEREAD_PIPELINE_QUEUE', '8'))
+
+_DONE = object()
+
+class _Consumer:
+    """在单独线程中运行一个导出函数，书籍通过有界队列传入"""
+
+    def __init__(self, export, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self._finished = False
+        self.thread = threading.Thread(target=self._run, args=(export,), daemon=True)
+        self.thread.start()
+
+    def _items(self):
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                self._finished = True
+                return
+            yield item
+
+    def _run(self, export):
+        try:
+            export(self._items())
+        except BaseException as e:
+            self.error = e
+        # 导出出错或没有读完时继续取走剩余的书，避免获取阶段阻塞在已满的队列上
+        if not self._finished:
+            for _ in self._items():
+                pass
+
+    def put(self, book_data):
+        self.queue.put(book_data)
+
+    def finish(self):
+        self.queue.put(_DONE)
+        self.thread.join()
+
+def extract_and_export(session, books, exporters, on_book=None, on_fetched=None, memory_limit=None, spill_dir=None,
+                       queue_size=None, **options):
+    """获取全部书籍并同时导出，返回 spill.SpillList，按与 extract_books 相同的顺序遍历（供缓存和本地数据库使用）
+
+    exporters 为导出函数列表，每个以按顺序产出 book_data 的迭代器为参数，例如
+    lambda data: export_to_json(data, filename)。on_book 同 extract_books；
+    on_fetched 在全部书籍获取完成、等待导出结束之前调用。导出出错时在全部结束后抛出。
+    设置 memory_limit（字节）时超过上限的书写入 spill_dir 中的临时文件（spill_dir 为 None 时为
+    匿名临时文件）。其余参数同 extract_books（不做跨书近似重复标记）。
+    """
+    # 正在做性能分析时，导出线程中只分析导出函数本身
+    wrap = profiling.task_wrapper()
+    consumers = [_Consumer(wrap(export), queue_size or QUEUE_SIZE) for export in exporters]
+    results = SpillList(spill_dir, memory_limit or None)
+    stream = isinstance(books, BookStream)
+    # 书籍在最终结果中的顺序（下标列表），BookStream 接收完之前为 None
+    order = None if stream else range(len(books))
+    released = 0
+    # 已完成、还没轮到的书的下标（书籍数据在 results 中）；失败的书不在 results 中
+    pending = set()
+    failed = set()
+
+    def position(index):
+        # results 中的排序键，与最终顺序相同
+        return (books[index].get('sort') or 0, index) if stream else index
+
+    def release(index, book_data=None):
+        # 刚到达的书直接放出，等待过的书从结果中读回
+        if index in failed:
+            return
+        if book_data is None:
+            book_data = results[position(index)]
+        for consumer in consumers:
+            consumer.put(book_data)
+
+    try:
+        for index, book_data, error in iter_books(session, books, **options):
+            if on_book:
+                on_book(index, books[index], book_data, error)
+            if error is None:
+                results.append(position(index), book_data)
+            else:
+                failed.add(index)
+                book_data = None
+            pending.add(index)
+
+            if order is None and books.complete:
+                order = sorted(range(len(books)), key=position)
+            while order is not None and released < len(order) and order[released] in pending:
+                next_index = order[released]
+                released += 1
+                pending.discard(next_index)
+                release(next_index, book_data if next_index == index else None)
+            book_data = None
+
+        # 超出时间预算等原因没有处理的书被跳过，其后的书按顺序放出
+        if order is None:
+            order = sorted(range(len(books)), key=position)
+        for index in order[released:]:
+            if index in pending:
+                pending.discard(index)
+                release(index)
+        if on_fetched:
+            on_fetched()
+    finally:
+        for consumer in consumers:
+            consumer.finish()
+
+    for consumer in consumers:
+        if consumer.error is not None:
+            raise consumer.error
+    return results
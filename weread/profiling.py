@@ -0,0 +1,169 @@
+"""按需性能分析：对单次提取任务（抓取 + 导出）做profile，用于排查某个用户导出慢的原因
+
+- 只在配置了 WEREAD_PROFILE_TOKEN 且请求头 X-Profile-Token 与之相同时启用，普通请求没有任何开销
+- 默认使用cProfile（确定性），结果保存为 .prof，可用 `python -m pstats` 或 snakeviz 查看。
+  工作线程中只分析本任务提交的函数：engine 的每本书任务和流水线的导出函数用 task_wrapper 包装，
+  每次调用在执行它的线程上开启一个profiler、返回前在同一线程关闭，任务结束时合并。其他用户的任务、
+  共享的事件循环线程（async后端的请求）和长期存在的线程中的其他工作不会被记录
+- WEREAD_PROFILER=pyinstrument 且已安装pyinstrument时改用采样分析，结果保存为 .html；
+  pyinstrument 只采样启动分析的线程，工作线程中的耗时表现为等待
+- summary 为按累计时间排序的前 WEREAD_PROFILE_TOP 个函数
+"""
+import contextvars
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+PROFILE_TOKEN = os.environ.get('WEREAD_PROFILE_TOKEN', '')
+PROFILER = os.environ.get('WEREAD_PROFILER', 'cprofile')
+PROFILE_TOP = int(os.environ.get('WEREAD_PROFILE_TOP', '20'))
+
+# 当前线程（请求）中进行的任务分析
+_current = contextvars.ContextVar('weread_job_profiler', default=None)
+
+def is_requested(token):
+    """请求头中的token与配置的管理员token一致时才启用"""
+    if not PROFILE_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8'))
+
+class JobProfiler:
+    """用 with 包住一次任务，结束后保存profile文件并生成摘要"""
+
+    def __init__(self, output_dir, name='profile', engine=PROFILER, top=PROFILE_TOP):
+        self.output_dir = output_dir
+        self.name = name
+        self.engine = 'pyinstrument' if engine == 'pyinstrument' and SamplingProfiler else 'cprofile'
+        self.top = top
+        self.path = None
+        self.summary = []
+        self.elapsed = 0.0
+        self._profiler = None
+        self._thread_profilers = []
+        self._lock = threading.Lock()
+        self._thread_id = None
+        self._token = None
+        self._finished = False
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._thread_id = threading.get_ident()
+        self._token = _current.set(self)
+        if self.engine == 'pyinstrument':
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._started
+        _current.reset(self._token)
+        if self.engine == 'pyinstrument':
+            self._profiler.stop()
+            self.path = os.path.join(self.output_dir, f'{self.name}.html')
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+            self.summary = _pyinstrument_summary(self._profiler.last_session, self.top)
+        else:
+            self._profiler.disable()
+            stats = pstats.Stats(self._profiler)
+            with self._lock:
+                # 之后才结束的任务（如超出时间预算后仍在进行的请求）不再合并
+                self._finished = True
+                for profiler in self._thread_profilers:
+                    stats.add(profiler)
+                self._thread_profilers = []
+            self.path = os.path.join(self.output_dir, f'{self.name}.prof')
+            stats.dump_stats(self.path)
+            self.summary = _pstats_summary(stats, self.top)
+        return False
+
+    def wrap(self, func):
+        """包装本任务提交到工作线程的函数：每次调用在执行它的线程上开启profiler，返回前在同一线程关闭"""
+        if self.engine != 'cprofile':
+            return func
+
+        def profiled(*args, **kwargs):
+            # 在启动分析的线程中执行（如serial后端）时已经被记录
+            if threading.get_ident() == self._thread_id or self._finished:
+                return func(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 该线程已有其他profiler在运行
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                with self._lock:
+                    if not self._finished:
+                        self._thread_profilers.append(profiler)
+
+        return profiled
+
+    def report(self):
+        """返回给客户端的摘要"""
+        return {
+            'engine': self.engine,
+            'elapsed': round(self.elapsed, 3),
+            'file': os.path.basename(self.path) if self.path else None,
+            'top': self.summary,
+        }
+
+def task_wrapper():
+    """当前请求中进行的任务分析的 wrap 函数，没有进行分析时原样返回任务函数
+
+    需要在启动分析的线程中调用（例如提交任务之前），工作线程中取不到当前的分析。
+    """
+    profiler = _current.get()
+    if profiler is None:
+        return lambda func: func
+    return profiler.wrap
+
+def _pstats_summary(stats, top):
+    rows = []
+    for (filename, lineno, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{lineno}({function})',
+            'calls': ncalls,
+            'tottime': round(tottime, 4),
+            'cumtime': round(cumtime, 4),
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:top]
+
+def _pyinstrument_summary(session, top):
+    """按函数汇总累计时间；递归调用只计算最外层一次"""
+    totals = {}
+    root = session.root_frame() if session else None
+    stack = [(root, frozenset())] if root else []
+    while stack:
+        frame, ancestors = stack.pop()
+        key = f'{os.path.basename(frame.file_path_short or "")}:{frame.line_no}({frame.function})'
+        if key not in ancestors:
+            totals[key] = totals.get(key, 0.0) + frame.time
+        for child in frame.children:
+            stack.append((child, ancestors | {key}))
+    rows = [{'function': key, 'cumtime': round(value, 4)} for key, value in totals.items()]
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:top]
+
+def format_summary(summary):
+    """命令行/日志用的纯文本摘要"""
+    out = io.StringIO()
+    for row in summary:
+        out.write(f"{row['cumtime']:>10.4f}  {row['function']}\n")
+    return out.getvalue()
@@ -0,0 +1,50 @@
+"""书籍字段投影：笔记本列表中每本书的 book 对象只保留导出和存储用到的字段
+
+微信读书返回的 book 对象有几十个字段（价格、付费类型、版权章节等），之前原样作为 book_info
+保存在提取结果、缓存和JSON导出中。这里按输出格式列出用到的字段，书籍列表每解析出一本书就
+做投影，完整的对象不会被保留。
+
+JSON导出保留的字段可通过 WEREAD_JSON_BOOK_FIELDS 配置（逗号分隔），设为 * 时保留全部字段
+（与之前的结果相同）。
+"""
+import os
+
+ALL_FIELDS = '*'
+# 进度显示、去重和结果推送（feed）始终用到的字段
+BASE_FIELDS = ('bookId', 'title', 'author')
+
+def _env_fields(name, default):
+    value = os.environ.get(name, default).strip()
+    if value == ALL_FIELDS:
+        return ALL_FIELDS
+    return tuple(field.strip() for field in value.split(',') if field.strip())
+
+# 每种输出用到的 book_info 字段
+FORMAT_FIELDS = {
+    'json': _env_fields('WEREAD_JSON_BOOK_FIELDS', 'bookId,title,author,translator,cover,categories,publishTime'),
+    'excel': ('title', 'author'),
+    'csv': ('title', 'author'),
+    'markdown': ('bookId', 'title', 'author'),
+    # sort 在笔记本列表的项上，不在 book 对象中，见 store.save_books
+    'store': ('bookId', 'title', 'author'),
+}
+
+def book_fields(formats=None):
+    """formats 中各输出需要的字段（默认为全部输出），任一输出保留全部字段时返回 None"""
+    fields = list(BASE_FIELDS)
+    for fmt in FORMAT_FIELDS if formats is None else formats:
+        wanted = FORMAT_FIELDS[fmt]
+        if wanted == ALL_FIELDS:
+            return None
+        fields.extend(field for field in wanted if field not in fields)
+    return tuple(fields)
+
+def project_notebook_item(item, fields):
+    """笔记本列表中的一项：book 对象只保留 fields 中的字段，其余（sort、noteCount等）不变"""
+    book = item.get('book')
+    if fields is None or not isinstance(book, dict):
+        return item
+    item['book'] = {field: book[field] for field in fields if field in book}
+    return item
+
+DEFAULT_FIELDS = book_fields()
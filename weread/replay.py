@@ -0,0 +1,271 @@
+"""请求录制与回放：把一次真实提取中API的响应保存为脱敏的fixture，之后不联网重放
+
+- RecordingSession 包装真实的 requests.Session，记录每个请求的响应
+- ReplaySession 代替会话传给 client/engine 的函数，按请求（方法、路径、参数）返回录制的响应；
+  latency 可模拟网络延迟。安装了httpx时 async 后端通过 async_transport 同样走回放
+- 保存时去掉用户身份相关字段，划线和笔记文本可替换为等长的伪文本
+
+fixture 只记录URL的路径，与 WEREAD_API_BASE 无关。录制：
+    python -m weread.replay record --output tests/fixtures/library.json --redact-text
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+
+from .client import WEREAD_URL, USER_AGENT, cookie_identity, create_session, get_notebooklist
+from .engine import extract_books
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+FIXTURE_VERSION = 1
+# 保存时清空的字段（用户身份、头像等）
+SENSITIVE_KEYS = {'userVid', 'vid', 'avatar', 'nick', 'nickName', 'name', 'skey', 'accessToken', 'refreshToken'}
+# --redact-text 时替换为伪文本的字段
+TEXT_KEYS = {'markText', 'abstract', 'content'}
+# 伪文本使用的字符：常用汉字所在的 CJK 统一表意文字区
+PSEUDO_FIRST, PSEUDO_COUNT = 0x4E00, 0x9FA5 - 0x4E00 + 1
+
+def _key(method, url, params=None, body=None):
+    """请求的匹配键：方法、路径和排好序的查询参数、JSON请求体"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({str(k): str(v) for k, v in (params or {}).items()})
+    return (method.upper(), parts.path or '/', json.dumps(query, sort_keys=True),
+            json.dumps(body, sort_keys=True, ensure_ascii=False) if body is not None else '')
+
+def pseudo_text(text):
+    """与原文等长的伪文本，相同原文得到相同结果（保留去重等逻辑的行为）"""
+    if not text:
+        return text
+    digest = b''
+    counter = 0
+    while len(digest) < len(text) * 2:
+        digest += hashlib.sha256(f'{counter}:{text}'.encode('utf-8')).digest()
+        counter += 1
+    return ''.join(chr(PSEUDO_FIRST + int.from_bytes(digest[i * 2:i * 2 + 2], 'big') % PSEUDO_COUNT)
+                   for i in range(len(text)))
+
+def sanitize(value, redact_text=False, identities=()):
+    """递归清除敏感字段；identities 中的值（如用户ID）出现在任何字符串中都会被替换"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key in SENSITIVE_KEYS:
+                result[key] = 0 if isinstance(item, (int, float)) and not isinstance(item, bool) else ''
+            elif redact_text and key in TEXT_KEYS and isinstance(item, str):
+                result[key] = pseudo_text(item)
+            else:
+                result[key] = sanitize(item, redact_text, identities)
+        return result
+    if isinstance(value, list):
+        return [sanitize(item, redact_text, identities) for item in value]
+    if isinstance(value, str):
+        for identity in identities:
+            value = value.replace(identity, '0')
+    return value
+
+class RecordingSession:
+    """包装 requests.Session，记录每个请求的响应（接口与 requests.Session 相同）"""
+
+    def __init__(self, session):
+        self.session = session
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def request(self, method, url, params=None, json=None, **kwargs):
+        response = self.session.request(method, url, params=params, json=json, **kwargs)
+        # 读取完整内容，stream=True 时 iter_content 仍可重复读取
+        content = response.content
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        entry = {
+            'method': method.upper(),
+            'url': url,
+            'params': {str(k): str(v) for k, v in (params or {}).items()},
+            'body': json,
+            'status': response.status_code,
+            # 非JSON的响应（如网页）不保存内容
+            'json': data,
+            'size': len(content),
+        }
+        with self._lock:
+            self.entries[_key(method, url, params, json)] = entry
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def save(self, path, redact_text=False, identities=()):
+        """保存为fixture（按请求排序，便于比较不同次的录制）"""
+        identities = [identity for identity in identities if identity]
+        responses = []
+        for key in sorted(self.entries):
+            entry = self.entries[key]
+            responses.append({
+                'method': entry['method'],
+                'path': urlsplit(entry['url']).path or '/',
+                'params': sanitize(entry['params'], False, identities),
+                'body': entry['body'],
+                'status': entry['status'],
+                'json': sanitize(entry['json'], redact_text, identities),
+            })
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': FIXTURE_VERSION, 'responses': responses}, f, ensure_ascii=False, indent=1)
+            f.write('\n')
+
+class ReplayResponse:
+    """回放的响应，提供 client 用到的 requests.Response 接口"""
+
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+        self.content = json.dumps(data, ensure_ascii=False).encode('utf-8') if data is not None else b''
+        self.encoding = 'utf-8'
+        self.headers = {'Content-Type': 'application/json; charset=utf-8'}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        if self._data is None:
+            raise ValueError('响应不是JSON')
+        # 每次返回新的对象，调用方修改结果不会影响之后的回放
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size or len(self.content) or 1):
+            yield self.content[start:start + chunk_size]
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f'{self.status_code} (replay)')
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ReplaySession:
+    """按录制的fixture回放请求；没有录制的请求返回404并记录在 misses 中
+
+    latency 为每个请求的模拟延迟（秒），用于性能测试中模拟网络等待。
+    """
+
+    def __init__(self, path, latency=0.0):
+        with open(path, 'r', encoding='utf-8') as f:
+            fixture = json.load(f)
+        if fixture.get('version') != FIXTURE_VERSION:
+            raise ValueError(f"不支持的fixture版本: {fixture.get('version')}")
+        self.responses = {
+            _key(entry['method'], entry['path'], entry['params'], entry['body']): (entry['status'], entry['json'])
+            for entry in fixture['responses']
+        }
+        self.latency = latency
+        self.cookies = requests.cookies.RequestsCookieJar()
+        self.headers = {'User-Agent': USER_AGENT}
+        self.misses = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, method, url, params=None, body=None):
+        key = _key(method, url, params, body)
+        with self._lock:
+            self.calls += 1
+            if key not in self.responses:
+                self.misses.append(key)
+                return 404, {'errcode': -1, 'errmsg': 'not recorded'}
+        return self.responses[key]
+
+    def request(self, method, url, params=None, json=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return ReplayResponse(*self._lookup(method, url, params, json))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        pass
+
+    @property
+    def async_transport(self):
+        """给 async_client 用的 httpx 传输层，请求同样从fixture回放（未安装httpx时为None）"""
+        if httpx is None:
+            return None
+
+        async def handle(request):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            body = json.loads(request.content) if request.content else None
+            status, data = self._lookup(request.method, str(request.url), body=body)
+            return httpx.Response(status, json=data)
+
+        return httpx.MockTransport(handle)
+
+def record(cookie, output, redact_text=False, read_info=True):
+    """用真实请求提取一次，保存fixture，返回书籍数"""
+    session = RecordingSession(create_session(cookie, USER_AGENT, adaptive=False))
+    try:
+        session.get(WEREAD_URL)
+    except Exception as e:
+        print(f"访问主页出错: {e}")
+    books = get_notebooklist(session)
+    if not books:
+        raise RuntimeError('获取书籍列表失败，请检查Cookie是否有效')
+    all_books_data = extract_books(session, books, backend='serial', read_info=read_info)
+    identity = cookie_identity(cookie)
+    session.save(output, redact_text=redact_text, identities=[identity] if identity != cookie else [])
+    return len(all_books_data)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='录制微信读书API响应，生成回放测试用的fixture')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record', help='用 WEREAD_COOKIE 或 cookie.txt 中的账号录制')
+    record_parser.add_argument('--output', default='tests/fixtures/library.json', help='fixture文件')
+    record_parser.add_argument('--redact-text', action='store_true', help='划线和笔记文本替换为等长的伪文本')
+    record_parser.add_argument('--no-read-info', action='store_true', help='不录制阅读信息接口')
+    args = parser.parse_args(argv)
+
+    cookie = os.environ.get('WEREAD_COOKIE', '')
+    if not cookie and os.path.exists('cookie.txt'):
+        with open('cookie.txt', 'r', encoding='utf-8') as f:
+            cookie = f.read().strip()
+    if not cookie:
+        parser.error('请设置 WEREAD_COOKIE 或提供 cookie.txt')
+
+    count = record(cookie, args.output, args.redact_text, not args.no_read_info)
+    print(f"已录制 {count} 本书的响应到 {args.output}")
+
+if __name__ == '__main__':
+    main()
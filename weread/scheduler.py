@@ -0,0 +1,57 @@
+"""书籍处理顺序的调度策略
+
+get_notebooklist 的结果按 sort 排列，如果前面有几本笔记很多的大书，会拖慢后面所有书籍；
+在有时间预算时（如Vercel），还会挤掉大量小书。调度策略只决定处理的先后，
+extract_books 返回的结果仍然按原来的 sort 顺序排列。
+
+内置策略：
+- sort：原顺序
+- small_first：按笔记列表中的笔记数量估算，少的先处理
+- recent：最近更新（sort值大）的先处理
+
+策略是一个 key 函数 book_item -> 排序键，可用 register_policy 添加新的策略。
+pinned 中的 bookId 总是最先处理（按给出的顺序）。
+"""
+import os
+
+# 默认调度策略
+DEFAULT_POLICY = os.environ.get('WEREAD_SCHEDULE', 'sort')
+
+def estimate_note_count(book_item):
+    """根据笔记本列表中的计数估算一本书的笔记数量"""
+    return sum(book_item.get(field) or 0 for field in ('noteCount', 'reviewCount', 'bookmarkCount'))
+
+POLICIES = {
+    'sort': lambda book_item: 0,
+    'small_first': estimate_note_count,
+    'recent': lambda book_item: -(book_item.get('sort') or 0),
+}
+
+def register_policy(name, key):
+    """注册调度策略，key(book_item) 返回排序键，越小越先处理"""
+    POLICIES[name] = key
+
+def schedule(books, policy=None, pinned=None):
+    """返回处理顺序（books 中的下标列表）
+
+    policy 可以是策略名称或 key 函数；排序是稳定的，键相同时保持原顺序。
+    """
+    policy = policy or DEFAULT_POLICY
+    if callable(policy):
+        key = policy
+    else:
+        try:
+            key = POLICIES[policy]
+        except KeyError:
+            raise ValueError(f"未知的调度策略: {policy}，可选: {', '.join(POLICIES)}")
+
+    pinned_rank = {str(book_id): rank for rank, book_id in enumerate(pinned or [])}
+
+    def order_key(index):
+        book_item = books[index]
+        book_id = str(book_item.get('bookId') or book_item.get('book', {}).get('bookId'))
+        if book_id in pinned_rank:
+            return (0, pinned_rank[book_id], 0)
+        return (1, 0, key(book_item))
+
+    return sorted(range(len(books)), key=order_key)
@@ -0,0 +1,85 @@
+"""内存受限的提取结果容器：超过内存上限后把后续的书写入磁盘
+
+SpillList 按完成顺序接收 (index, book_data)，index 可以是任意可比较的排序键。
+在内存中保存的数据估算大小超过 limit_bytes 后，后续的书以 NDJSON 格式追加到 directory 下的临时文件中。
+遍历时按 index 顺序产出，磁盘上的书逐本读回，导出函数可以流式处理，
+峰值内存取决于上限而不是书库大小。directory 为 None 时使用匿名临时文件（关闭后自动删除）；
+limit_bytes 为 None 时全部保存在内存中，不做序列化。
+"""
+import json
+import os
+import tempfile
+import threading
+
+SPILL_FILENAME = 'spill.ndjson'
+
+class SpillList:
+    """只追加的书籍数据容器，按 index 顺序遍历"""
+
+    def __init__(self, directory, limit_bytes):
+        self.directory = directory
+        self.limit_bytes = limit_bytes
+        self.memory_bytes = 0
+        self.spilled_count = 0
+        self._memory = {}
+        # index -> 文件偏移量（已写入磁盘的书）
+        self._offsets = {}
+        self._path = os.path.join(directory, SPILL_FILENAME) if directory else None
+        self._file = None
+        # 多个导出可能同时遍历（例如缓存命中后重新导出），读文件时加锁
+        self._lock = threading.Lock()
+
+    def append(self, index, book_data):
+        if self.limit_bytes is None:
+            self._memory[index] = book_data
+            return
+        line = json.dumps(book_data, ensure_ascii=False)
+        size = len(line.encode('utf-8'))
+        if self._file is None and self.memory_bytes + size <= self.limit_bytes:
+            self._memory[index] = book_data
+            self.memory_bytes += size
+            return
+        if self._file is None:
+            if self._path is None:
+                self._file = tempfile.TemporaryFile('w+', encoding='utf-8')
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(self._path, 'w+', encoding='utf-8')
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._offsets[index] = self._file.tell()
+            self._file.write(line + '\n')
+        self.spilled_count += 1
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def __len__(self):
+        return len(self._memory) + len(self._offsets)
+
+    def __iter__(self):
+        for index in sorted(self._memory.keys() | self._offsets.keys()):
+            yield self[index]
+
+    def __getitem__(self, index):
+        """按 index 取出一本书，磁盘上的书读回为新的对象"""
+        if index in self._memory:
+            return self._memory[index]
+        if index not in self._offsets:
+            raise KeyError(index)
+        with self._lock:
+            self._file.flush()
+            self._file.seek(self._offsets[index])
+            line = self._file.readline()
+        return json.loads(line)
+
+    def close(self):
+        """关闭并删除磁盘上的临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if self._path is not None:
+                os.remove(self._path)
+        self._memory.clear()
+        self._offsets.clear()
@@ -0,0 +1,238 @@
+"""本地笔记数据库：每个用户一个SQLite文件，带FTS5全文索引，支持跨书搜索
+
+- 每次提取后调用 save_books 增量更新：内容未变的笔记不重写，已删除的笔记会被移除，
+  本次没有提取到的书（例如Vercel超时只处理了部分）保持不变
+- 全文索引覆盖划线/想法原文（markText）、想法内容（content）、章节标题和书名
+- 使用 trigram 分词（SQLite 3.34+），中文可以按任意连续3个字以上的片段搜索；
+  少于3个字的查询退回到 LIKE 匹配
+
+数据库位于 DATA_DIR（默认 data/，不会被 cleanup.py 清理），文件名为用户ID以服务器密钥计算的HMAC，
+不知道密钥就无法由用户ID推出文件名。密钥取 WEREAD_DATA_SECRET，未设置时首次使用时随机生成并保存在
+DATA_DIR/.secret 中（重启后不变）。
+
+搜索需要证明是该用户本人：提取完成时签发的 search_token（见 search_token），
+或者由调用方用Cookie向微信读书验证身份。
+"""
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+
+from .client import cookie_identity
+
+DATA_DIR = os.environ.get('WEREAD_DATA_DIR', 'data')
+# 是否在提取后保存到笔记数据库
+ENABLED = os.environ.get('WEREAD_NOTES_DB', '1') == '1'
+# 数据库文件名和搜索令牌使用的密钥
+SECRET = os.environ.get('WEREAD_DATA_SECRET', '')
+# 搜索令牌的有效期（秒），默认7天
+TOKEN_TTL = int(os.environ.get('WEREAD_SEARCH_TOKEN_TTL', str(7 * 86400)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id TEXT PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    isbn TEXT,
+    rating REAL,
+    sort INTEGER,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    note_id TEXT UNIQUE NOT NULL,
+    book_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    chapter_uid INTEGER,
+    chapter_title TEXT,
+    mark_text TEXT,
+    content TEXT,
+    range TEXT,
+    create_time INTEGER,
+    digest TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_book ON notes(book_id);
+"""
+
+_schema_lock = threading.Lock()
+
+def _fts_tokenizer(conn):
+    """优先使用trigram分词，旧版SQLite退回unicode61"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._trigram_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._trigram_probe")
+        return 'trigram'
+    except sqlite3.OperationalError:
+        return 'unicode61'
+
+_secret_lock = threading.Lock()
+_secrets = {}
+
+def _secret(data_dir=None):
+    """服务器密钥：WEREAD_DATA_SECRET，或 data_dir 中保存的随机密钥（没有时生成）"""
+    if SECRET:
+        return SECRET.encode('utf-8')
+    data_dir = data_dir or DATA_DIR
+    with _secret_lock:
+        if data_dir not in _secrets:
+            os.makedirs(data_dir, exist_ok=True)
+            path = os.path.join(data_dir, '.secret')
+            try:
+                # 只允许当前用户读取；多个进程同时创建时只有一个成功，其余读取它写入的密钥
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, 'w') as f:
+                    f.write(os.urandom(32).hex())
+            except FileExistsError:
+                pass
+            with open(path, 'r') as f:
+                _secrets[data_dir] = f.read().strip().encode('utf-8')
+        return _secrets[data_dir]
+
+def _sign(message, data_dir=None):
+    return hmac.new(_secret(data_dir), message.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def db_path_for(cookie_string, data_dir=None):
+    """某个用户的数据库路径"""
+    user = _sign(f'db:{cookie_identity(cookie_string)}', data_dir)[:32]
+    return os.path.join(data_dir or DATA_DIR, f'notes_{user}.sqlite')
+
+def search_token(cookie_string, data_dir=None, ttl=None):
+    """签发搜索令牌：在有效期内证明持有者已用该用户的Cookie成功提取过"""
+    expires = int(time.time()) + (TOKEN_TTL if ttl is None else ttl)
+    return f"{expires}.{_sign(f'search:{cookie_identity(cookie_string)}:{expires}', data_dir)}"
+
+def check_search_token(cookie_string, token, data_dir=None):
+    """令牌是否由本服务器为该用户签发且未过期"""
+    expires, _, signature = (token or '').partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = _sign(f'search:{cookie_identity(cookie_string)}:{expires}', data_dir)
+    return hmac.compare_digest(signature, expected)
+
+def connect(db_path):
+    """打开数据库，必要时建表"""
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    with _schema_lock:
+        conn.executescript(SCHEMA)
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone()
+        if not exists:
+            conn.execute(
+                "CREATE VIRTUAL TABLE notes_fts USING fts5("
+                f"mark_text, content, chapter_title, book_title, tokenize='{_fts_tokenizer(conn)}')"
+            )
+        conn.commit()
+    return conn
+
+def _note_fields(note):
+    """从一条划线或笔记中取出要保存的字段"""
+    if note.get('reviewId'):
+        note_id = f"review:{note['reviewId']}"
+        kind = 'review'
+        mark_text = note.get('abstract', '') or ''
+        content = note.get('content', '') or note.get('markText', '') or ''
+    else:
+        note_id = f"bookmark:{note.get('bookmarkId') or note.get('range')}"
+        kind = 'highlight'
+        mark_text = note.get('markText', '') or ''
+        content = ''
+    return note_id, kind, mark_text, content
+
+def save_books(conn, books_data, books=None):
+    """增量保存提取结果，返回 {'inserted', 'updated', 'deleted', 'unchanged'} 统计
+
+    books 为提取时的笔记本列表（get_notebooklist 的结果或已接收完的 BookStream），
+    每本书的 sort 取自其中的项；不传时 sort 保存为0。
+    """
+    stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    now = time.time()
+    sort_keys = {str(item.get('bookId')): item.get('sort') or 0 for item in getattr(books, 'items', books) or ()}
+    with conn:
+        for book in books_data:
+            book_info = book['book_info']
+            book_id = str(book_info.get('bookId'))
+            title = book_info.get('title', '')
+            conn.execute(
+                "INSERT INTO books (book_id, title, author, isbn, rating, sort, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(book_id) DO UPDATE SET title=excluded.title, author=excluded.author, isbn=excluded.isbn, "
+                "rating=excluded.rating, sort=excluded.sort, updated_at=excluded.updated_at",
+                (book_id, title, book_info.get('author', ''), book.get('isbn', ''), book.get('rating', 0),
+                 sort_keys.get(book_id, 0), now),
+            )
+
+            existing = {
+                row['note_id']: (row['id'], row['digest'])
+                for row in conn.execute("SELECT id, note_id, digest FROM notes WHERE book_id = ?", (book_id,))
+            }
+            seen = set()
+            for note in book['notes']:
+                note_id, kind, mark_text, content = _note_fields(note)
+                chapter_title = note.get('chapter_title', '')
+                digest = hashlib.sha1('\x1f'.join((mark_text, content, chapter_title, title)).encode('utf-8')).hexdigest()
+                seen.add(note_id)
+
+                if note_id in existing:
+                    row_id, old_digest = existing[note_id]
+                    if old_digest == digest:
+                        stats['unchanged'] += 1
+                        continue
+                    conn.execute(
+                        "UPDATE notes SET chapter_uid=?, chapter_title=?, mark_text=?, content=?, range=?, create_time=?, digest=? WHERE id=?",
+                        (note.get('chapterUid'), chapter_title, mark_text, content, note.get('range', ''),
+                         note.get('createTime', 0), digest, row_id),
+                    )
+                    conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (row_id,))
+                    stats['updated'] += 1
+                else:
+                    row_id = conn.execute(
+                        "INSERT INTO notes (note_id, book_id, kind, chapter_uid, chapter_title, mark_text, content, range, create_time, digest) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (note_id, book_id, kind, note.get('chapterUid'), chapter_title, mark_text, content,
+                         note.get('range', ''), note.get('createTime', 0), digest),
+                    ).lastrowid
+                    stats['inserted'] += 1
+                conn.execute(
+                    "INSERT INTO notes_fts (rowid, mark_text, content, chapter_title, book_title) VALUES (?, ?, ?, ?, ?)",
+                    (row_id, mark_text, content, chapter_title, title),
+                )
+
+            # 删除在微信读书中已删除的笔记
+            for note_id, (row_id, _) in existing.items():
+                if note_id not in seen:
+                    conn.execute("DELETE FROM notes WHERE id = ?", (row_id,))
+                    conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (row_id,))
+                    stats['deleted'] += 1
+    return stats
+
+def search(conn, query, limit=20, offset=0):
+    """全文搜索，按相关度排序返回命中的笔记"""
+    query = (query or '').strip()
+    if not query:
+        return []
+
+    columns = (
+        "n.note_id, n.kind, n.chapter_title, n.mark_text, n.content, n.create_time, "
+        "b.book_id, b.title AS book_title, b.author"
+    )
+    if len(query) >= 3:
+        # 整个查询作为一个短语，避免用户输入中的引号等被当作FTS语法
+        phrase = '"' + query.replace('"', '""') + '"'
+        rows = conn.execute(
+            f"SELECT {columns}, bm25(notes_fts) AS score FROM notes_fts "
+            "JOIN notes n ON n.id = notes_fts.rowid JOIN books b ON b.book_id = n.book_id "
+            "WHERE notes_fts MATCH ? ORDER BY score LIMIT ? OFFSET ?",
+            (phrase, limit, offset),
+        ).fetchall()
+    else:
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        rows = conn.execute(
+            f"SELECT {columns}, 0 AS score FROM notes n JOIN books b ON b.book_id = n.book_id "
+            "WHERE n.mark_text LIKE ?1 ESCAPE '\\' OR n.content LIKE ?1 ESCAPE '\\' "
+            "OR n.chapter_title LIKE ?1 ESCAPE '\\' OR b.title LIKE ?1 ESCAPE '\\' "
+            "ORDER BY n.create_time DESC LIMIT ?2 OFFSET ?3",
+            (pattern, limit, offset),
+        ).fetchall()
+    return [dict(row) for row in rows]
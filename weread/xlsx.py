@@ -0,0 +1,271 @@
+"""多工作表Excel导出：第一个工作表为汇总（每本书的ISBN、评分、划线数、笔记数，以及获取了的阅读信息），
+之后每本书一个工作表
+
+每本书的工作表XML（使用内联字符串，不需要共享字符串表，各工作表互不依赖）在多个进程中
+并行生成并压缩，主进程只负责按完成顺序把压缩好的数据写入xlsx（zip）文件，
+最后写入工作簿、关系和内容类型等描述文件。生成时间随CPU核数缩短，主进程内存只与正在处理的书有关。
+"""
+import os
+import re
+import struct
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from xml.sax.saxutils import escape
+
+from . import columns
+from .exporters import note_to_row, read_info_row
+
+# 生成工作表的进程数，1 表示在当前进程中生成，0 表示CPU核数。
+# 默认为 1：Web应用的eventlet工作进程中不为每个请求创建进程池；命令行和批量导出传入 0 使用进程池
+DEFAULT_PROCESSES = int(os.environ.get('WEREAD_EXCEL_PROCESSES', '1'))
+
+SUMMARY_SHEET = '汇总'
+SUMMARY_COLUMNS = ['书名', '作者', 'ISBN', '评分', '划线数', '笔记数', '工作表']
+SUMMARY_WIDTHS = [30, 16, 16, 8, 8, 8, 30]
+# 获取了阅读信息时汇总表增加的列（取自 exporters.read_info_row）
+READ_SUMMARY_COLUMNS = ['阅读进度(%)', '阅读时长(分钟)', '读完日期']
+READ_SUMMARY_WIDTHS = [12, 14, 12]
+BOOK_COLUMNS = ['章节', '划线', '笔记', '创建时间']
+BOOK_WIDTHS = [24, 80, 50, 20]
+
+# Excel的限制
+MAX_SHEET_NAME = 31
+MAX_CELL_CHARS = 32767
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+# XML 1.0 不允许的控制字符
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+STYLES_XML = (
+    XML_HEADER +
+    f'<styleSheet xmlns="{NS_MAIN}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0" applyAlignment="1">'
+    '<alignment wrapText="1" vertical="top"/></xf></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _cell(ref, value, style=0):
+    style_attr = f' s="{style}"' if style else ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+    text = INVALID_XML_CHARS.sub('', str(value or ''))[:MAX_CELL_CHARS]
+    if not text:
+        return ''
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+def render_sheet_xml(columns, widths, rows, wrap_columns=()):
+    """生成一个工作表的XML：首行为加粗并冻结的表头"""
+    letters = [_column_letter(i) for i in range(len(columns))]
+    parts = [
+        XML_HEADER,
+        f'<worksheet xmlns="{NS_MAIN}">',
+        f'<dimension ref="A1:{letters[-1]}{len(rows) + 1}"/>',
+        '<sheetViews><sheetView workbookViewId="0">'
+        '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+        '</sheetView></sheetViews>',
+        '<cols>',
+    ]
+    for i, width in enumerate(widths):
+        parts.append(f'<col min="{i + 1}" max="{i + 1}" width="{width}" customWidth="1"/>')
+    parts.append('</cols><sheetData>')
+    parts.append('<row r="1">' + ''.join(_cell(f'{letters[i]}1', column, 1) for i, column in enumerate(columns)) + '</row>')
+    for row_number, row in enumerate(rows, start=2):
+        cells = ''.join(_cell(f'{letters[i]}{row_number}', value, 2 if i in wrap_columns else 0)
+                        for i, value in enumerate(row))
+        parts.append(f'<row r="{row_number}">{cells}</row>')
+    parts.append('</sheetData></worksheet>')
+    return ''.join(parts).encode('utf-8')
+
+def _compress(data):
+    """返回 (crc32, 原始长度, raw deflate数据)，可以直接写入zip"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return zlib.crc32(data), len(data), compressed
+
+def render_book_sheet(book):
+    """在工作进程中生成并压缩一本书的工作表"""
+    # 笔记少的书逐行转换更快，见 columns.MIN_NOTES
+    if columns.is_available() and len(book['notes']) >= columns.MIN_NOTES:
+        converted = columns.notes_to_columns([book])
+        rows = list(zip(*(converted[column].tolist() for column in BOOK_COLUMNS)))
+    else:
+        book_info = book['book_info']
+        rows = []
+        for note in book['notes']:
+            row = note_to_row(book_info.get('title', ''), book_info.get('author', ''), note)
+            rows.append([row[column] for column in BOOK_COLUMNS])
+    return _compress(render_sheet_xml(BOOK_COLUMNS, BOOK_WIDTHS, rows, wrap_columns=(1, 2)))
+
+def _sheet_name(title, book_id, used):
+    """Excel工作表名：不超过31个字符、不含特殊字符、不区分大小写不重复"""
+    base = INVALID_SHEET_CHARS.sub('_', title or '').strip().strip("'")[:MAX_SHEET_NAME] or str(book_id or 'Sheet')
+    name = base
+    counter = 2
+    while name.lower() in used:
+        suffix = f'_{counter}'
+        name = base[:MAX_SHEET_NAME - len(suffix)] + suffix
+        counter += 1
+    used.add(name.lower())
+    return name
+
+class _ZipWriter:
+    """写入已压缩好的zip条目（deflate），条目顺序任意，最后写中央目录"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.entries = []
+        self.offset = 0
+        now = time.localtime()
+        self.dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+        self.dos_date = ((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
+
+    def write_compressed(self, name, crc, size, compressed):
+        if self.offset + len(compressed) > 0xFFFFFFFF or size > 0xFFFFFFFF:
+            raise ValueError('Excel文件过大，请使用单工作表模式导出')
+        name_bytes = name.encode('utf-8')
+        header = struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, 0x0800, 8, self.dos_time, self.dos_date,
+                             crc, len(compressed), size, len(name_bytes), 0)
+        self.fileobj.write(header + name_bytes)
+        self.fileobj.write(compressed)
+        self.entries.append((name_bytes, crc, len(compressed), size, self.offset))
+        self.offset += len(header) + len(name_bytes) + len(compressed)
+
+    def write(self, name, data):
+        self.write_compressed(name, *_compress(data))
+
+    def close(self):
+        start = self.offset
+        for name_bytes, crc, compressed_size, size, offset in self.entries:
+            record = struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, 0x0800, 8, self.dos_time,
+                                 self.dos_date, crc, compressed_size, size, len(name_bytes), 0, 0, 0, 0, 0, offset)
+            self.fileobj.write(record + name_bytes)
+            self.offset += len(record) + len(name_bytes)
+        count = len(self.entries)
+        self.fileobj.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, self.offset - start, start, 0))
+
+def _escape_attr(value):
+    return escape(value, {'"': '&quot;'})
+
+def _workbook_parts(sheet_names):
+    """工作簿、关系和内容类型描述文件"""
+    sheets = ''.join(f'<sheet name="{_escape_attr(name)}" sheetId="{i}" r:id="rId{i}"/>'
+                     for i, name in enumerate(sheet_names, start=1))
+    workbook = f'{XML_HEADER}<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_REL}"><sheets>{sheets}</sheets></workbook>'
+
+    styles_id = len(sheet_names) + 1
+    workbook_rels = ''.join(
+        f'<Relationship Id="rId{i}" Type="{NS_REL}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, styles_id))
+    workbook_rels = (f'{XML_HEADER}<Relationships xmlns="{NS_PKG_REL}">{workbook_rels}'
+                     f'<Relationship Id="rId{styles_id}" Type="{NS_REL}/styles" Target="styles.xml"/></Relationships>')
+
+    root_rels = (f'{XML_HEADER}<Relationships xmlns="{NS_PKG_REL}">'
+                 f'<Relationship Id="rId1" Type="{NS_REL}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+
+    overrides = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, styles_id))
+    content_types = (
+        f'{XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        f'{overrides}</Types>')
+
+    return [
+        ('xl/workbook.xml', workbook),
+        ('xl/_rels/workbook.xml.rels', workbook_rels),
+        ('xl/styles.xml', STYLES_XML),
+        ('_rels/.rels', root_rels),
+        ('[Content_Types].xml', content_types),
+    ]
+
+def resolve_processes(processes=None):
+    """None 使用 DEFAULT_PROCESSES，0 表示CPU核数"""
+    if processes is None:
+        processes = DEFAULT_PROCESSES
+    return processes or os.cpu_count() or 1
+
+def export_to_excel_sheets(data, filename, processes=None):
+    """导出为多工作表Excel；data 可以是列表或 spill.SpillList 等按顺序迭代的对象"""
+    processes = resolve_processes(processes)
+    used = {SUMMARY_SHEET.lower()}
+    sheet_names = [SUMMARY_SHEET]
+    summary_rows = []
+
+    with open(filename, 'wb') as f:
+        writer = _ZipWriter(f)
+
+        def write_sheet(sheet_number, result):
+            writer.write_compressed(f'xl/worksheets/sheet{sheet_number}.xml', *result)
+
+        executor = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+        try:
+            pending = {}
+            for book in data:
+                book_info = book['book_info']
+                name = _sheet_name(book_info.get('title', ''), book_info.get('bookId'), used)
+                sheet_names.append(name)
+                reviews = sum(1 for note in book['notes'] if note.get('reviewId'))
+                summary_row = [book_info.get('title', ''), book_info.get('author', ''),
+                               book.get('isbn', '') or '', book.get('rating', 0) or 0,
+                               len(book['notes']) - reviews, reviews, name]
+                if 'read_info' in book:
+                    read_info = read_info_row(book)
+                    summary_row.extend(read_info[column] for column in READ_SUMMARY_COLUMNS)
+                summary_rows.append(summary_row)
+
+                # 汇总是 sheet1，书从 sheet2 开始
+                sheet_number = len(sheet_names)
+                if executor is None:
+                    write_sheet(sheet_number, render_book_sheet(book))
+                    continue
+
+                # 同时提交的任务数有上限，data 是流式的可迭代对象时不会把所有书读入内存
+                if len(pending) >= processes * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write_sheet(pending.pop(future), future.result())
+                pending[executor.submit(render_book_sheet, book)] = sheet_number
+
+            for future in list(pending):
+                write_sheet(pending.pop(future), future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        summary_columns, summary_widths = SUMMARY_COLUMNS, SUMMARY_WIDTHS
+        if any(len(row) > len(SUMMARY_COLUMNS) for row in summary_rows):
+            summary_columns = SUMMARY_COLUMNS + READ_SUMMARY_COLUMNS
+            summary_widths = SUMMARY_WIDTHS + READ_SUMMARY_WIDTHS
+        writer.write('xl/worksheets/sheet1.xml',
+                     render_sheet_xml(summary_columns, summary_widths, summary_rows))
+        for name, xml in _workbook_parts(sheet_names):
+            writer.write(name, xml.encode('utf-8'))
+        writer.close()